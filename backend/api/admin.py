@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Category, Product, Profile, Cart, CartItem, Order, OrderItem
+from .carts import recompute_totals
+from .models import Category, Product, ProductStock, Profile, Cart, CartItem, Order, OrderItem, EmailOutbox, ThumbnailJob, Blob, ProductImageVariant
 
 
 
@@ -14,6 +15,11 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description', 'category__name')
     list_filter = ('category', 'gender') 
 
+@admin.register(ProductStock)
+class ProductStockAdmin(admin.ModelAdmin):
+    list_display = ('product', 'quantity')
+    search_fields = ('product__name',)
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'first_name', 'last_name', 'phone_number', 'address')
@@ -21,7 +27,8 @@ class ProfileAdmin(admin.ModelAdmin):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'created_at')
+    list_display = ('user', 'item_count', 'total_quantity', 'total_price', 'created_at')
+    readonly_fields = ('item_count', 'total_quantity', 'total_price')
     search_fields = ('user__username',)
     list_filter = ('created_at',)
 
@@ -31,6 +38,21 @@ class CartItemAdmin(admin.ModelAdmin):
     search_fields = ('cart__user__username', 'product__name')
     list_filter = ('cart__created_at',)
 
+    # Edits here bypass api.carts, so the totals of the carts concerned are recomputed
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recompute_totals(Cart.objects.filter(id__in={obj.cart_id, form.initial.get('cart', obj.cart_id)}))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recompute_totals(Cart.objects.filter(id=obj.cart_id))
+
+    def delete_queryset(self, request, queryset):
+        cart_ids = set(queryset.values_list('cart_id', flat=True))
+        super().delete_queryset(request, queryset)
+        recompute_totals(Cart.objects.filter(id__in=cart_ids))
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_price', 'status', 'created_at')
@@ -43,3 +65,26 @@ class OrderItemAdmin(admin.ModelAdmin):
     search_fields = ('order__user__user__username', 'product__name')
     list_filter = ('order__created_at',)
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    search_fields = ('recipient', 'subject', 'key')
+    list_filter = ('status', 'created_at')
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'references', 'stored_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'size', 'references', 'stored_at')
+
+@admin.register(ProductImageVariant)
+class ProductImageVariantAdmin(admin.ModelAdmin):
+    list_display = ('source', 'width', 'height', 'format', 'name')
+    search_fields = ('source',)
+    list_filter = ('format', 'width')
+
+@admin.register(ThumbnailJob)
+class ThumbnailJobAdmin(admin.ModelAdmin):
+    list_display = ('image', 'kind', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    search_fields = ('image',)
+    list_filter = ('kind', 'status', 'created_at')
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class MyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'  # Change this to your actual app name
\ No newline at end of file
+    name = 'api'  # Change this to your actual app name
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+# Read by the settings, whichever server imports this module
+os.environ.setdefault('ASGI', 'True')
 
 application = get_asgi_application()
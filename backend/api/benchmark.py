@@ -0,0 +1,202 @@
+"""
+Benchmark suite for the storefront GraphQL API.
+
+Synthetic shoppers browse the catalog, fill and edit their carts, check out
+and look at their order history. Every operation goes through the whole
+Django stack (middleware, view, response cache) with the test client, so
+the numbers include everything but the network. Results can be written as
+JSON and compared with a stored baseline (see `manage.py benchmark`).
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .models import Category, Product, Profile
+
+BROWSE = "query Browse { categories { id name } products { id name price category { name } } }"
+ADD_TO_CART = """
+mutation AddToCart($userId: Int!, $productId: Int!) {
+  addProductToCart(userId: $userId, productId: $productId, quantity: 1) { id items { quantity subtotal } }
+}
+"""
+UPDATE_CART = """
+mutation UpdateCart($userId: Int!, $productId: Int!, $quantity: Int!) {
+  updateCartProduct(userId: $userId, productId: $productId, quantity: $quantity) { id items { quantity subtotal } }
+}
+"""
+PLACE_ORDER = """
+mutation PlaceOrder($userId: Int!) {
+  placeOrder(userId: $userId) { id totalPrice orderItems { quantity product { name } } }
+}
+"""
+ORDER_HISTORY = """
+query OrderHistory($userId: Int!) {
+  orders(userId: $userId) { id totalPrice status orderItems { quantity price product { name category { name } } } }
+}
+"""
+
+# Share of each operation in the default mix
+DEFAULT_MIX = {"browse": 50, "addToCart": 20, "updateCart": 10, "placeOrder": 5, "orderHistory": 15}
+
+# Relative p95 latency increase over the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def seed(categories=20, products=500, users=50, rng=None):
+    """Create a synthetic catalog and customers and return `(product ids, user ids)`."""
+    rng = rng or random.Random(0)
+    User = get_user_model()
+    tag = f"{rng.getrandbits(32):08x}"
+
+    Category.objects.bulk_create([Category(name=f"bench-{tag}-{i}") for i in range(categories)])
+    category_ids = list(Category.objects.filter(name__startswith=f"bench-{tag}-").values_list("id", flat=True))
+    Product.objects.bulk_create([
+        Product(
+            name=f"bench-{tag}-{i}",
+            description="Synthetic product",
+            price=Decimal(rng.randint(100, 20000)) / 100,
+            category_id=rng.choice(category_ids),
+            gender=rng.choice(["Male", "Female"]),
+        )
+        for i in range(products)
+    ], batch_size=500)
+    User.objects.bulk_create([
+        User(username=f"bench-{tag}-{i}", email=f"bench-{tag}-{i}@example.com") for i in range(users)
+    ])
+    users = list(User.objects.filter(username__startswith=f"bench-{tag}-"))
+    Profile.objects.bulk_create([
+        Profile(user=user, username=user.username, email=user.email, address="1 Bench Street",
+                first_name="Bench", last_name="User", phone_number="0000000000")
+        for user in users
+    ])
+    product_ids = list(Product.objects.filter(name__startswith=f"bench-{tag}-").values_list("id", flat=True))
+    return product_ids, [user.id for user in users]
+
+
+class Workload:
+    """
+    Shoppers driving the storefront operations, keeping track of their carts.
+
+    An operation whose precondition doesn't hold (updating or checking out an
+    empty cart) adds a product to the cart instead, and is recorded as such.
+    """
+
+    def __init__(self, product_ids, user_ids, rng=None, client=None):
+        self.product_ids = product_ids
+        self.user_ids = user_ids
+        self.rng = rng or random.Random(0)
+        self.client = client or Client()
+        self.carts = {user_id: set() for user_id in user_ids}
+
+    def execute(self, query, variables=None):
+        response = self.client.post(
+            "/graphql/", data={"query": query, "variables": variables or {}}, content_type="application/json", secure=True)
+        result = response.json()
+        return response.status_code == 200 and not result.get("errors")
+
+    def run(self, operation):
+        """Run one operation and return `(operation actually run, ok)`."""
+        if operation not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation: {operation}")
+        user_id = self.rng.choice(self.user_ids)
+        cart = self.carts[user_id]
+        if operation == "browse":
+            return operation, self.execute(BROWSE)
+        if operation == "orderHistory":
+            return operation, self.execute(ORDER_HISTORY, {"userId": user_id})
+        if operation == "placeOrder" and cart:
+            ok = self.execute(PLACE_ORDER, {"userId": user_id})
+            if ok:
+                cart.clear()
+            return operation, ok
+        if operation == "updateCart" and cart:
+            variables = {"userId": user_id, "productId": self.rng.choice(sorted(cart)), "quantity": self.rng.randint(1, 5)}
+            return operation, self.execute(UPDATE_CART, variables)
+
+        product_id = self.rng.choice(self.product_ids)
+        ok = self.execute(ADD_TO_CART, {"userId": user_id, "productId": product_id})
+        if ok:
+            cart.add(product_id)
+        return "addToCart", ok
+
+
+def run(workload, mix=None, requests=1000, warmup=50):
+    """
+    Drive `requests` operations picked at random from `mix` and return the results.
+
+    The first `warmup` operations fill the caches and are not measured.
+    """
+    mix = mix or DEFAULT_MIX
+    operations, weights = zip(*mix.items())
+    for operation in workload.rng.choices(operations, weights, k=warmup):
+        workload.run(operation)
+
+    samples = {}
+    started = time.perf_counter()
+    for operation in workload.rng.choices(operations, weights, k=requests):
+        with CaptureQueriesContext(connection) as queries:
+            request_started = time.perf_counter()
+            operation, ok = workload.run(operation)
+            latency = time.perf_counter() - request_started
+        sample = samples.setdefault(operation, {"latencies": [], "queries": [], "errors": 0})
+        sample["latencies"].append(latency)
+        sample["queries"].append(len(queries))
+        sample["errors"] += not ok
+    elapsed = time.perf_counter() - started
+
+    return {
+        "elapsed": round(elapsed, 3),
+        "throughput": round(requests / elapsed, 1),
+        "operations": {operation: summarize(sample, elapsed) for operation, sample in sorted(samples.items())},
+    }
+
+
+def summarize(sample, elapsed):
+    latencies = sorted(sample["latencies"])
+    return {
+        "count": len(latencies),
+        "errors": sample["errors"],
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50": round(percentile(latencies, 50) * 1000, 3),
+        "p95": round(percentile(latencies, 95) * 1000, 3),
+        "p99": round(percentile(latencies, 99) * 1000, 3),
+        "queries": round(sum(sample["queries"]) / len(latencies), 2),
+        "maxQueries": max(sample["queries"]),
+    }
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return the regressions of `results` against `baseline`, as messages.
+
+    An operation regresses when its p95 latency grows by more than
+    `tolerance`, when it issues more queries on average or its worst case
+    issues more queries, or when it starts failing. Query counts are
+    deterministic for a given seed, so they are compared exactly.
+    """
+    regressions = []
+    for operation, before in baseline["operations"].items():
+        after = results["operations"].get(operation)
+        if after is None:
+            continue
+        if after["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{operation}: p95 {before['p95']}ms -> {after['p95']}ms")
+        if after["queries"] > before["queries"]:
+            regressions.append(f"{operation}: {before['queries']} -> {after['queries']} queries per operation")
+        if after["maxQueries"] > before["maxQueries"]:
+            regressions.append(f"{operation}: at most {before['maxQueries']} -> {after['maxQueries']} queries")
+        if after["errors"] and not before["errors"]:
+            regressions.append(f"{operation}: {after['errors']} errors")
+    return regressions
@@ -0,0 +1,184 @@
+"""
+Content-addressed storage for uploaded and imported images.
+
+A file is named after the sha256 of its content, sharded into two levels of
+directories (`blobs/ab/cd/abcd....jpg`), so storing the same bytes twice
+keeps a single copy, and a URL always serves the same bytes: `blob_view`
+answers with far-future, immutable cache headers.
+
+Each blob has a `Blob` row counting the profiles, products and image
+variants (see `api.variants`) that use it.
+The counts are kept up to date by the code that changes those references,
+and by signals for products saved or deleted one at a time (`api.signals`);
+`manage.py collect_blobs` deletes the blobs nobody uses any more, and can
+recount the references from scratch.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Blob, Product, ProductImageVariant, Profile
+
+BLOB_PREFIX = "blobs"
+# The part of a blob name after BLOB_PREFIX: two shard directories taken
+# from the sha256, then the sha256 and the extension
+BLOB_PATH = r"[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.[a-z0-9]+)?"
+BLOB_PATH_RE = re.compile(r"([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:\.[a-z0-9]+)?")
+
+
+class BlobStorage(FileSystemStorage):
+    """File system storage (MEDIA_ROOT by default) that names every saved file after its sha256."""
+
+    def save(self, name, content, max_length=None):
+        # Only the extension of `name` is kept
+        extension = os.path.splitext(name or "")[1].lower()
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        hexdigest = digest.hexdigest()
+        name = f"{BLOB_PREFIX}/{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}"
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(f.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(f.name, self.file_permissions_mode or 0o644)
+            # Atomic, so a concurrent save of the same content is harmless
+            os.replace(f.name, path)
+        return name
+
+
+blob_storage = BlobStorage()
+
+
+def store(content, extension):
+    """Store a file, returning its blob name. `extension` includes the dot, e.g. ".jpg"."""
+    name = blob_storage.save(f"blob{extension}", content)
+    # Storing a blob again restarts its grace period (see `collect`)
+    Blob.objects.bulk_create(
+        [Blob(name=name, size=blob_storage.size(name), stored_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["stored_at"],
+    )
+    return name
+
+
+def blob_name(value):
+    """The blob name in a storage name or media URL, or None when it isn't one."""
+    if value and value.startswith(blob_storage.base_url):
+        value = value[len(blob_storage.base_url):]
+    return value if value and value.startswith(f"{BLOB_PREFIX}/") else None
+
+
+def retain(values):
+    """Count one more reference to each blob in `values` (names or URLs; others are ignored)."""
+    _shift(values, 1)
+
+
+def release(values):
+    """Count one reference less to each blob in `values`."""
+    _shift(values, -1)
+
+
+def _shift(values, sign):
+    counts = Counter(name for name in map(blob_name, values) if name)
+    # Grouped by count, so a whole import chunk is a handful of UPDATEs
+    by_count = {}
+    for name, count in counts.items():
+        by_count.setdefault(count, []).append(name)
+    for count, names in by_count.items():
+        blobs = Blob.objects.filter(name__in=names)
+        if sign < 0:
+            blobs = blobs.filter(references__gte=count)
+        blobs.update(references=F("references") + sign * count)
+
+
+def profile_blobs(profile):
+    """Every blob used by a profile: its image and thumbnails."""
+    names = [profile.image.name if profile.image else None]
+    names += [name for formats in profile.thumbnails.values() for name in formats.values()]
+    return [name for name in map(blob_name, names) if name]
+
+
+def product_blobs(product):
+    return [name for name in map(blob_name, (product.image1, product.image2)) if name]
+
+
+def count_references(names=None):
+    """Count the references to every blob, or only to `names`, by reading the profiles, products and image variants."""
+    counts = Counter()
+    profiles = Profile.objects.only("image", "thumbnails")
+    products = Product.objects.only("image1", "image2")
+    variants = ProductImageVariant.objects.values_list("name", flat=True)
+    if names is not None:
+        urls = [blob_storage.url(name) for name in names]
+        products = products.filter(Q(image1__in=urls + names) | Q(image2__in=urls + names))
+        variants = variants.filter(name__in=names)
+    for profile in profiles.iterator():
+        counts.update(profile_blobs(profile))
+    for product in products.iterator():
+        counts.update(product_blobs(product))
+    counts.update(variants.iterator())
+    return counts if names is None else Counter({name: counts[name] for name in names})
+
+
+def recount():
+    """Rewrite the reference counts of every blob from the profiles and products. Returns the number fixed."""
+    counts = count_references()
+    wrong = [blob for blob in Blob.objects.only("name", "references") if blob.references != counts[blob.name]]
+    for blob in wrong:
+        blob.references = counts[blob.name]
+    Blob.objects.bulk_update(wrong, ["references"], batch_size=1000)
+    return len(wrong)
+
+
+def collect(grace=timedelta(hours=24), dry_run=False):
+    """
+    Delete the unreferenced blobs not stored again within `grace`, and return their names.
+
+    The grace period spares blobs that were just stored and are about to be
+    referenced. Candidates are checked against the profiles and products
+    before going, so a count that drifted too low never loses a file.
+    Files without a `Blob` row, left by an interrupted `store`, go too.
+    """
+    cutoff = timezone.now() - grace
+    candidates = list(Blob.objects.filter(references=0, stored_at__lt=cutoff).values_list("name", flat=True))
+    used = count_references(candidates)
+    garbage = []
+    for name in candidates:
+        if used[name]:
+            if not dry_run:
+                Blob.objects.filter(name=name).update(references=used[name])
+        elif dry_run or Blob.objects.filter(name=name, references=0, stored_at__lt=cutoff).delete()[0]:
+            garbage.append(name)
+            if not dry_run:
+                blob_storage.delete(name)
+                # Its variants become garbage too, collected by a later run
+                variants = ProductImageVariant.objects.filter(source=name)
+                release(variants.values_list("name", flat=True))
+                variants.delete()
+
+    known = set(Blob.objects.values_list("name", flat=True))
+    for root, _, files in os.walk(blob_storage.path(BLOB_PREFIX)):
+        for filename in files:
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, blob_storage.location).replace(os.sep, "/")
+            if name not in known and datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc) < cutoff:
+                garbage.append(name)
+                if not dry_run:
+                    os.remove(path)
+    return garbage
@@ -0,0 +1,161 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .inventory import check_stock
+from .models import Cart, CartItem, Product
+
+def adjust_totals(cart_id, items=0, quantity=0, price=Decimal("0")):
+    """
+    Shift the stored totals of a cart by the given amounts.
+
+    The increments are applied by the database (`SET x = x + ...`), so
+    concurrent changes to the same cart never overwrite each other.
+    """
+    Cart.objects.filter(id=cart_id).update(
+        item_count=F("item_count") + items,
+        total_quantity=F("total_quantity") + quantity,
+        total_price=F("total_price") + price,
+    )
+
+
+def add_item(user_id, product_id, quantity):
+    """
+    Add `quantity` units of a product to the user's cart and return the cart.
+
+    The item is inserted, or its quantity incremented, by a single upsert
+    (`INSERT ... ON CONFLICT DO UPDATE SET quantity = quantity + ...`) on
+    the unique (cart, product) pair, so two tabs adding the same product at
+    once both count. Neither the user nor the product is loaded first.
+    """
+    if quantity <= 0:
+        raise Exception("Quantity must be positive.")
+    try:
+        with transaction.atomic():
+            upserted = _upsert_item(user_id, product_id, quantity)
+            if upserted is None:
+                Cart.objects.create(user=get_user_model().objects.get(id=user_id))
+                upserted = _upsert_item(user_id, product_id, quantity)
+            cart_id, new_quantity = upserted
+            check_stock(product_id, new_quantity)
+            # Existing items hold at least one unit, so only a new item ends up with exactly `quantity`
+            price = Subquery(Product.objects.filter(id=product_id).values("price"))
+            adjust_totals(cart_id, items=int(new_quantity == quantity), quantity=quantity, price=price * quantity)
+    except IntegrityError:
+        # The price subquery is NULL for a missing product
+        raise Exception("Product does not exist.")
+    return Cart.objects.select_related("user").get(id=cart_id)
+
+
+def _upsert_item(user_id, product_id, quantity):
+    """Upsert the item into the user's first cart, returning `(cart id, new quantity)` or None without a cart."""
+    quote = connection.ops.quote_name
+    item, cart = quote(CartItem._meta.db_table), quote(Cart._meta.db_table)
+    with connection.cursor() as cursor:
+        # Supported by PostgreSQL and SQLite 3.35+. SQLite needs the WHERE
+        # clause to tell ON CONFLICT apart from a join constraint.
+        cursor.execute(f"""
+            INSERT INTO {item} (cart_id, product_id, quantity)
+            SELECT id, %s, %s FROM {cart} WHERE user_id = %s ORDER BY id LIMIT 1
+            ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = {item}.quantity + excluded.quantity
+            RETURNING cart_id, quantity
+        """, [product_id, quantity, user_id])
+        return cursor.fetchone()
+
+
+def update_item(user_id, product_id, quantity):
+    """Set the quantity of an item of the user's cart, removing it when `quantity` is not positive."""
+    with transaction.atomic():
+        cart_item = (
+            CartItem.objects.select_for_update(of=("self",)).select_related("product")
+            .get(cart__user_id=user_id, product_id=product_id)
+        )
+        price = cart_item.product.price
+        if quantity > 0:
+            check_stock(product_id, quantity)
+            delta = quantity - cart_item.quantity
+            CartItem.objects.filter(id=cart_item.id).update(quantity=quantity)
+            adjust_totals(cart_item.cart_id, quantity=delta, price=delta * price)
+        else:
+            cart_item.delete()
+            adjust_totals(cart_item.cart_id, items=-1, quantity=-cart_item.quantity, price=-cart_item.quantity * price)
+    return Cart.objects.select_related("user").get(id=cart_item.cart_id)
+
+
+def remove_item(user_id, product_id):
+    return update_item(user_id, product_id, 0)
+
+
+def sync_items(user_id, lines, replace=False):
+    """
+    Apply many cart changes at once and return the cart.
+
+    `lines` are `(product id, quantity)` pairs setting the quantity of a
+    product, with 0 removing it; when a product is listed twice the last
+    line wins. With `replace`, products that are not listed are removed too,
+    which restores a saved cart as is. Everything happens in one transaction:
+    one query validates the products and their stock, one DELETE and one
+    upsert apply the lines, and one UPDATE recomputes the totals.
+    """
+    quantities = dict(lines)
+    if any(quantity < 0 for quantity in quantities.values()):
+        raise Exception("Quantity cannot be negative.")
+    wanted = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+
+    with transaction.atomic():
+        cart = Cart.objects.select_related("user").filter(user_id=user_id).order_by("id").first()
+        if cart is None:
+            cart = Cart.objects.create(user=get_user_model().objects.get(id=user_id))
+
+        found = dict(Product.objects.filter(id__in=wanted).values_list("id", "stock__quantity"))
+        if len(found) != len(wanted):
+            raise Exception("Product does not exist.")
+        if any(found[product_id] is not None and found[product_id] < quantity for product_id, quantity in wanted.items()):
+            raise Exception("Not enough stock for this product.")
+
+        if replace:
+            removed = CartItem.objects.filter(cart=cart).exclude(product_id__in=wanted)
+        else:
+            removed = CartItem.objects.filter(cart=cart, product_id__in=quantities.keys() - wanted.keys())
+        removed.delete()
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in wanted.items()],
+            update_conflicts=True,
+            unique_fields=["cart", "product"],
+            update_fields=["quantity"],
+        )
+        recompute_totals(Cart.objects.filter(id=cart.id))
+    cart.refresh_from_db(fields=["item_count", "total_quantity", "total_price"])
+    return cart
+
+
+def computed_totals():
+    """The totals of each cart, computed from its items, as expressions for `Cart` querysets."""
+    items = CartItem.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+    price = DecimalField(max_digits=12, decimal_places=2)
+    return {
+        "item_count": Coalesce(Subquery(items.annotate(total=Count("id")).values("total")), 0),
+        "total_quantity": Coalesce(Subquery(items.annotate(total=Sum("quantity")).values("total")), 0),
+        "total_price": Coalesce(
+            Subquery(items.annotate(total=Sum(F("quantity") * F("product__price"), output_field=price)).values("total")),
+            Value(Decimal("0")),
+            output_field=price,
+        ),
+    }
+
+
+def recompute_totals(carts=None):
+    """Recompute the stored totals of `carts` (all carts by default) from their items, in one UPDATE."""
+    carts = Cart.objects.all() if carts is None else carts
+    return carts.update(**computed_totals())
+
+
+def stale_carts():
+    """Carts whose stored totals don't match their items."""
+    totals = computed_totals()
+    return Cart.objects.annotate(**{f"actual_{field}": expression for field, expression in totals.items()}).exclude(
+        **{field: F(f"actual_{field}") for field in totals}
+    )
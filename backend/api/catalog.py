@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import CATALOG_CACHE_REQUESTS
+from .models import Category, Product
+
+VERSION_KEY = "catalog:version"
+
+
+class CatalogCache:
+    """
+    Read-through cache of the catalog, invalidated by bumping a version number.
+
+    Values are stored under keys that include the current catalog version, so
+    invalidating everything is a single increment instead of a key scan; the
+    entries of older versions are never read again and simply age out.
+
+    Lookups go through a small in-process LRU first and then, when the
+    `CATALOG_CACHE_ALIAS` setting names one of `CACHES`, through that shared
+    cache. The version lives in the shared cache too, which is what lets an
+    edit made by one worker invalidate the local tier of every other worker.
+    Without a shared tier the version is per-process, which is only correct
+    with a single worker; `api.checks` refuses to start several without one.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Seeded from the clock, so a version key that was evicted from the
+        # shared cache never comes back with a number that was already used
+        self._version = time.time_ns()
+
+    @property
+    def shared(self):
+        alias = getattr(settings, "CATALOG_CACHE_ALIAS", None)
+        return caches[alias] if alias else None
+
+    def version(self):
+        shared = self.shared
+        if shared is None:
+            return self._version
+        version = shared.get(VERSION_KEY)
+        if version is None:
+            shared.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = shared.get(VERSION_KEY, self._version)
+        return version
+
+    def invalidate(self):
+        shared = self.shared
+        if shared is not None:
+            try:
+                shared.incr(VERSION_KEY)
+            except ValueError:
+                shared.set(VERSION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get_or_load(self, key, load):
+        version = self.version()
+        local_key = (version, key)
+        with self._lock:
+            if local_key in self._entries:
+                self._entries.move_to_end(local_key)
+                CATALOG_CACHE_REQUESTS.inc(tier="local", result="hit")
+                return self._entries[local_key]
+        CATALOG_CACHE_REQUESTS.inc(tier="local", result="miss")
+
+        shared = self.shared
+        value = None
+        if shared is not None:
+            shared_key = f"catalog:{version}:{key}"
+            value = shared.get(shared_key)
+            CATALOG_CACHE_REQUESTS.inc(tier="shared", result="miss" if value is None else "hit")
+        if value is None:
+            value = load()
+            if shared is not None:
+                shared.set(shared_key, value, getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+
+        with self._lock:
+            self._entries[local_key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def categories(self):
+        return self.get_or_load("categories", lambda: list(Category.objects.order_by("id")))
+
+    def products(self):
+        return self.get_or_load("products", lambda: list(Product.objects.order_by("id")))
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries only one process can see
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_catalog_cache(app_configs, **kwargs):
+    """
+    Fail when several workers would each keep their own catalog version.
+
+    An edit made through one worker bumps the version of that worker only,
+    and the others would serve the old catalog until restarted. gunicorn
+    reads its worker count from WEB_CONCURRENCY.
+    """
+    try:
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    except ValueError:
+        return []
+    if workers <= 1:
+        return []
+    alias = settings.CATALOG_CACHE_ALIAS
+    backend = settings.CACHES[alias]["BACKEND"] if alias in settings.CACHES else None
+    if backend is not None and backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"{workers} workers would each keep their own catalog cache, so edits made through one would not reach the others.",
+        hint="Set REDIS_URL, or CATALOG_CACHE_ALIAS to a cache in CACHES that all workers share, or run a single worker.",
+        id="api.E001",
+    )]
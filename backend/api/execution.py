@@ -0,0 +1,62 @@
+"""
+One set of async resolvers, executed with or without an event loop.
+
+Under ASGI, `AsyncGraphQLView` runs the resolvers in the server's event loop
+and their ORM calls go through `sync_to_async`. Under WSGI every one of
+those calls would be a handoff to another thread and back, for a worker
+that serves one request at a time anyway: the load test of `manage.py
+loadtest` measured half the throughput of sync resolvers. `GraphQLView`
+therefore executes the same schema synchronously there:
+`InlineResolversExtension` steps each resolver's coroutine to completion in
+the request's thread, and `run_sync` calls the ORM in place when no event
+loop is running.
+
+Resolvers must reach the database through `run_sync` (not `aget`, `afirst`,
+async iteration, ...) and await nothing else that would suspend them.
+"""
+import asyncio
+import inspect
+
+from asgiref.sync import sync_to_async
+from strawberry.extensions import SchemaExtension
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def run_sync(func, *args, **kwargs):
+    """Call the blocking `func` from a resolver: in a worker thread under an event loop, in place otherwise."""
+    if in_event_loop():
+        return await sync_to_async(func)(*args, **kwargs)
+    return func(*args, **kwargs)
+
+
+def complete(awaitable):
+    """Run a coroutine that never suspends, such as a resolver outside an event loop, and return its result."""
+    coroutine = awaitable.__await__()
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    coroutine.close()
+    raise RuntimeError("A resolver waited for something other than run_sync outside an event loop.")
+
+
+class InlineResolversExtension(SchemaExtension):
+    """
+    Complete async resolvers in place when the schema is executed without an event loop.
+
+    Must come first in the schema's extensions, so that the other extensions'
+    `resolve` hooks see the results rather than coroutines.
+    """
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        result = _next(root, info, *args, **kwargs)
+        if inspect.isawaitable(result) and not in_event_loop():
+            return complete(result)
+        return result
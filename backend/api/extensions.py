@@ -0,0 +1,476 @@
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    VariableNode,
+    get_named_type,
+    get_nullable_type,
+    is_list_type,
+    is_object_type,
+)
+from graphql.utilities import get_operation_ast
+from strawberry.extensions import SchemaExtension
+
+from . import metrics
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+logger = logging.getLogger("api.graphql")
+
+# Requests carrying this header get their query statistics in the response
+# `extensions`, with DEBUG on or from a staff user (see `debug_allowed`)
+DEBUG_HEADER = "X-Debug-Queries"
+
+# Strawberry reuses one extension instance for every request, so per-operation
+# state lives in a context variable instead of on the instance.
+_current_stats = ContextVar("query_stats", default=None)
+_cached_document = ContextVar("cached_document", default=False)
+_current_cost = ContextVar("query_cost", default=None)
+# The resolver running in the current task; concurrent async resolvers each
+# see their own, unlike a shared stack
+_current_field = ContextVar("current_field", default=None)
+
+
+class OperationStats:
+    """SQL query count, DB time and wall time of one GraphQL operation and its resolvers."""
+
+    def __init__(self, request):
+        self.operation_name = None
+        self.request = request
+        # Set once the document passed validation
+        self.valid = False
+        self.queries = 0
+        self.db_time = 0.0
+        self.total_time = 0.0
+        self.started = time.perf_counter()
+        self.resolvers = defaultdict(lambda: {"calls": 0, "queries": 0, "dbTime": 0.0, "time": 0.0})
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            # Queries are attributed to the innermost resolver that is running
+            field = _current_field.get()
+            if field is not None:
+                resolver = self.resolvers[field]
+                resolver["queries"] += 1
+                resolver["dbTime"] += elapsed
+
+    def record_resolver(self, field, started, failed=False):
+        if failed:
+            metrics.GRAPHQL_RESOLVER_ERRORS.inc(field=field)
+        resolver = self.resolvers[field]
+        resolver["calls"] += 1
+        resolver["time"] += time.perf_counter() - started
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def record_metrics(self, execution_context):
+        operation, operation_type = operation_labels(execution_context, self.valid)
+        status = "error" if execution_context.errors else "ok"
+        metrics.GRAPHQL_OPERATIONS.inc(operation=operation, type=operation_type, status=status)
+        metrics.GRAPHQL_OPERATION_DURATION.observe(self.total_time, operation=operation, type=operation_type)
+        metrics.GRAPHQL_OPERATION_QUERIES.observe(self.queries, operation=operation, type=operation_type)
+        metrics.DB_QUERIES.inc(self.queries)
+        metrics.DB_QUERY_DURATION.inc(self.db_time)
+
+    def as_dict(self):
+        return {
+            "operationName": self.operation_name,
+            "queries": self.queries,
+            "dbTime": round(self.db_time * 1000, 3),
+            "totalTime": round(self.total_time * 1000, 3),
+            "resolvers": {
+                field: {**stats, "dbTime": round(stats["dbTime"] * 1000, 3), "time": round(stats["time"] * 1000, 3)}
+                for field, stats in self.resolvers.items()
+            },
+        }
+
+
+def debug_allowed(request):
+    """
+    Whether a request sent with `DEBUG_HEADER` may see its query stats.
+
+    They reveal per-resolver SQL counts and timings, and debug requests
+    skip the response cache, so only DEBUG or a staff user's session
+    allows them. May read the session, so async views call it through
+    `sync_to_async`.
+    """
+    if settings.DEBUG:
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection (see `api.signals`).
+
+    Under ASGI, resolvers run their queries in worker threads, each with its own
+    connection, so a wrapper set up around the operation would miss them. The
+    operation's stats are found through the context, which `sync_to_async`
+    carries into those threads.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+class OperationLabels:
+    """The `operation` label values recorded so far by this process, at most `max_labels` of them."""
+
+    def __init__(self, max_labels):
+        self.max_labels = max_labels
+        self._labels = set()
+        self._lock = threading.Lock()
+
+    def get(self, label):
+        """Return `label`, or "other" once the set is full of other labels."""
+        if label in self._labels:
+            return label
+        with self._lock:
+            if len(self._labels) < self.max_labels:
+                self._labels.add(label)
+                return label
+        return "other"
+
+    def clear(self):
+        with self._lock:
+            self._labels.clear()
+
+
+operation_label_values = OperationLabels(settings.GRAPHQL_METRICS_MAX_OPERATIONS)
+
+
+def operation_labels(execution_context, valid):
+    """
+    Return the `(operation, type)` metric labels of an operation.
+
+    Operations that failed parsing or validation are labelled "invalid".
+    Valid ones are labelled with their name, or with their root fields when
+    anonymous; both come from the client, so at most
+    `GRAPHQL_METRICS_MAX_OPERATIONS` distinct labels are recorded and any
+    further operation is labelled "other".
+    """
+    document = execution_context.graphql_document
+    if document is None or not valid:
+        return "invalid", "unknown"
+    operation = get_operation_ast(document, execution_context.operation_name)
+    if operation is None:
+        return "invalid", "unknown"
+    if operation.name:
+        label = operation.name.value
+    else:
+        label = ",".join(sorted({
+            selection.name.value for selection in operation.selection_set.selections
+            if hasattr(selection, "name")
+        }))
+    return operation_label_values.get(label[:100]), operation.operation.value
+
+
+class QueryStatsExtension(SchemaExtension):
+    """
+    Record the SQL queries, DB time and total time of every operation and resolver.
+
+    Every operation emits one JSON log line on the "api.graphql" logger and
+    updates the operation, resolver error and DB metrics served at `/metrics`.
+    Requests sent with the `X-Debug-Queries` header that the view let
+    through (`request.debug_queries`, see `debug_allowed`) also get the
+    numbers in the response `extensions` under "queryStats". Times are in milliseconds;
+    resolver query counts only include queries issued while that resolver
+    itself was running.
+    """
+
+    def on_operation(self):
+        execution_context = self.execution_context
+        stats = OperationStats(getattr(execution_context.context, "request", None))
+        _current_stats.set(stats)
+        yield
+        stats.operation_name = execution_context.operation_name
+        stats.finish()
+        stats.record_metrics(execution_context)
+        logger.info(json.dumps({
+            "event": "graphql_operation",
+            "operationName": stats.operation_name,
+            "queries": stats.queries,
+            "dbTime": round(stats.db_time * 1000, 3),
+            "totalTime": round(stats.total_time * 1000, 3),
+            "resolvers": {field: resolver["queries"] for field, resolver in stats.resolvers.items() if resolver["queries"]},
+        }))
+
+    def on_validate(self):
+        yield
+        stats = _current_stats.get()
+        if stats is not None:
+            # Includes the rejections of QueryCostExtension
+            stats.valid = not self.execution_context.errors
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return _next(root, info, *args, **kwargs)
+        field = f"{info.parent_type.name}.{info.field_name}"
+        started = time.perf_counter()
+        token = _current_field.set(field)
+        try:
+            result = _next(root, info, *args, **kwargs)
+        except Exception:
+            stats.record_resolver(field, started, failed=True)
+            raise
+        finally:
+            _current_field.reset(token)
+        if inspect.isawaitable(result):
+            return self.await_resolver(result, stats, field, started)
+        stats.record_resolver(field, started)
+        return result
+
+    async def await_resolver(self, result, stats, field, started):
+        token = _current_field.set(field)
+        try:
+            value = await result
+        except Exception:
+            stats.record_resolver(field, started, failed=True)
+            raise
+        finally:
+            _current_field.reset(token)
+        stats.record_resolver(field, started)
+        return value
+
+    def get_results(self):
+        stats = _current_stats.get()
+        request = getattr(stats, "request", None)
+        if request is None or not getattr(request, "debug_queries", False):
+            return {}
+        if not stats.total_time:
+            stats.finish()
+        return {"queryStats": stats.as_dict()}
+
+
+class DocumentCacheExtension(SchemaExtension):
+    """
+    Keep the parsed documents of queries that passed validation in a bounded LRU.
+
+    A query seen before skips both parsing and validation. Only valid
+    documents are cached, so malformed requests cannot evict hot operations
+    with documents that would fail anyway. A document the response cache
+    already parsed for this request is reused, and still validated.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        with self._lock:
+            document = self._documents.get(query)
+            if document is not None:
+                self._documents.move_to_end(query)
+            return document
+
+    def put(self, query, document):
+        with self._lock:
+            self._documents[query] = document
+            self._documents.move_to_end(query)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def on_parse(self):
+        execution_context = self.execution_context
+        document = self.get(execution_context.query)
+        _cached_document.set(document is not None)
+        if document is None:
+            request = getattr(execution_context.context, "request", None)
+            parsed = getattr(request, "graphql_document", None)
+            if parsed is not None and parsed[0] == execution_context.query:
+                document = parsed[1]
+        if document is not None:
+            execution_context.graphql_document = document
+        yield
+
+    def on_validate(self):
+        execution_context = self.execution_context
+        if _cached_document.get():
+            # Already validated against this schema; an empty list tells
+            # Strawberry not to validate again
+            execution_context.errors = []
+            yield
+            return
+        yield
+        if not execution_context.errors:
+            self.put(execution_context.query, execution_context.graphql_document)
+
+
+class QueryCostExtension(SchemaExtension):
+    """
+    Reject operations that are nested too deeply or would cost too much, before they run.
+
+    Every field that returns an object costs `FIELD_COSTS.get("Type.field", 1)`
+    and scalars are free. The cost of a list field's selections is multiplied
+    by the number of rows it can return: its `first` argument (capped at the
+    maximum page size) when it has one, otherwise the expected size from
+    `LIST_SIZES`. The computed cost and depth are reported in the response
+    `extensions` under "cost".
+    """
+
+    # Fields whose resolver does more work than one batched query
+    FIELD_COSTS = {
+        "MergedQuery.searchProducts": 10,
+        "MergedMutation.placeOrder": 10,
+        # Loaded along with the images
+        "ProductImageType.variants": 0,
+    }
+    # Expected length of lists that aren't paginated
+    LIST_SIZES = {
+        "MergedQuery.products": 1000,
+        "MergedQuery.categories": 50,
+        "MergedQuery.orders": 50,
+        "ProductType.images": 2,
+    }
+    DEFAULT_LIST_SIZE = 10
+
+    def __init__(self, max_depth=10, max_cost=5000):
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+
+    def on_operation(self):
+        _current_cost.set(None)
+        yield
+
+    def on_validate(self):
+        execution_context = self.execution_context
+        operation = get_operation_ast(execution_context.graphql_document, execution_context.operation_name)
+        root = operation and execution_context.schema._schema.get_root_type(operation.operation)
+        if root is not None:
+            analysis = CostAnalysis(self, execution_context.graphql_document, execution_context.variables)
+            error = None
+            try:
+                cost, depth = analysis.selection_cost(root, operation.selection_set, 1)
+            except FragmentCycle as e:
+                # This runs before validation, which would report the same
+                execution_context.errors = [GraphQLError(f'Cannot spread fragment "{e}" within itself.')]
+            except RecursionError:
+                error = "Query is nested too deeply."
+            else:
+                _current_cost.set({"requested": cost, "maximum": self.max_cost, "depth": depth})
+                metrics.GRAPHQL_OPERATION_COST.observe(cost)
+                if depth > self.max_depth:
+                    error = f"Query depth {depth} exceeds the maximum of {self.max_depth}."
+                elif cost > self.max_cost:
+                    error = f"Query cost {cost} exceeds the maximum of {self.max_cost}."
+            if error:
+                # Strawberry skips validation and execution when errors are already set
+                execution_context.errors = [GraphQLError(error, extensions={"code": "QUERY_TOO_EXPENSIVE"})]
+        yield
+
+    def get_results(self):
+        cost = _current_cost.get()
+        return {"cost": cost} if cost is not None else {}
+
+
+class FragmentCycle(Exception):
+    """Raised with the name of a fragment that spreads itself, directly or not."""
+
+
+class CostAnalysis:
+    """
+    The cost of one operation under the weights of a `QueryCostExtension`.
+
+    Each fragment is analysed once per parent type, however often it is
+    spread, so fragments spreading other fragments several times don't
+    make the analysis exponential. Fragment cycles raise `FragmentCycle`.
+    """
+
+    def __init__(self, limits, document, variables):
+        self.limits = limits
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        # (fragment, parent type) -> (cost, depth below the spread)
+        self._fragment_costs = {}
+        self._spreading = set()
+
+    def selection_cost(self, parent_type, selection_set, depth):
+        """Return the `(cost, depth)` of a selection set on `parent_type`."""
+        cost = 0
+        max_depth = depth - 1
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self.field_cost(parent_type, selection, depth)
+            elif isinstance(selection, FragmentSpreadNode):
+                field_cost, field_depth = self.fragment_cost(parent_type, selection.name.value, depth)
+            else:
+                field_cost, field_depth = self.selection_cost(parent_type, selection.selection_set, depth)
+            cost += field_cost
+            max_depth = max(max_depth, field_depth)
+        return cost, max_depth
+
+    def fragment_cost(self, parent_type, name, depth):
+        key = (name, parent_type.name)
+        if key not in self._fragment_costs:
+            fragment = self.fragments.get(name)
+            if fragment is None:
+                # Unknown fragments are left to validation
+                return 0, depth - 1
+            if name in self._spreading:
+                raise FragmentCycle(name)
+            self._spreading.add(name)
+            try:
+                cost, max_depth = self.selection_cost(parent_type, fragment.selection_set, depth)
+            finally:
+                self._spreading.discard(name)
+            self._fragment_costs[key] = (cost, max_depth - depth)
+        cost, relative_depth = self._fragment_costs[key]
+        return cost, depth + relative_depth
+
+    def field_cost(self, parent_type, node, depth):
+        name = node.name.value
+        # Introspection is answered from the schema without touching the database
+        if name.startswith("__"):
+            return 0, depth
+        field = parent_type.fields.get(name)
+        if field is None or node.selection_set is None:
+            # Unknown fields are left to validation; scalars are free
+            return 0, depth
+        field_type = get_named_type(field.type)
+        if not is_object_type(field_type):
+            return 0, depth
+
+        key = f"{parent_type.name}.{name}"
+        child_cost, child_depth = self.selection_cost(field_type, node.selection_set, depth + 1)
+        return self.limits.FIELD_COSTS.get(key, 1) + self.list_size(key, parent_type, field, node) * child_cost, child_depth
+
+    def list_size(self, key, parent_type, field, node):
+        if "first" in field.args:
+            first = None
+            for argument in node.arguments:
+                if argument.name.value == "first":
+                    value = argument.value
+                    first = self.variables.get(value.name.value) if isinstance(value, VariableNode) else getattr(value, "value", None)
+            try:
+                first = DEFAULT_PAGE_SIZE if first is None else int(first)
+            except (TypeError, ValueError):
+                first = DEFAULT_PAGE_SIZE
+            return max(0, min(first, MAX_PAGE_SIZE))
+        # The edges of a connection were already counted through its `first`
+        if not is_list_type(get_nullable_type(field.type)) or parent_type.name.endswith("Connection"):
+            return 1
+        return self.limits.LIST_SIZES.get(key, self.limits.DEFAULT_LIST_SIZE)
@@ -0,0 +1,146 @@
+"""
+CSV parsing for the catalog importer (`manage.py seed`).
+
+Nothing in this module touches Django models or the database, so it can be
+imported by the worker processes of `seed --workers N`, which only parse rows
+and hand the results back to the parent process for writing.
+"""
+import ast
+import csv
+import io
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def parse_row(row):
+    """
+    Turn one CSV row into the fields of a Product.
+
+    Returns a dict with the product fields and the name of its category in
+    place of the category itself. Raises ValueError for malformed rows,
+    including rows that miss some of the columns.
+    """
+    try:
+        images = ast.literal_eval(row['Product Image'])
+        image1 = next(iter(images[0]))
+        image2 = next(iter(images[1]))
+        price = Decimal(row['Price'].strip('₹').replace(',', ''))
+        return {
+            'name': row['Product Name'],
+            'price': price,
+            'description': row['Details'],
+            'image1': image1,
+            'image2': image2,
+            'category': row['Categories'].split(', ')[0],
+            'gender': row['Gender'],
+        }
+    except (KeyError, SyntaxError, ValueError, TypeError, AttributeError, IndexError, StopIteration, InvalidOperation) as e:
+        raise ValueError(f"Invalid row {row.get('ID')}: {e!r}")
+
+
+def read_header(path):
+    """Return the column names and the byte offset of the first data record."""
+    with open(path, 'rb') as f:
+        _, record = next(read_records(f, 0, os.path.getsize(path)))
+    fieldnames = next(csv.reader(io.StringIO(record)))
+    return fieldnames, len(record.encode('utf-8'))
+
+
+def read_records(f, start, end):
+    """
+    Yield `(end_offset, text)` for every CSV record in the byte range [start, end).
+
+    Quoted fields may contain newlines, so physical lines are joined until the
+    number of double quotes seen is even, which is exactly when the record is
+    complete (escaped quotes come in pairs).
+    """
+    f.seek(start)
+    record, quotes = [], 0
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            break
+        record.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield f.tell(), b''.join(record).decode('utf-8')
+            record, quotes = [], 0
+
+
+def shard_boundaries(path, start, shards):
+    """
+    Split the byte range from `start` to the end of the file into `shards` ranges.
+
+    Every boundary is moved forward to the end of a record, found by tracking
+    the parity of the double quotes seen since `start`, so no record is split
+    between two shards. Returns a list of `(start, end)` tuples.
+    """
+    size = os.path.getsize(path)
+    targets = [start + (size - start) * i // shards for i in range(1, shards)]
+    boundaries = [start]
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position, quotes = start, 0
+        while targets:
+            block = f.read(BLOCK_SIZE)
+            if not block:
+                break
+            search_from = 0
+            while targets:
+                offset = max(targets[0] - position, search_from)
+                newline = block.find(b'\n', offset)
+                if newline == -1:
+                    break
+                if (quotes + block.count(b'"', 0, newline)) % 2 == 0:
+                    boundary = position + newline + 1
+                    if boundary > boundaries[-1]:
+                        boundaries.append(boundary)
+                    targets.pop(0)
+                search_from = newline + 1
+            quotes += block.count(b'"')
+            position += len(block)
+    boundaries.append(size)
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if a < b]
+
+
+def parse_shard(path, shard, start, end, fieldnames, chunk_size, queue):
+    """
+    Parse the records of one shard and put them on `queue` in chunks.
+
+    Messages are `("chunk", shard, end_offset, rows, products, errors)` for
+    every chunk followed by `("done", shard, rows, seconds)`, where `seconds`
+    is the time spent parsing (not waiting on the queue). Any exception is
+    reported as `("error", shard, message)`.
+    """
+    try:
+        rows = 0
+        parse_time = 0.0
+        with open(path, 'rb') as f:
+            products, errors, count = [], [], 0
+            started = time.perf_counter()
+            for offset, record in read_records(f, start, end):
+                values = next(csv.reader(io.StringIO(record)))
+                # Blank lines, skipped like csv.DictReader does
+                if not values:
+                    continue
+                try:
+                    products.append(parse_row(dict(zip(fieldnames, values))))
+                except ValueError as e:
+                    errors.append(str(e))
+                count += 1
+                if count == chunk_size:
+                    parse_time += time.perf_counter() - started
+                    queue.put(("chunk", shard, offset, count, products, errors))
+                    rows += count
+                    products, errors, count = [], [], 0
+                    started = time.perf_counter()
+            parse_time += time.perf_counter() - started
+            if count:
+                queue.put(("chunk", shard, offset, count, products, errors))
+                rows += count
+        queue.put(("done", shard, rows, parse_time))
+    except Exception as e:
+        queue.put(("error", shard, repr(e)))
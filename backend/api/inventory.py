@@ -0,0 +1,55 @@
+import operator
+from functools import reduce
+
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+
+from .models import ProductStock
+
+
+def tracked_quantities(cart_items):
+    """
+    Sum the requested quantity per stock-tracked product.
+
+    The cart items must have been loaded with `select_related("product__stock")`.
+    """
+    quantities = {}
+    for item in cart_items:
+        if hasattr(item.product, "stock"):
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+
+def reserve_stock(quantities):
+    """
+    Decrement the stock of every product in `quantities` ({product_id: quantity}).
+
+    The stock rows are first locked in product order, so two checkouts
+    sharing products queue on the first one rather than deadlocking, then
+    all are updated by a single conditional UPDATE that only touches rows
+    which still have enough units and can never drive the stock below zero.
+    If any product is short the whole reservation fails; callers must run
+    this inside a transaction so that the rows which were decremented are
+    rolled back.
+    """
+    if not quantities:
+        return
+    # The UPDATE would lock rows in whatever order its plan visits them
+    list(ProductStock.objects.select_for_update().filter(product_id__in=quantities).order_by("product_id").values_list("product_id", flat=True))
+    enough_stock = reduce(operator.or_, (
+        Q(product_id=product_id, quantity__gte=quantity)
+        for product_id, quantity in quantities.items()
+    ))
+    decrement = Case(
+        *(When(product_id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()),
+        output_field=PositiveIntegerField(),
+    )
+    updated = ProductStock.objects.filter(enough_stock).update(quantity=F("quantity") - decrement)
+    if updated != len(quantities):
+        raise Exception("Not enough stock to place this order.")
+
+
+def check_stock(product_id, quantity):
+    """Raise if a stock-tracked product has fewer than `quantity` units left."""
+    available = ProductStock.objects.filter(product_id=product_id).values_list("quantity", flat=True).first()
+    if available is not None and available < quantity:
+        raise Exception("Not enough stock for this product.")
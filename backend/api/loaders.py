@@ -0,0 +1,129 @@
+import asyncio
+
+from .blobs import blob_name
+from .execution import run_sync
+from .models import Category, Product, ProductImageVariant, CartItem, OrderItem
+
+
+class ModelLoader:
+    """
+    Per-request batching loader for the rows of one model.
+
+    Keys are collected with `enqueue()` (usually by the resolver that returns
+    the parent list) and fetched together with a single `IN (...)` query the
+    first time any of them is requested through `load()`. Results are cached
+    for the rest of the request, so repeated lookups never hit the database.
+
+    Resolvers of sibling list items run concurrently; while a batch is being
+    fetched, other `load()` calls wait for it instead of querying again.
+    """
+
+    def __init__(self, queryset, field="pk", many=False, on_load=None):
+        self.queryset = queryset
+        self.field = field
+        self.many = many
+        self.on_load = on_load
+        self._cache = {}
+        self._pending = set()
+        self._inflight = None
+
+    def enqueue(self, keys):
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._pending.add(key)
+
+    def prime(self, key, value):
+        self._cache[key] = value
+        self._pending.discard(key)
+
+    async def load(self, key):
+        if key not in self._cache:
+            self._pending.add(key)
+            await self.dispatch()
+        return self._cache[key]
+
+    async def load_many(self, keys):
+        keys = list(keys)
+        self.enqueue(keys)
+        await self.dispatch()
+        return [self._cache[key] for key in keys]
+
+    async def dispatch(self):
+        while self._inflight is not None:
+            await self._inflight.wait()
+        self._pending.difference_update(self._cache.keys())
+        if not self._pending:
+            return
+        keys, self._pending = self._pending, set()
+        self._inflight = asyncio.Event()
+        try:
+            rows = await run_sync(list, self.queryset.filter(**{f"{self.field}__in": keys}))
+            for key in keys:
+                self._cache[key] = [] if self.many else None
+            for row in rows:
+                key = getattr(row, self.field)
+                if self.many:
+                    self._cache[key].append(row)
+                else:
+                    self._cache[key] = row
+            if self.on_load is not None:
+                self.on_load(rows)
+        finally:
+            inflight, self._inflight = self._inflight, None
+            inflight.set()
+
+
+class Loaders:
+    """
+    The loaders shared by every resolver of a single GraphQL request.
+
+    Loading products enqueues their categories and image variants, and
+    loading cart or order items enqueues their products, so a nested
+    selection such as
+    `orders { orderItems { product { category { name } } } }` costs one query
+    per level no matter how many rows are returned.
+    """
+
+    def __init__(self):
+        self.categories = ModelLoader(Category.objects.all())
+        # Keyed by the blob name of the original image
+        self.image_variants = ModelLoader(
+            ProductImageVariant.objects.order_by("format", "width"),
+            field="source",
+            many=True,
+        )
+        self.products = ModelLoader(Product.objects.all(), on_load=self.enqueue_products)
+        self.cart_items = ModelLoader(
+            CartItem.objects.order_by("id"),
+            field="cart_id",
+            many=True,
+            on_load=lambda rows: self.products.enqueue(row.product_id for row in rows),
+        )
+        self.order_items = ModelLoader(
+            OrderItem.objects.order_by("id"),
+            field="order_id",
+            many=True,
+            on_load=lambda rows: self.products.enqueue(row.product_id for row in rows),
+        )
+
+    def enqueue_products(self, products):
+        """Enqueue the categories and image variants of products about to be resolved."""
+        products = list(products)
+        self.categories.enqueue(product.category_id for product in products)
+        self.image_variants.enqueue(blob_name(image) for product in products for image in (product.image1, product.image2))
+
+    def prime_order_items(self, order_id, items):
+        """Prime the items of an order, loaded along with their products and categories."""
+        self.order_items.prime(order_id, items)
+        for item in items:
+            self.products.prime(item.product_id, item.product)
+            self.categories.prime(item.product.category_id, item.product.category)
+
+
+def get_loaders(info):
+    """Return the loaders attached to the request context, creating them if needed."""
+    loaders = getattr(info.context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(info.context, "loaders", loaders)
+    return loaders
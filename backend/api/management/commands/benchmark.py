@@ -0,0 +1,83 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from api import benchmark
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        operation, _, weight = part.partition('=')
+        if operation not in benchmark.DEFAULT_MIX or not weight.isdigit():
+            raise CommandError(f"Invalid mix entry '{part}', expected <operation>=<weight> with an operation "
+                               f"among {', '.join(benchmark.DEFAULT_MIX)}")
+        mix[operation] = int(weight)
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database with a synthetic storefront and measure throughput, '
+            'latency percentiles and query counts of the main GraphQL operations')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20, help='Categories to seed')
+        parser.add_argument('--products', type=int, default=500, help='Products to seed')
+        parser.add_argument('--users', type=int, default=50, help='Customers to seed')
+        parser.add_argument('--requests', type=int, default=1000, help='Operations to measure')
+        parser.add_argument('--warmup', type=int, default=50, help='Operations run before measuring')
+        parser.add_argument('--mix', type=parse_mix, default=benchmark.DEFAULT_MIX,
+                            help='Weights of the operations, e.g. browse=50,addToCart=20,updateCart=10,'
+                                 'placeOrder=5,orderHistory=15')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable runs')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with the results stored in this JSON file')
+        parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE,
+                            help='Relative p95 latency increase tolerated before flagging a regression')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        # Like the test runner: a fresh database next to the configured one, dropped
+        # afterwards, and the in-memory email backend
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            rng = random.Random(options['seed'])
+            product_ids, user_ids = benchmark.seed(options['categories'], options['products'], options['users'], rng)
+            workload = benchmark.Workload(product_ids, user_ids, rng)
+            results = benchmark.run(workload, options['mix'], options['requests'], options['warmup'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        results['settings'] = {
+            name: options[name] for name in ('categories', 'products', 'users', 'requests', 'warmup', 'mix', 'seed')
+        }
+        results['settings']['database'] = connection.vendor
+
+        self.stdout.write(f"{options['requests']} operations in {results['elapsed']:.2f}s ({results['throughput']} ops/s)")
+        for operation, stats in results['operations'].items():
+            self.stdout.write(
+                f"{operation}: {stats['count']} ops ({stats['throughput']} ops/s), p50 {stats['p50']}ms, "
+                f"p95 {stats['p95']}ms, p99 {stats['p99']}ms, {stats['queries']} queries/op "
+                f"(max {stats['maxQueries']}), errors: {stats['errors']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,43 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from api.catalog import catalog_cache
+from api.loaders import Loaders
+from api.schema import schema
+
+CATALOG = '{ categories { id name } products { id name price category { name } } }'
+
+
+class Command(BaseCommand):
+    help = 'Compare catalog reads with a cold and a warm catalog cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reads', type=int, default=200, help='Catalog reads per run')
+
+    def handle(self, *args, **options):
+        for label, cold in (('cold', True), ('warm', False)):
+            catalog_cache.invalidate()
+            if not cold:
+                self.read()
+            elapsed = 0.0
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(options['reads']):
+                    if cold:
+                        catalog_cache.invalidate()
+                    started = time.perf_counter()
+                    products = self.read()
+                    elapsed += time.perf_counter() - started
+            self.stdout.write(
+                f"{label}: {options['reads']} reads of {products} products in {elapsed:.2f}s "
+                f"({elapsed / options['reads'] * 1000:.2f} ms/read, {options['reads'] / elapsed:.0f} reads/s, "
+                f"{len(queries) / options['reads']:.1f} queries/read)"
+            )
+
+    def read(self):
+        result = schema.execute_sync(CATALOG, context_value=SimpleNamespace(loaders=Loaders()))
+        if result.errors:
+            raise result.errors[0]
+        return len(result.data['products'])
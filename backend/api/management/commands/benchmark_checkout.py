@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from api.models import Category, Product, ProductStock, Profile, Cart, CartItem, Order
+from api.schema import schema
+
+PLACE_ORDER = "mutation ($userId: Int!) { placeOrder(userId: $userId) { id } }"
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent place_order calls against one stock-tracked product and report throughput and correctness'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Number of customers checking out')
+        parser.add_argument('--stock', type=int, default=100, help='Units of the hot product in stock')
+        parser.add_argument('--quantity', type=int, default=1, help='Units of the hot product in every cart')
+        parser.add_argument('--threads', type=int, default=16, help='Number of concurrent checkout threads')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        category = Category.objects.create(name=f'benchmark-{tag}')
+        product = Product.objects.create(name=f'Hot SKU {tag}', description='', price=100, category=category, gender='Male')
+        ProductStock.objects.create(product=product, quantity=options['stock'])
+
+        user_ids = []
+        for i in range(options['orders']):
+            user = User.objects.create_user(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.com', password=None)
+            Profile.objects.create(user=user, username=user.username, email=user.email, address='', first_name='', last_name='', phone_number='')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, quantity=options['quantity'])
+            user_ids.append(user.id)
+
+        results = {'placed': 0, 'out_of_stock': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def checkout(ids):
+            for user_id in ids:
+                result = schema.execute_sync(PLACE_ORDER, variable_values={'userId': user_id}, context_value=SimpleNamespace())
+                if not result.errors:
+                    outcome = 'placed'
+                elif 'Not enough stock' in result.errors[0].message:
+                    outcome = 'out_of_stock'
+                else:
+                    outcome = 'errors'
+                with lock:
+                    results[outcome] += 1
+            connection.close()
+
+        threads = [
+            threading.Thread(target=checkout, args=(user_ids[i::options['threads']],))
+            for i in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        remaining = ProductStock.objects.get(product=product).quantity
+        orders = Order.objects.filter(order_items__product=product).count()
+        expected = min(options['orders'], options['stock'] // options['quantity'])
+        correct = (
+            orders == results['placed'] and
+            remaining == options['stock'] - orders * options['quantity'] and
+            (results['errors'] > 0 or orders == expected)
+        )
+
+        self.stdout.write(f"Checkouts: {options['orders']} over {options['threads']} threads in {elapsed:.2f}s "
+                          f"({options['orders'] / elapsed:.1f} checkouts/s)")
+        self.stdout.write(f"Placed: {results['placed']}, out of stock: {results['out_of_stock']}, errors: {results['errors']}")
+        self.stdout.write(f"Stock: {options['stock']} -> {remaining}")
+        if correct:
+            self.stdout.write(self.style.SUCCESS('No overselling detected'))
+        else:
+            self.stdout.write(self.style.ERROR('Stock and orders do not match'))
+
+        User.objects.filter(username__startswith=f'bench-{tag}-').delete()
+        category.delete()
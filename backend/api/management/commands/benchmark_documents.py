@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from graphql import parse, specified_rules, validate
+from api.extensions import DocumentCacheExtension
+from api.schema import schema
+
+# Operations shaped like the ones the storefront sends
+OPERATIONS = {
+    'catalog': '''
+        query Catalog($first: Int, $after: String, $orderBy: ProductOrder) {
+          categories { id name description }
+          productsConnection(first: $first, after: $after, orderBy: $orderBy) {
+            edges { cursor node { id name description price image1 image2 gender category { id name } } }
+            pageInfo { hasNextPage endCursor }
+          }
+        }
+    ''',
+    'cart': '''
+        query Cart($userId: Int!) {
+          cart(userId: $userId) {
+            id createdAt user
+            items { id quantity subtotal product { id name price image1 category { name } } }
+          }
+        }
+    ''',
+    'placeOrder': '''
+        mutation PlaceOrder($userId: Int!) {
+          placeOrder(userId: $userId) {
+            id totalPrice status createdAt user
+            orderItems { id quantity price product { id name } }
+          }
+        }
+    ''',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure the parse and validation time that the document cache removes from each request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Repetitions per operation')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        graphql_schema = schema._schema
+        cache = DocumentCacheExtension()
+
+        for name, query in OPERATIONS.items():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                document = parse(query)
+            parse_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                errors = validate(graphql_schema, document, specified_rules)
+            validate_time = time.perf_counter() - started
+            if errors:
+                raise errors[0]
+
+            cache.put(query, document)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                cache.get(query)
+            lookup_time = time.perf_counter() - started
+
+            cold = (parse_time + validate_time) / iterations * 1e6
+            warm = lookup_time / iterations * 1e6
+            self.stdout.write(
+                f'{name}: parse {parse_time / iterations * 1e6:.1f}us + validate {validate_time / iterations * 1e6:.1f}us '
+                f'= {cold:.1f}us per request, cached lookup {warm:.2f}us ({cold / warm:.0f}x faster)'
+            )
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from api import blobs
+
+
+class Command(BaseCommand):
+    help = 'Delete the content-addressed media files that no profile or product uses any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unused files stored more recently than this, as they may be about to be used')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recount the references to every file from the profiles and products first')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the files that would be deleted')
+
+    def handle(self, *args, **options):
+        if options['recount'] and not options['dry_run']:
+            self.stdout.write(f'Fixed the reference counts of {blobs.recount()} file(s)')
+
+        garbage = blobs.collect(timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+        for name in garbage:
+            self.stdout.write(name)
+        action = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(f'{len(garbage)} unused file(s) {action}'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api import variants
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Render the resized copies of the product images that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Render the images in this many processes')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        images = Product.objects.values_list('image1', 'image2')
+        sources = variants.missing_sources(image for pair in images for image in pair)
+        done = failed = 0
+        for source, error in variants.generate(sources, options['workers']):
+            if error is None:
+                done += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'{source}: {error}'))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered the variants of {done} images ({failed} failures) in {elapsed:.2f}s '
+            f'({done / elapsed if elapsed else 0:.1f} images/s)'
+        ))
@@ -0,0 +1,125 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.benchmark import percentile
+
+# Reads the catalog and a customer's orders; the private `orders` field keeps
+# the response cache out of the measurement
+QUERY = '''
+query LoadTest {
+  productsConnection(first: 20) { edges { node { id name price category { name } } } }
+  orders(userId: 1) { id orderItems { quantity product { name } } }
+}
+'''
+
+SERVERS = {
+    'wsgi': ['api.wsgi:application'],
+    'asgi': ['api.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Load test the GraphQL endpoint, by default comparing gunicorn sync workers with '
+            'uvicorn workers serving the ASGI application at the same number of workers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Load test an already running server instead of starting the two servers')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes of each server')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per run')
+        parser.add_argument('--query', default=QUERY, help='GraphQL query to send')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            self.report(options['url'], self.run(options['url'], options))
+            return
+
+        for name, command in SERVERS.items():
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn'] + command + ['--bind', f'127.0.0.1:{port}', '--workers', str(options['workers'])],
+                cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                url = f'http://127.0.0.1:{port}/graphql/'
+                wait_until_ready(url, server)
+                self.report(f"{name} ({options['workers']} workers)", self.run(url, options))
+            finally:
+                server.terminate()
+                server.wait()
+
+    def run(self, url, options):
+        # Sent as GET, which needs no CSRF token
+        url = f"{url}?{urllib.parse.urlencode({'query': options['query']})}"
+        headers = {'X-Forwarded-Proto': 'https'}
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+        remaining = iter(range(options['requests']))
+
+        def client():
+            nonlocal errors
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                request = urllib.request.Request(url, headers=headers)
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=60) as response:
+                        ok = 'errors' not in json.loads(response.read())
+                except (OSError, ValueError):
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += not ok
+
+        threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, sorted(latencies), errors
+
+    def report(self, label, result):
+        elapsed, latencies, errors = result
+        self.stdout.write(
+            f'{label}: {len(latencies)} requests in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s), '
+            f'p50 {percentile(latencies, 50) * 1000:.1f}ms, p95 {percentile(latencies, 95) * 1000:.1f}ms, '
+            f'p99 {percentile(latencies, 99) * 1000:.1f}ms, errors: {errors}'
+        )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError(f'The server exited with status {server.returncode}; are gunicorn and uvicorn installed?')
+        try:
+            urllib.request.urlopen(url.replace('/graphql/', '/metrics'), timeout=1).close()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'The server did not start within {timeout}s')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from api.carts import recompute_totals, stale_carts
+from api.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Recompute the item count, total quantity and total price stored on every cart from its items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Carts updated per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the carts whose totals are wrong')
+
+    def handle(self, *args, **options):
+        stale = stale_carts().count()
+        if options['dry_run']:
+            self.stdout.write(f'{stale} cart(s) with wrong totals')
+            return
+
+        # Id ranges keep each UPDATE, and the row locks it holds, short
+        batch_size = options['batch_size']
+        last_id = Cart.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            updated += recompute_totals(Cart.objects.filter(id__gt=start, id__lte=start + batch_size))
+        self.stdout.write(self.style.SUCCESS(f'Recomputed the totals of {updated} cart(s), {stale} of which were wrong'))
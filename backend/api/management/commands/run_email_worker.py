@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api.metrics import REGISTRY
+from api.utils.email import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per SMTP connection')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                sent, failed = deliver_outbox(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                # Lets /metrics report send latency when METRICS_DIR is shared with the web workers
+                REGISTRY.maybe_flush()
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent}, failed {failed}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        REGISTRY.flush()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {total_sent} emails ({total_failed} failures) in {elapsed:.2f}s '
+            f'({total_sent / elapsed if elapsed else 0:.1f} emails/s)'
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api.utils.images import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate the thumbnails of uploaded profile images, and the missed variants of product images, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10, help='Images processed per transaction')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait when no image is waiting')
+        parser.add_argument('--once', action='store_true', help='Process the waiting images once and exit')
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                done, failed = generate_thumbnails(options['batch_size'])
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    self.stdout.write(f'Generated {done}, failed {failed}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated the thumbnails of {total_done} images ({total_failed} failures) in {elapsed:.2f}s'
+        ))
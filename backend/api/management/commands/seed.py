@@ -1,64 +1,209 @@
 import csv
 import os
-import ast
-from django.core.management.base import BaseCommand
-from api.models import Product, Category
+import time
+import multiprocessing
+from itertools import islice
+from queue import Empty
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import F
+from api import blobs
+from api.catalog import catalog_cache
+from api.importer import parse_row, parse_shard, read_header, shard_boundaries
+from api.models import Product, Category, ImportCheckpoint
+
+DEFAULT_CSV_FILE = os.path.join(os.path.dirname(__file__), 'Dataset_cartify.csv')
+
+UPDATE_FIELDS = ['price', 'description', 'image1', 'image2', 'category', 'gender']
+
+
+def resolve_categories(names, cache):
+    """Map category names to Category rows, creating the missing ones in bulk."""
+    missing = set(names) - cache.keys()
+    if missing:
+        Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+        cache.update(Category.objects.filter(name__in=missing).in_bulk(field_name='name'))
+    return cache
+
+
+def store_images(products, images_dir, stored):
+    """
+    Copy the local image files of parsed products into the blob storage,
+    replacing their paths (relative to `images_dir`) with the blob URLs.
+
+    Remote URLs and missing files are left as they are. `stored` maps the
+    paths already copied during this import to their URLs.
+    """
+    for product in products:
+        for field in ('image1', 'image2'):
+            path = product[field]
+            if not path or '://' in path or path.startswith('/'):
+                continue
+            if path not in stored:
+                try:
+                    with open(os.path.join(images_dir, path), 'rb') as f:
+                        stored[path] = blobs.blob_storage.url(blobs.store(File(f), os.path.splitext(path)[1].lower()))
+                except FileNotFoundError:
+                    stored[path] = path
+            product[field] = stored[path]
+
+
+def write_chunk(products, categories):
+    """Upsert a chunk of parsed products, keyed by product name, in one transaction."""
+    # Later rows win, as a single upsert statement may not touch a row twice
+    by_name = {product['name']: product for product in products}
+    with transaction.atomic():
+        resolve_categories({product['category'] for product in by_name.values()}, categories)
+        # Move the blob references from the images being replaced to the new ones
+        replaced = Product.objects.filter(name__in=by_name).values_list('image1', 'image2')
+        blobs.release([image for images in replaced for image in images])
+        blobs.retain([product[field] for product in by_name.values() for field in ('image1', 'image2')])
+        Product.objects.bulk_create(
+            [Product(**{**product, 'category': categories[product['category']]}) for product in by_name.values()],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=UPDATE_FIELDS,
+        )
+    return len(by_name)
+
 
 class Command(BaseCommand):
     help = 'Seed the database with data from a CSV file'
 
-    def handle(self, *args, **kwargs):
-        csv_file_path = os.path.join(os.path.dirname(__file__), 'Dataset_ShopifyFR.csv')
-        
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=DEFAULT_CSV_FILE, help='Path of the CSV file to import')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows written per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and validate the file without writing')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Parse the file in this many processes, resuming from checkpoints after a crash')
+        parser.add_argument('--images-dir',
+                            help='Directory of the product images given as relative paths, stored deduplicated by content')
+
+    def handle(self, *args, **options):
+        csv_file_path = options['file']
+
         if not os.path.exists(csv_file_path):
             self.stdout.write(self.style.ERROR(f'CSV file not found: {csv_file_path}'))
             return
-        
+
+        self.started = time.perf_counter()
+        self.rows = self.written = self.skipped = 0
+        self.categories = {}
+        self.images = {}
+
+        if options['workers'] > 1:
+            self.import_parallel(os.path.abspath(csv_file_path), options)
+        else:
+            self.import_sequential(csv_file_path, options)
+        if not options['dry_run']:
+            # Bulk upserts don't send post_save, so invalidate the catalog ourselves
+            catalog_cache.invalidate()
+
+        elapsed = time.perf_counter() - self.started
+        action = 'validated' if options['dry_run'] else f'imported, {self.written} products upserted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.rows} rows {action}, {self.skipped} skipped in {elapsed:.2f}s '
+            f'({self.rows / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
+
+    def import_sequential(self, csv_file_path, options):
         with open(csv_file_path, newline='', encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
-            
-            for row in reader:
-                images = row['Product Image'].split(', ')
-                image1 = images[0].lstrip("[")
-                image2 = images[1].rstrip("]")
-                # Convert the string to a dictionary and fetch the keys
-                image1_dict = ast.literal_eval(image1)
-                image1_keys = list(image1_dict.keys())
-                image2_dict = ast.literal_eval(image2)
-                image2_keys = list(image2_dict.keys())
-                
-                product_name = row['Product Name']
-                price = row['Price']
-                details = row['Details']
-                categories = row['Categories'].split(', ')
-                gender = row['Gender']
-                
-                # Ensure categories exist in the database
-                category_objects = []
-                for category_name in categories:
-                    category, created = Category.objects.get_or_create(name=category_name)
-                    category_objects.append(category)
-                
-                # Ensure the product does not already exist in the database
-                existing_products = Product.objects.filter(name=product_name)
-                if existing_products.exists():
-                    product = existing_products.first()
-                    product.price = price.strip('₹').replace(',', '')
-                    product.description = details
-                    product.image1 = image1_keys[0]
-                    product.image2 = image2_keys[0]
-                    product.category = category_objects[0]
-                    product.gender = gender
-                    product.save()
-                    self.stdout.write(self.style.WARNING(f'Product {product_name} updated'))
+
+            while True:
+                chunk = list(islice(reader, options['chunk_size']))
+                if not chunk:
+                    break
+
+                products = []
+                errors = []
+                for row in chunk:
+                    try:
+                        products.append(parse_row(row))
+                    except ValueError as e:
+                        errors.append(str(e))
+                self.process_chunk(len(chunk), products, errors, options)
+
+    def import_parallel(self, source, options):
+        fieldnames, data_start = read_header(source)
+        checkpoints = self.load_checkpoints(source, data_start, options)
+        pending = [checkpoint for checkpoint in checkpoints if checkpoint.offset < checkpoint.end]
+        if any(checkpoint.offset > checkpoint.start for checkpoint in checkpoints):
+            done = sum(checkpoint.rows for checkpoint in checkpoints)
+            self.stdout.write(self.style.WARNING(f'Resuming import of {source} after {done} committed rows'))
+
+        # Worker processes never touch the database; don't let them inherit our connections
+        if not connection.in_atomic_block:
+            connections.close_all()
+        stats = {}
+        context = multiprocessing.get_context()
+        with context.Manager() as manager, context.Pool(max(1, min(options['workers'], len(pending)))) as pool:
+            queue = manager.Queue(maxsize=options['workers'] * 2)
+            results = [
+                pool.apply_async(parse_shard, (source, checkpoint.shard, checkpoint.offset, checkpoint.end,
+                                               fieldnames, options['chunk_size'], queue))
+                for checkpoint in pending
+            ]
+            while len(stats) < len(pending):
+                try:
+                    message = queue.get(timeout=1)
+                except Empty:
+                    if all(result.ready() for result in results) and queue.empty():
+                        raise CommandError('A parser process exited without finishing its shard')
+                    continue
+
+                if message[0] == 'chunk':
+                    _, shard, offset, count, products, errors = message
+                    with transaction.atomic():
+                        self.process_chunk(count, products, errors, options)
+                        if not options['dry_run']:
+                            ImportCheckpoint.objects.filter(source=source, shard=shard).update(
+                                offset=offset, rows=F('rows') + count)
+                elif message[0] == 'done':
+                    _, shard, rows, seconds = message
+                    stats[shard] = (rows, seconds)
                 else:
-                    product = Product.objects.create(
-                        name=product_name,
-                        price=price.strip('₹').replace(',', ''),
-                        description=details,
-                        image1=image1_keys[0],
-                        image2=image2_keys[0],
-                        category=category_objects[0],
-                        gender=gender
-                    )
-                    self.stdout.write(self.style.SUCCESS(f'Product {product_name} created successfully'))
\ No newline at end of file
+                    _, shard, error = message
+                    raise CommandError(f'Parsing shard {shard} failed: {error}')
+
+        for shard, (rows, seconds) in sorted(stats.items()):
+            self.stdout.write(f'Worker {shard}: {rows} rows parsed in {seconds:.2f}s '
+                              f'({rows / seconds if seconds else 0:.0f} rows/s)')
+        if not options['dry_run']:
+            ImportCheckpoint.objects.filter(source=source).delete()
+
+    def load_checkpoints(self, source, data_start, options):
+        """
+        Return the shards of this import, resuming the checkpoints of an interrupted run of the same file.
+
+        Checkpoints left by a different version of the file are discarded.
+        """
+        stat = os.stat(source)
+        fingerprint = f'{stat.st_size}:{stat.st_mtime_ns}'
+        shards = [
+            ImportCheckpoint(source=source, fingerprint=fingerprint, shard=shard, start=start, end=end, offset=start)
+            for shard, (start, end) in enumerate(shard_boundaries(source, data_start, options['workers']))
+        ]
+        if options['dry_run']:
+            return shards
+
+        existing = list(ImportCheckpoint.objects.filter(source=source).order_by('shard'))
+        if existing and all(checkpoint.fingerprint == fingerprint for checkpoint in existing):
+            return existing
+        ImportCheckpoint.objects.filter(source=source).delete()
+        return ImportCheckpoint.objects.bulk_create(shards)
+
+    def process_chunk(self, count, products, errors, options):
+        for error in errors:
+            self.stdout.write(self.style.WARNING(error))
+        self.rows += count
+        self.skipped += len(errors)
+
+        if not options['dry_run']:
+            if options['images_dir']:
+                store_images(products, options['images_dir'], self.images)
+            self.written += write_chunk(products, self.categories)
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{self.rows} rows processed ({self.rows / elapsed:.0f} rows/s)')
@@ -0,0 +1,293 @@
+"""
+A small in-process metrics registry exposed in the Prometheus text format.
+
+Every thread records into its own shard of each metric, so the hot path is a
+plain dict update with no locking; shards are only merged when metrics are
+collected for `/metrics`. Shards of threads that have exited are folded into
+a retired total (counters and histograms) or dropped (gauges).
+
+With several worker processes (gunicorn), set the `METRICS_DIR` environment
+variable to a directory shared by the workers. Each worker then periodically
+writes a snapshot of its metrics there, and `/metrics` merges the snapshots of
+all workers, whichever worker serves the scrape.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        (registry or REGISTRY).register(self)
+
+    def _shard(self):
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self):
+        """Return `{label values: value}` merged across all threads of this process."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._retire(shard)
+            self._shards = live
+            values = {key: self._copy(value) for key, value in self._retired.items()}
+            for _, shard in live:
+                # Copy first: the owning thread may still be writing to it
+                for key, value in list(shard.items()):
+                    values[key] = self._merge(values.get(key), value)
+        return values
+
+    def _retire(self, shard):
+        for key, value in shard.items():
+            self._retired[key] = self._merge(self._retired.get(key), value)
+
+    def _copy(self, value):
+        return value
+
+    def _merge(self, total, value):
+        return value if total is None else total + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A gauge whose value is the sum of the values set by the live threads.
+
+    Process-wide values can instead come from `callback`, called on collection
+    and yielding `(labels, value)` pairs.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None, registry=None):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames, registry)
+
+    def collect(self):
+        if self.callback is not None:
+            return {self._key(labels): value for labels, value in self.callback()}
+        return super().collect()
+
+    def set(self, value, **labels):
+        self._shard()[self._key(labels)] = value
+
+    def _retire(self, shard):
+        pass
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket (not cumulative) counts, the +Inf bucket last, then the sum
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+    def _merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, values):
+        for key, state in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, state[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        """Return `{metric name: {label values: value}}` for this process."""
+        return {name: metric.collect() for name, metric in self.metrics.items()}
+
+    def flush(self, directory=METRICS_DIR):
+        """Write this process's metrics to the shared directory, if one is configured."""
+        if not directory:
+            return
+        snapshot = {
+            name: [[list(key), value] for key, value in values.items()]
+            for name, values in self.collect().items()
+        }
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if METRICS_DIR and time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def collect_all(self, directory=METRICS_DIR):
+        """
+        Merge the metrics of every worker process that flushed to `directory`.
+
+        Counters and histograms of workers that have exited are kept, while
+        their gauges are ignored.
+        """
+        if not directory:
+            return self.collect()
+        self.flush(directory)
+        merged = {name: {} for name in self.metrics}
+        for filename in os.listdir(directory):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            pid = int(filename[len("metrics_"):-len(".json")])
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(pid)
+            for name, values in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                for key, value in values:
+                    key = tuple(key)
+                    merged[name][key] = metric._merge(merged[name].get(key), value)
+        return merged
+
+    def render(self, directory=METRICS_DIR):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, values in self.collect_all(directory).items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sample, labels, value in metric.samples(values):
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return str(value)
+
+
+def _pool_stats():
+    from django.db import connections
+
+    for alias in connections:
+        if not connections.settings[alias].get("OPTIONS", {}).get("pool"):
+            continue
+        stats = connections[alias].pool.get_stats()
+        yield {"alias": alias, "state": "size"}, stats.get("pool_size", 0)
+        yield {"alias": alias, "state": "available"}, stats.get("pool_available", 0)
+        yield {"alias": alias, "state": "waiting"}, stats.get("requests_waiting", 0)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests.", ["method", "route", "status"])
+GRAPHQL_OPERATIONS = Counter(
+    "graphql_operations_total", "GraphQL operations executed.", ["operation", "type", "status"])
+GRAPHQL_OPERATION_DURATION = Histogram(
+    "graphql_operation_duration_seconds", "Time spent executing GraphQL operations.", ["operation", "type"])
+GRAPHQL_OPERATION_QUERIES = Histogram(
+    "graphql_operation_db_queries", "SQL queries issued per GraphQL operation.", ["operation", "type"],
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200))
+GRAPHQL_OPERATION_COST = Histogram(
+    "graphql_operation_cost", "Static cost computed for each GraphQL operation.",
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000))
+GRAPHQL_RESOLVER_ERRORS = Counter(
+    "graphql_resolver_errors_total", "Exceptions raised by GraphQL resolvers.", ["field"])
+DB_QUERIES = Counter(
+    "db_queries_total", "SQL queries issued while executing GraphQL operations.")
+DB_QUERY_DURATION = Counter(
+    "db_query_duration_seconds_total", "Time spent in SQL queries while executing GraphQL operations.")
+DB_CONNECTIONS_OPEN = Gauge(
+    "db_connections_open", "Database connections currently held open by request threads.", ["alias"])
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Connections of the psycopg connection pool, by state.", ["alias", "state"],
+    callback=_pool_stats)
+CATALOG_CACHE_REQUESTS = Counter(
+    "catalog_cache_requests_total", "Catalog cache lookups, by tier and result.", ["tier", "result"])
+GRAPHQL_RESPONSE_CACHE_REQUESTS = Counter(
+    "graphql_response_cache_requests_total", "Lookups of cacheable GraphQL responses, by result.", ["result"])
+EMAIL_SEND_DURATION = Histogram(
+    "email_send_duration_seconds", "Time spent handing one email to the mail server.", ["status"])
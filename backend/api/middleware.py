@@ -0,0 +1,47 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import HTTP_REQUEST_DURATION, REGISTRY
+
+
+class MetricsMiddleware:
+    """
+    Time every request for the `http_request_duration_seconds` histogram.
+
+    Works in both sync and async middleware chains, so it doesn't force the
+    async GraphQL view through a thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        # Label by URL pattern rather than path to keep the number of series bounded
+        match = request.resolver_match
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=match.route if match else "unmatched",
+            status=response.status_code,
+        )
+        REGISTRY.maybe_flush()
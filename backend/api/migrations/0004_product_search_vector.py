@@ -0,0 +1,80 @@
+from django.db import migrations
+
+# The search vector is maintained entirely by PostgreSQL triggers so that it
+# stays correct for bulk writes and raw SQL, not just ORM saves. Other
+# databases fall back to the in-process index in api/search.py.
+
+PRODUCT_VECTOR = """
+    setweight(to_tsvector('english', coalesce({product}.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({category_name}, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({product}.description, '')), 'C')
+"""
+
+FORWARD_SQL = [
+    "ALTER TABLE api_product ADD COLUMN search_vector tsvector",
+    """
+    UPDATE api_product SET search_vector = {vector}
+    FROM api_category WHERE api_category.id = api_product.category_id
+    """.format(vector=PRODUCT_VECTOR.format(product="api_product", category_name="api_category.name")),
+    "CREATE INDEX api_product_search_vector_idx ON api_product USING gin (search_vector)",
+    """
+    CREATE FUNCTION api_product_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {vector};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """.format(vector=PRODUCT_VECTOR.format(
+        product="NEW",
+        category_name="(SELECT name FROM api_category WHERE api_category.id = NEW.category_id)",
+    )),
+    """
+    CREATE TRIGGER api_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description, category_id ON api_product
+    FOR EACH ROW EXECUTE FUNCTION api_product_search_vector_update()
+    """,
+    """
+    CREATE FUNCTION api_category_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE api_product SET search_vector = {vector}
+        WHERE api_product.category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """.format(vector=PRODUCT_VECTOR.format(product="api_product", category_name="NEW.name")),
+    """
+    CREATE TRIGGER api_category_search_vector_trigger
+    AFTER UPDATE OF name ON api_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION api_category_search_vector_update()
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS api_category_search_vector_trigger ON api_category",
+    "DROP FUNCTION IF EXISTS api_category_search_vector_update()",
+    "DROP TRIGGER IF EXISTS api_product_search_vector_trigger ON api_product",
+    "DROP FUNCTION IF EXISTS api_product_search_vector_update()",
+    "DROP INDEX IF EXISTS api_product_search_vector_idx",
+    "ALTER TABLE api_product DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_product_product_price_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_products(apps, schema_editor):
+    # Products are referenced by carts and orders, so duplicates are told
+    # apart rather than merged: the oldest keeps the name, the others get
+    # their id appended
+    Product = apps.get_model('api', 'Product')
+    max_length = Product._meta.get_field('name').max_length
+    duplicates = Product.objects.values('name').annotate(rows=Count('id')).filter(rows__gt=1)
+    for duplicate in duplicates:
+        for product in Product.objects.filter(name=duplicate['name']).order_by('id')[1:]:
+            suffix = f' ({product.id})'
+            product.name = product.name[:max_length - len(suffix)] + suffix
+            product.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_products, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('name',), name='product_unique_name'),
+        ),
+    ]
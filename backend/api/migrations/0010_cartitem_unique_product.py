@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-18 15:57
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # Fold repeated rows of a product into the oldest one; the cart totals
+    # already count every unit, and the item count is recomputed for the
+    # carts concerned
+    CartItem = apps.get_model('api', 'CartItem')
+    Cart = apps.get_model('api', 'Cart')
+    duplicates = (
+        CartItem.objects.values('cart', 'product')
+        .annotate(rows=Count('id'), keep=Min('id'), quantity=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        CartItem.objects.filter(id=duplicate['keep']).update(quantity=duplicate['quantity'])
+        CartItem.objects.filter(cart=duplicate['cart'], product=duplicate['product']).exclude(id=duplicate['keep']).delete()
+        cart = Cart.objects.get(id=duplicate['cart'])
+        cart.item_count = CartItem.objects.filter(cart=cart).count()
+        cart.save(update_fields=['item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='cartitem_unique_product'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_product_name_seek_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='kind',
+            field=models.CharField(choices=[('thumbnails', 'Profile thumbnails'), ('variants', 'Product image variants')], default='thumbnails', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='thumbnailjob',
+            name='image',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnailjob',
+            constraint=models.UniqueConstraint(fields=('image', 'kind'), name='thumbnailjob_unique_image_kind'),
+        ),
+    ]
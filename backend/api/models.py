@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 # Category Model
 class Category(models.Model):
@@ -24,9 +25,33 @@ class Product(models.Model):
     image2 = models.CharField(max_length=255, blank=True, null=True)
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, default="Unisex")
 
+    class Meta:
+        # Composite indexes backing the keyset pagination of productsConnection
+        indexes = [
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            models.Index(fields=["category", "price", "id"], name="product_category_price_id_idx"),
+            models.Index(fields=["gender", "price", "id"], name="product_gender_price_id_idx"),
+            models.Index(fields=["category", "name", "id"], name="product_category_name_id_idx"),
+            models.Index(fields=["gender", "name", "id"], name="product_gender_name_id_idx"),
+        ]
+        constraints = [
+            # Product names identify rows for the bulk upserts of the seed command
+            models.UniqueConstraint(fields=["name"], name="product_unique_name"),
+        ]
+
     def __str__(self):
         return self.name
 
+# Product Stock Model
+class ProductStock(models.Model):
+    # Products without a stock row are not stock-tracked and can always be ordered
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="stock")
+    quantity = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name}"
+
 # Profile Model
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
@@ -36,7 +61,10 @@ class Profile(models.Model):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=15)
+    # Content-addressed, see api.blobs
     image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    # {"<size>": {"webp": name, "jpeg": name}}, filled by `manage.py run_thumbnail_worker`
+    thumbnails = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.username
@@ -45,6 +73,10 @@ class Profile(models.Model):
 class Cart(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="carts")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Kept in step with the cart items by api.carts (see `manage.py repair_cart_totals`)
+    item_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def __str__(self):
         return f"Cart {self.id} - {self.user.username}"
@@ -55,6 +87,12 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # One row per product in a cart, the conflict target of the add-to-cart upsert
+            models.UniqueConstraint(fields=["cart", "product"], name="cartitem_unique_product"),
+        ]
+
     def subtotal(self):
         return self.quantity * self.product.price
 
@@ -75,6 +113,12 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Backs the keyset pagination of ordersConnection, newest first
+            models.Index(fields=["user", "created_at", "id"], name="order_user_created_id_idx"),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.user.user.username}"
 
@@ -86,4 +130,121 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} (Order {self.order.id})"
\ No newline at end of file
+        return f"{self.quantity} x {self.product.name} (Order {self.order.id})"
+
+# Email Outbox Model
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Sent", "Sent"),
+        ("Failed", "Failed"),
+    ]
+
+    # Optional deduplication key, e.g. "order-confirmation:42"
+    key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="emailoutbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+
+# Blob Model
+class Blob(models.Model):
+    # Content-addressed file in MEDIA_ROOT (see api.blobs)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    # Profiles and products using the file
+    references = models.PositiveIntegerField(default=0)
+    # Last time the content was stored, which restarts the grace period before collection
+    stored_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["references", "stored_at"], name="blob_unreferenced_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+# Product Image Variant Model
+class ProductImageVariant(models.Model):
+    # Blob name of the original image (see api.variants)
+    source = models.CharField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    # Blob name of the resized image
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "width", "format"], name="productimagevariant_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} at {self.width}px ({self.format})"
+
+# Thumbnail Job Model
+class ThumbnailJob(models.Model):
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Done", "Done"),
+        ("Failed", "Failed"),
+    ]
+    KIND_CHOICES = [
+        ("thumbnails", "Profile thumbnails"),
+        ("variants", "Product image variants"),
+    ]
+
+    # Storage name of the uploaded image
+    image = models.CharField(max_length=255)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default="thumbnails")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="thumbnailjob_due_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["image", "kind"], name="thumbnailjob_unique_image_kind"),
+        ]
+
+    def __str__(self):
+        return f"{self.image} {self.kind} ({self.status})"
+
+# Import Checkpoint Model
+class ImportCheckpoint(models.Model):
+    # One row per shard of a running `seed --workers N` import; `offset` is the
+    # byte position after the last chunk committed for the shard.
+    source = models.CharField(max_length=500)
+    fingerprint = models.CharField(max_length=100)
+    shard = models.PositiveIntegerField()
+    start = models.BigIntegerField()
+    end = models.BigIntegerField()
+    offset = models.BigIntegerField()
+    rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "shard"], name="importcheckpoint_unique_shard"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} shard {self.shard} @ {self.offset}/{self.end}"
@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from .inventory import reserve_stock, tracked_quantities
+from .models import Cart, Order, OrderItem, Profile
+from .utils.email import queue_order_confirmation
+
+
+def checkout(user_id):
+    """
+    Turn the user's cart into an order, in one transaction.
+
+    Returns `(order, order_items, cart_items)`, with the products and their
+    categories of the cart items already loaded.
+    """
+    profile = Profile.objects.select_related("user").filter(user__id=user_id).first()
+
+    if not profile:
+        raise Exception("Profile does not exist for this user.")
+
+    with transaction.atomic():
+        # Lock the cart so concurrent checkouts of the same cart cannot both succeed
+        cart = Cart.objects.select_for_update().filter(user__id=user_id).first()
+        cart_items = list(cart.items.select_related("product__category", "product__stock").order_by("id")) if cart else []
+        if not cart_items:
+            raise Exception("Cart is empty. Add products before placing an order.")
+
+        total_price = sum((item.product.price * item.quantity for item in cart_items), Decimal("0"))
+
+        # Create the Order
+        order = Order.objects.create(user=profile, total_price=total_price, status="Pending")
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
+            for item in cart_items
+        ])
+
+        # Clear the cart after placing the order
+        cart.items.all().delete()
+        Cart.objects.filter(id=cart.id).update(item_count=0, total_quantity=0, total_price=0)
+
+        queue_order_confirmation(order, profile)
+
+        # Reserve stock last so the product rows stay locked only until commit
+        reserve_stock(tracked_quantities(cart_items))
+
+    return order, order_items, cart_items
@@ -0,0 +1,109 @@
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BooleanField, F, Func, Value
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class RowComparison(Func):
+    """
+    `(a, b) > (x, y)` (or `<`), a row value comparison.
+
+    Unlike the equivalent `a > x OR (a = x AND b > y)`, the database reads it
+    as a range on a `(a, b)` index and starts the scan at the cursor.
+    """
+
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+    def __init__(self, lhs, rhs, descending=False):
+        self.arg_joiner = ") < (" if descending else ") > ("
+        super().__init__(_Row(*lhs), _Row(*rhs))
+
+
+class _Row(Func):
+    template = "%(expressions)s"
+    output_field = BooleanField()
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds, which would make the
+        # seek condition skip or repeat rows created within the same millisecond
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(value, pk):
+    """Encode the sort value and primary key of a row into an opaque cursor."""
+    payload = json.dumps([value, pk], cls=CursorEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise Exception("Invalid cursor.")
+    return value, pk
+
+
+def page_size(first):
+    if first is None:
+        return DEFAULT_PAGE_SIZE
+    if first < 0:
+        raise Exception("`first` must be a non-negative integer.")
+    return min(first, MAX_PAGE_SIZE)
+
+
+def keyset_page(queryset, ordering, first=None, after=None):
+    """
+    Return one page of `queryset` using keyset (seek) pagination.
+
+    Rows are ordered by `(ordering, id)`, where `ordering` is a field name
+    optionally prefixed with "-" for descending order. Instead of an OFFSET,
+    the `after` cursor is turned into a `(field, id) > (value, pk)` condition,
+    so every page costs the same index range scan regardless of its depth.
+
+    Returns a `(rows, cursors, has_next_page)` tuple.
+    """
+    queryset, field, limit = _seek(queryset, ordering, first, after)
+    return _page(list(queryset[:limit + 1]), field, limit)
+
+
+def _seek(queryset, ordering, first, after):
+    descending = ordering.startswith("-")
+    field = ordering.lstrip("-")
+    if field == "pk":
+        field = "id"
+    tiebreak = "-id" if descending else "id"
+    queryset = queryset.order_by(ordering, tiebreak) if field != "id" else queryset.order_by(tiebreak)
+
+    if after:
+        value, pk = decode_cursor(after)
+        op = "lt" if descending else "gt"
+        if field == "id":
+            queryset = queryset.filter(**{f"id__{op}": pk})
+        else:
+            value = Value(value, output_field=_output_field(queryset, field))
+            queryset = queryset.filter(RowComparison([F(field), F("id")], [value, Value(pk)], descending))
+    return queryset, field, page_size(first)
+
+
+def _output_field(queryset, field):
+    # The cursor holds the value as JSON; the field converts it back for the database
+    if field in queryset.query.annotations:
+        return queryset.query.annotations[field].output_field
+    return queryset.model._meta.get_field(field)
+
+
+def _page(rows, field, limit):
+    has_next_page = len(rows) > limit
+    rows = rows[:limit]
+    cursors = [encode_cursor(getattr(row, field), row.pk) for row in rows]
+    return rows, cursors, has_next_page
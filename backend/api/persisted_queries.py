@@ -0,0 +1,95 @@
+import hashlib
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+# How long an automatically persisted query is remembered; clients register
+# it again when they get PersistedQueryNotFound
+APQ_TIMEOUT = 60 * 60 * 24
+
+
+class PersistedQueryError(Exception):
+    """A persisted query request that cannot be served, reported as a GraphQL error."""
+
+    def __init__(self, message, code, status=200):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+    def as_response_data(self):
+        return {"errors": [{"message": str(self), "extensions": {"code": self.code}}]}
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def load_allowlist(path):
+    """
+    Load the frontend's operations as a `{sha256: query}` dict.
+
+    Accepts an Apollo persisted query manifest (`{"operations": [{"id": ...,
+    "body": ...}]}`) or a plain `{sha256: query}` object.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if "operations" in data:
+        return {operation["id"]: operation["body"] for operation in data["operations"]}
+    return dict(data)
+
+
+def get_allowlist():
+    path = getattr(settings, "GRAPHQL_ALLOWLIST", None)
+    return load_allowlist(path) if path else None
+
+
+def persisted_hash(extensions):
+    persisted = extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+    return persisted.get("sha256Hash") if isinstance(persisted, dict) else None
+
+
+def lookup(sha256):
+    """Return the query registered under `sha256`, or None."""
+    allowlist = get_allowlist()
+    if allowlist is not None:
+        return allowlist.get(sha256)
+    return cache.get(f"apq:{sha256}")
+
+
+def resolve_query(query, extensions):
+    """
+    Return the query text to execute for a request, following the Automatic
+    Persisted Queries protocol.
+
+    A request may send only `extensions.persistedQuery.sha256Hash`, which is
+    then looked up, or the hash along with the query, which registers it. When
+    the `GRAPHQL_ALLOWLIST` setting names a file of the frontend's operations,
+    only those operations are accepted and nothing new can be registered.
+    """
+    if query is not None and not isinstance(query, str):
+        raise PersistedQueryError("The query must be a string.", "BAD_REQUEST", status=400)
+    sha256 = persisted_hash(extensions)
+    allowlist = get_allowlist()
+
+    if sha256 is None:
+        if allowlist is not None and query is not None and query_hash(query) not in allowlist:
+            raise PersistedQueryError("This operation is not allowed.", "PERSISTED_QUERY_NOT_ALLOWED", status=400)
+        return query
+
+    if query is None:
+        query = lookup(sha256)
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+        return query
+
+    if query_hash(query) != sha256:
+        raise PersistedQueryError("provided sha does not match query", "BAD_REQUEST", status=400)
+    if allowlist is not None:
+        if sha256 not in allowlist:
+            raise PersistedQueryError("This operation is not allowed.", "PERSISTED_QUERY_NOT_ALLOWED", status=400)
+    else:
+        cache.set(f"apq:{sha256}", query, APQ_TIMEOUT)
+    return query
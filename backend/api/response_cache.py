@@ -0,0 +1,206 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from graphql import FieldNode, FragmentDefinitionNode, FragmentSpreadNode, OperationType, parse
+from graphql.utilities import get_operation_ast
+
+from .catalog import catalog_cache
+from .metrics import GRAPHQL_RESPONSE_CACHE_REQUESTS
+from .persisted_queries import persisted_hash, resolve_query
+
+# Root fields whose results are the same for every visitor. Anything else
+# (cart, orders, profile, me, mutations, introspection, ...) is never cached.
+PUBLIC_FIELDS = frozenset({"categories", "products", "productsConnection", "searchProducts", "__typename"})
+
+
+def request_params(request):
+    """
+    Return the `(query, persisted query hash, extensions, operation name)` of a GraphQL request, or None.
+
+    Persisted queries sent by hash come with a None query.
+    """
+    if request.method == "GET":
+        data = request.GET
+        try:
+            extensions = json.loads(data["extensions"]) if data.get("extensions") else None
+        except ValueError:
+            return None
+    elif request.method == "POST" and request.content_type == "application/json":
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        extensions = data.get("extensions")
+    else:
+        return None
+    query = data.get("query")
+    if query is not None and not isinstance(query, str):
+        return None
+    return query, persisted_hash(extensions), extensions, data.get("operationName")
+
+
+def root_fields(selection_set, fragments):
+    """
+    The names of the root fields selected by `selection_set`, through fragments.
+
+    Each fragment is followed once however often it is spread, so fragment
+    cycles (left to validation) and fragments spread many times cost nothing.
+    """
+    fields, spread = set(), set()
+    selection_sets = [selection_set]
+    while selection_sets:
+        for selection in selection_sets.pop().selections:
+            if isinstance(selection, FieldNode):
+                fields.add(selection.name.value)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name in spread:
+                    continue
+                spread.add(name)
+                fragment = fragments.get(name)
+                if fragment is None:
+                    # Unknown fragment: the request fails validation, don't cache it
+                    fields.add(name)
+                else:
+                    selection_sets.append(fragment.selection_set)
+            else:
+                selection_sets.append(selection.selection_set)
+    return fields
+
+
+def is_public(document, operation_name):
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation != OperationType.QUERY:
+        return False
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    return root_fields(operation.selection_set, fragments) <= PUBLIC_FIELDS
+
+
+class Classifications:
+    """Bounded LRU remembering whether each operation (by query text or persisted hash) is public."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            public = self._entries.get(key)
+            if public is not None:
+                self._entries.move_to_end(key)
+            return public
+
+    def set(self, key, public):
+        with self._lock:
+            self._entries[key] = public
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+classifications = Classifications()
+
+
+def cache_key(request):
+    """
+    Return the cache key of a request that only reads public catalog fields, or None.
+
+    The key is the hash of the raw request, its body or the query string of
+    a GET, plus the catalog version so that catalog edits invalidate every
+    response. Whether an operation is public is remembered per query text
+    (or persisted query hash), so a known operation is not parsed at all;
+    otherwise the document parsed here is left on the request for the
+    execution to reuse (see `DocumentCacheExtension`).
+    """
+    raw = request.META.get("QUERY_STRING", "").encode() if request.method == "GET" else request.body
+    params = request_params(request)
+    if params is None:
+        return None
+    query, sha256, extensions, operation_name = params
+    classification_key = (query if query is not None else sha256, operation_name)
+    public = classifications.get(classification_key)
+    if public is None:
+        try:
+            query = resolve_query(query, extensions)
+            if not isinstance(query, str):
+                return None
+            document = parse(query)
+            public = is_public(document, operation_name)
+        except Exception:
+            # Syntax errors, unknown persisted queries or anything else that
+            # can't be analysed here (such as a document nested past the
+            # recursion limit): left for the execution to report
+            return None
+        request.graphql_document = (query, document)
+        classifications.set(classification_key, public)
+    if not public:
+        return None
+
+    digest = hashlib.sha256(b"%s\n%s\n%s" % (request.path.encode(), raw, str(catalog_cache.version()).encode()))
+    return f"graphql-response:{digest.hexdigest()}"
+
+
+def get(key):
+    cached = _cache().get(key)
+    GRAPHQL_RESPONSE_CACHE_REQUESTS.inc(result="miss" if cached is None else "hit")
+    return cached
+
+
+def lookup(request):
+    """
+    Return `(key, cached)` for a request, where `key` is None when the request can't be cached.
+
+    Both steps talk to the cache, so async views run this in one thread hop.
+    """
+    key = cache_key(request)
+    return key, (None if key is None else get(key))
+
+
+def store(key, response):
+    """Cache a successful response and return its `(body, etag)`, or None if it can't be cached."""
+    if response.status_code != 200 or response.streaming:
+        return None
+    body = response.content
+    try:
+        if json.loads(body).get("errors"):
+            return None
+    except ValueError:
+        return None
+    etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    _cache().set(key, (body, etag), getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+    return body, etag
+
+
+def respond(request, body, etag):
+    """
+    Serve a cached body, or `304 Not Modified` if the client already has it.
+
+    Unlike Django's conditional GET handling this also applies to POST, as
+    running a query through POST doesn't modify anything.
+    """
+    if etag in parse_etags(request.headers.get("If-None-Match", "")) or request.headers.get("If-None-Match") == "*":
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=getattr(settings, "GRAPHQL_CACHE_MAX_AGE", 0))
+    return response
+
+
+def _cache():
+    # Stored next to the catalog cache, whose version is part of every key
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", None) or "default"]
@@ -1,18 +1,31 @@
 import strawberry
+from enum import Enum
 from typing import List, Optional
 from datetime import datetime
-import os
-import uuid
+from decimal import Decimal
 import base64
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.db.models import Prefetch
 from django.contrib.auth import get_user_model
 User = get_user_model()
-from .models import Category, Product, Profile, Cart, CartItem, Order, OrderItem
+from .models import Category, Product, Profile, Cart, Order, OrderItem
 from strawberry.tools import merge_types
 from authentication.schema import AuthQuery, AuthMutation
+from strawberry.file_uploads import Upload
 from strawberry.types import Info
 from api.models import Order
-from api.utils.email import send_notification_email
+from api.utils.email import queue_order_confirmation
+from .execution import InlineResolversExtension, run_sync
+from .extensions import DocumentCacheExtension, QueryCostExtension, QueryStatsExtension
+from .catalog import catalog_cache
+from . import carts
+from .loaders import get_loaders
+from .orders import checkout
+from .pagination import keyset_page
+from .utils import images
+from . import blobs, search, variants
 
 @strawberry.type
 class CategoryType:
@@ -20,17 +33,60 @@ class CategoryType:
     name: str
     description: Optional[str]
 
+@strawberry.type
+class ImageVariantType:
+    url: str
+    width: int
+    height: int
+    format: str
+
+@strawberry.type
+class ProductImageType:
+    src: str
+    # Empty for remote images, and while the variants are being generated
+    variants: List[ImageVariantType]
+
+    @strawberry.field
+    def srcset(self, format: str = "webp") -> str:
+        return ", ".join(f"{variant.url} {variant.width}w" for variant in self.variants if variant.format == format)
+
 @strawberry.type
 class ProductType:
     id: int
     name: str
     description: str
     price: float
-    category: CategoryType
     image1: Optional[str]
     image2: Optional[str]
     gender: str
 
+    @strawberry.field
+    async def category(self, info: Info) -> CategoryType:
+        return await get_loaders(info).categories.load(self.category_id)
+
+    @strawberry.field
+    async def images(self, info: Info) -> List[ProductImageType]:
+        loaders = get_loaders(info)
+        sources = [(src, blobs.blob_name(src)) for src in (self.image1, self.image2) if src]
+        names = [name for _, name in sources if name]
+        missing = [name for name, rows in zip(names, await loaders.image_variants.load_many(names)) if not rows]
+        if missing:
+            # Missed by `manage.py generate_image_variants`; the original is shown until the worker renders them
+            await run_sync(variants.queue_missing, missing)
+        return [
+            ProductImageType(src=src, variants=[
+                ImageVariantType(url=blobs.blob_storage.url(row.name), width=row.width, height=row.height, format=row.format)
+                for row in (await loaders.image_variants.load(name) if name else [])
+            ])
+            for src, name in sources
+        ]
+
+@strawberry.type
+class ThumbnailType:
+    size: int
+    webp: str
+    jpeg: str
+
 @strawberry.type
 class ProfileType:
     user: str
@@ -41,39 +97,118 @@ class ProfileType:
     phone_number: str
     image: Optional[str]
     id : int
+    # Empty until `manage.py run_thumbnail_worker` has processed the image
+    thumbnails: List[ThumbnailType]
 
 @strawberry.type
 class CartItemType:
     id: int
-    product: ProductType
     quantity: int
 
     @strawberry.field
-    def subtotal(self) -> float:
-        return self.quantity * self.product.price
+    async def product(self, info: Info) -> ProductType:
+        return await get_loaders(info).products.load(self.product_id)
+
+    @strawberry.field
+    async def subtotal(self, info: Info) -> float:
+        return self.quantity * (await get_loaders(info).products.load(self.product_id)).price
 
 @strawberry.type
 class CartType:
     id: int
-    user: str
-    items: List[CartItemType]
     created_at: datetime
+    item_count: int
+    total_quantity: int
+    total_price: float
+
+    @strawberry.field
+    def user(self) -> str:
+        return self.user.username
+
+    @strawberry.field
+    async def items(self, info: Info) -> List[CartItemType]:
+        return await get_loaders(info).cart_items.load(self.id)
 
 @strawberry.type
 class OrderItemType:
     id: int
-    product: ProductType
     quantity: int
     price: float
 
+    @strawberry.field
+    async def product(self, info: Info) -> ProductType:
+        return await get_loaders(info).products.load(self.product_id)
+
 @strawberry.type
 class OrderType:
     id: int
-    user: str
     total_price: float
     status: str
     created_at: datetime
-    order_items: List[OrderItemType]
+
+    @strawberry.field
+    def user(self) -> str:
+        return self.user.user.username
+
+    @strawberry.field
+    async def order_items(self, info: Info) -> List[OrderItemType]:
+        return await get_loaders(info).order_items.load(self.id)
+
+@strawberry.input
+class CartLineInput:
+    product_id: int
+    quantity: int
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str]
+
+@strawberry.type
+class ProductEdge:
+    cursor: str
+    node: ProductType
+
+@strawberry.type
+class ProductConnection:
+    edges: List[ProductEdge]
+    page_info: PageInfo
+
+@strawberry.type
+class ProductSearchEdge:
+    cursor: str
+    rank: float
+    highlight: str
+    node: ProductType
+
+@strawberry.type
+class ProductSearchConnection:
+    edges: List[ProductSearchEdge]
+    page_info: PageInfo
+
+@strawberry.type
+class OrderEdge:
+    cursor: str
+    node: OrderType
+
+@strawberry.type
+class OrderConnection:
+    edges: List[OrderEdge]
+    page_info: PageInfo
+
+@strawberry.enum
+class OrderStatus(Enum):
+    PENDING = "Pending"
+    SHIPPED = "Shipped"
+    DELIVERED = "Delivered"
+    CANCELLED = "Cancelled"
+
+@strawberry.enum
+class ProductOrder(Enum):
+    ID = "id"
+    PRICE_ASC = "price"
+    PRICE_DESC = "-price"
+    NAME = "name"
 
 @strawberry.type
 class DeleteOrderResponse:
@@ -83,16 +218,62 @@ class DeleteOrderResponse:
 @strawberry.type
 class Query:
     @strawberry.field
-    def categories(self) -> List[CategoryType]:
-        return Category.objects.all()
+    async def categories(self) -> List[CategoryType]:
+        return await run_sync(catalog_cache.categories)
+
+    @strawberry.field
+    async def products(self, info: Info) -> List[ProductType]:
+        loaders = get_loaders(info)
+        for category in await run_sync(catalog_cache.categories):
+            loaders.categories.prime(category.id, category)
+        products = await run_sync(catalog_cache.products)
+        loaders.image_variants.enqueue(blobs.blob_name(image) for product in products for image in (product.image1, product.image2))
+        return products
+
+    @strawberry.field
+    async def products_connection(
+        self,
+        info: Info,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        category_id: Optional[int] = None,
+        gender: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        order_by: ProductOrder = ProductOrder.ID,
+    ) -> ProductConnection:
+        queryset = Product.objects.all()
+        if category_id is not None:
+            queryset = queryset.filter(category_id=category_id)
+        if gender is not None:
+            queryset = queryset.filter(gender=gender)
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=Decimal(str(min_price)))
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=Decimal(str(max_price)))
+
+        products, cursors, has_next_page = await run_sync(keyset_page, queryset, order_by.value, first, after)
+        get_loaders(info).enqueue_products(products)
+        return ProductConnection(
+            edges=[ProductEdge(cursor=cursor, node=product) for product, cursor in zip(products, cursors)],
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=cursors[-1] if cursors else None),
+        )
 
     @strawberry.field
-    def products(self) -> List[ProductType]:
-        return Product.objects.all()
+    async def search_products(self, info: Info, query: str, first: Optional[int] = None, after: Optional[str] = None) -> ProductSearchConnection:
+        products, cursors, has_next_page = await run_sync(search.search_products, query, first, after)
+        get_loaders(info).enqueue_products(products)
+        return ProductSearchConnection(
+            edges=[
+                ProductSearchEdge(cursor=cursor, rank=product.rank, highlight=product.highlight, node=product)
+                for product, cursor in zip(products, cursors)
+            ],
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=cursors[-1] if cursors else None),
+        )
 
     @strawberry.field
-    def profile(self, user_id: int) -> Optional[ProfileType]:
-        profile = Profile.objects.filter(user__id=user_id).first()
+    async def profile(self, user_id: int) -> Optional[ProfileType]:
+        profile = await run_sync(Profile.objects.select_related("user").filter(user__id=user_id).first)
         if profile:
             return ProfileType(
                 id=profile.user.id,
@@ -102,205 +283,108 @@ class Query:
                 last_name=profile.last_name,
                 email=profile.email,
                 phone_number=profile.phone_number,
-                image=profile.image.url if profile.image else None
+                image=profile.image.url if profile.image else None,
+                thumbnails=thumbnail_types(profile),
             )
         return None
 
     @strawberry.field
-    def cart(self, user_id: int) -> Optional[CartType]:
-        cart = Cart.objects.filter(user__id=user_id).first()
-        if cart:
-            return CartType(
-                id=cart.id,
-                user=cart.user.username,
-                items=cart.items.all(),
-                created_at=cart.created_at,
-            )
-        return None
+    async def cart(self, user_id: int) -> Optional[CartType]:
+        return await run_sync(Cart.objects.select_related("user").filter(user__id=user_id).first)
 
     @strawberry.field
-    def orders(self, user_id: int) -> List[OrderType]:
-        orders = Order.objects.filter(user__user__id=user_id)
-        return [
-            OrderType(
-                id=order.id,
-                user=order.user.user.username,
-                total_price=order.total_price,
-                status=order.status,
-                created_at=order.created_at,
-                order_items=[
-                    OrderItemType(
-                        id=item.id,
-                        product=ProductType(
-                            id=item.product.id,
-                            name=item.product.name,
-                            description=item.product.description,
-                            price=item.product.price,
-                            category=CategoryType(
-                                id=item.product.category.id,
-                                name=item.product.category.name,
-                                description=item.product.category.description
-                            ),
-                            image1=item.product.image1,
-                            image2=item.product.image2,
-                            gender=item.product.gender
-                        ),
-                        quantity=item.quantity,
-                        price=item.price
-                    )
-                    for item in order.order_items.all()  #  Use correct related_name
-                ]
-            )
-            for order in orders
-        ]
+    async def orders(self, info: Info, user_id: int) -> List[OrderType]:
+        orders = await run_sync(list, Order.objects.filter(user__user__id=user_id).select_related("user__user"))
+        get_loaders(info).order_items.enqueue(order.id for order in orders)
+        return orders
+
+    @strawberry.field
+    async def orders_connection(
+        self,
+        info: Info,
+        user_id: int,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        created_after: Optional[datetime] = None,
+    ) -> OrderConnection:
+        # Profiles are keyed by their user, so this filters without a join
+        queryset = Order.objects.filter(user_id=user_id).select_related("user__user").prefetch_related(
+            Prefetch("order_items", queryset=OrderItem.objects.select_related("product__category").order_by("id"))
+        )
+        if status is not None:
+            queryset = queryset.filter(status=status.value)
+        if created_after is not None:
+            queryset = queryset.filter(created_at__gt=created_after)
+
+        # One query for the page and one for all of its items, products and categories
+        orders, cursors, has_next_page = await run_sync(keyset_page, queryset, "-created_at", first, after)
+        loaders = get_loaders(info)
+        for order in orders:
+            loaders.prime_order_items(order.id, list(order.order_items.all()))
+        return OrderConnection(
+            edges=[OrderEdge(cursor=cursor, node=order) for order, cursor in zip(orders, cursors)],
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=cursors[-1] if cursors else None),
+        )
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation
-    def add_product(self, name: str, description: str, price: float, category_id: int, image1: Optional[str], image2: Optional[str], gender: str) -> ProductType:
-        category = Category.objects.get(id=category_id)
-        product = Product.objects.create(name=name, description=description, price=price, category=category, image1=image1, image2=image2, gender=gender)
-        return ProductType(
-            id=product.id,
-            name=product.name,
-            description=product.description,
-            price=product.price,
-            category=CategoryType(id=category.id, name=category.name, description=category.description),
-            image1=product.image1,
-            image2=product.image2,
-            gender=product.gender
-        )
+    async def add_product(self, info: Info, name: str, description: str, price: float, category_id: int, image1: Optional[str], image2: Optional[str], gender: str) -> ProductType:
+        category = await run_sync(Category.objects.get, id=category_id)
+        try:
+            product = await run_sync(Product.objects.create, name=name, description=description, price=price, category=category, image1=image1, image2=image2, gender=gender)
+        except IntegrityError:
+            raise Exception("A product with this name already exists.")
+        get_loaders(info).categories.prime(category.id, category)
+        return product
 
     @strawberry.mutation
-    def create_cart(self, user_id: int) -> CartType:
-        user = User.objects.get(id=user_id)
-        cart = Cart.objects.create(user=user)
-        return CartType(
-            id=cart.id,
-            user=user.username,
-            items=[],
-            created_at=cart.created_at
-        )
+    async def create_cart(self, user_id: int) -> CartType:
+        user = await run_sync(User.objects.get, id=user_id)
+        cart = await run_sync(Cart.objects.create, user=user)
+        return cart
     @strawberry.mutation
-    def place_order(self, user_id: int) -> OrderType:
-        user = User.objects.get(id=user_id)
-        profile = Profile.objects.filter(user=user).first()
-
-        if not profile:
-            raise Exception("Profile does not exist for this user.")
-
-        cart = Cart.objects.filter(user=user).first()
-        if not cart or not cart.items.exists():
-            raise Exception("Cart is empty. Add products before placing an order.")
+    async def place_order(self, info: Info, user_id: int) -> OrderType:
+        # transaction.atomic() can't span awaits, so checkout is one sync call
+        order, order_items, _ = await run_sync(checkout, user_id)
 
-        total_price = sum(item.product.price * item.quantity for item in cart.items.all())
-
-        # Create the Order
-        order = Order.objects.create(user=profile, total_price=total_price, status="Pending")
-
-        order_items = []
-        for cart_item in cart.items.all():
-            order_item = OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                price=cart_item.product.price
-            )
-            order_items.append(order_item)
-
-        # Clear the cart after placing the order
-        cart.items.all().delete()
-
-        return OrderType(
-            id=order.id,
-            user=order.user.user.username,
-            total_price=order.total_price,
-            status=order.status,
-            created_at=order.created_at,
-            order_items=[
-                OrderItemType(
-                    id=item.id,
-                    product=ProductType(
-                        id=item.product.id,
-                        name=item.product.name,
-                        description=item.product.description,
-                        price=item.product.price,
-                        category=CategoryType(
-                            id=item.product.category.id,
-                            name=item.product.category.name,
-                            description=item.product.category.description
-                        ),
-                        image1=item.product.image1,
-                        image2=item.product.image2,
-                        gender=item.product.gender
-                    ),
-                    quantity=item.quantity,
-                    price=item.price
-                )
-                for item in order_items
-            ]
-        )
+        # Build the response from the rows already in memory
+        get_loaders(info).prime_order_items(order.id, order_items)
+        return order
 
     @strawberry.mutation
-    def delete_order(self, order_id: int) -> DeleteOrderResponse:
-        order = Order.objects.filter(id=order_id).first()
+    async def delete_order(self, order_id: int) -> DeleteOrderResponse:
+        order = await run_sync(Order.objects.filter(id=order_id).first)
         if not order:
             return DeleteOrderResponse(success=False, message="Order not found.")
 
-        order.delete()
+        await run_sync(order.delete)
         return DeleteOrderResponse(success=True, message="Order deleted successfully.")
 
     @strawberry.mutation
-    def add_product_to_cart(self, user_id: int, product_id: int, quantity: int) -> CartType:
-        user = User.objects.get(id=user_id)
-        cart, created = Cart.objects.get_or_create(user=user)
-        product = Product.objects.get(id=product_id)
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product, defaults={'quantity': quantity})
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
-        return CartType(
-            id=cart.id,
-            user=cart.user.username,
-            items=cart.items.all(),
-            created_at=cart.created_at
-        )
+    async def add_product_to_cart(self, user_id: int, product_id: int, quantity: int) -> CartType:
+        return await run_sync(carts.add_item, user_id, product_id, quantity)
 
     @strawberry.mutation
-    def delete_product_from_cart(self, user_id: int, product_id: int) -> CartType:
-        user = User.objects.get(id=user_id)
-        cart = Cart.objects.get(user=user)
-        cart_item = CartItem.objects.get(cart=cart, product_id=product_id)
-        cart_item.delete()
-        return CartType(
-            id=cart.id,
-            user=cart.user.username,
-            items=cart.items.all(),
-            created_at=cart.created_at
-        )   
+    async def delete_product_from_cart(self, user_id: int, product_id: int) -> CartType:
+        return await run_sync(carts.remove_item, user_id, product_id)
     
     @strawberry.mutation
-    def update_cart_product(self, user_id: int, product_id: int, quantity: int) -> CartType:
-        user = User.objects.get(id=user_id)
-        cart = Cart.objects.get(user=user)
-        cart_item = CartItem.objects.get(cart=cart, product_id=product_id)
-
-        if quantity > 0:
-            cart_item.quantity = quantity
-            cart_item.save()
-        else:
-            cart_item.delete()
-        return CartType(
-            id=cart.id,
-            user=cart.user.username,
-            items=cart.items.all(),
-            created_at=cart.created_at
-        )
+    async def update_cart_product(self, user_id: int, product_id: int, quantity: int) -> CartType:
+        return await run_sync(carts.update_item, user_id, product_id, quantity)
 
     @strawberry.mutation
-    def delete_profile(self, user_id: int) -> DeleteOrderResponse:
-        profile = Profile.objects.filter(user__id=user_id).first()
-        user = User.objects.filter(id=user_id).first()
+    async def sync_cart(self, user_id: int, lines: List[CartLineInput], replace: bool = False) -> CartType:
+        # Each line sets a product's quantity (0 removes it); with `replace`,
+        # the products that aren't listed are removed as well
+        lines = [(line.product_id, line.quantity) for line in lines]
+        return await run_sync(carts.sync_items, user_id, lines, replace)
+
+    @strawberry.mutation
+    async def delete_profile(self, user_id: int) -> DeleteOrderResponse:
+        profile = await run_sync(Profile.objects.filter(user__id=user_id).first)
+        user = await run_sync(User.objects.filter(id=user_id).first)
 
         if not profile:
             return DeleteOrderResponse(success=False, message="Profile not found.")
@@ -309,28 +393,30 @@ class Mutation:
             return DeleteOrderResponse(success=False, message="User not found.")
 
         # Delete the profile and the user
-        profile.delete()
-        user.delete()
+        await run_sync(profile.delete)
+        await run_sync(user.delete)
 
         return DeleteOrderResponse(success=True, message="Profile and user deleted successfully.")
 
     @strawberry.mutation
     
-    def edit_profile(self, user_id: int, username: Optional[str] = None, address: Optional[str] = None, 
+    async def edit_profile(self, user_id: int, username: Optional[str] = None, address: Optional[str] = None, 
                     first_name: Optional[str] = None, last_name: Optional[str] = None, 
-                    phone_number: Optional[str] = None, image: Optional[str] = None) -> ProfileType:
-        profile = Profile.objects.filter(user__id=user_id).first()
-        user = User.objects.filter(id=user_id).first()
+                    phone_number: Optional[str] = None, image: Optional[str] = None,
+                    image_file: Optional[Upload] = None) -> ProfileType:
+        profile = await run_sync(Profile.objects.filter(user__id=user_id).first)
+        user = await run_sync(User.objects.filter(id=user_id).first)
 
         if not profile:
             raise Exception("Profile does not exist for this user.")
 
         if not user:
             raise Exception("User does not exist.")
+        profile.user = user
 
         if username is not None:
             user.username = username
-            user.save()
+            await run_sync(user.save)
 
         if address is not None:
             profile.address = address
@@ -341,26 +427,11 @@ class Mutation:
         if phone_number is not None:
             profile.phone_number = phone_number
         
-        # Handle image upload
-        if image is not None and image.startswith('data:image'):
-            # Extract file format and base64 data
-            format, imgstr = image.split(';base64,')
-            ext = format.split('/')[-1]
-            
-            # Generate a unique filename
-            filename = f"{uuid.uuid4()}.{ext}"
-            
-            profile_images_dir = os.path.join(settings.MEDIA_ROOT, 'profileimage')
-            
-            # Save the image file
-            file_path = os.path.join(profile_images_dir, filename)
-            with open(file_path, 'wb') as f:
-                f.write(base64.b64decode(imgstr))
-            
-            # Save path relative to MEDIA_ROOT
-            profile.image = f'profileimage/{filename}'
-
-        profile.save()
+        # Handle image upload, preferably sent as a multipart file upload; the
+        # base64 data URL is still accepted but is held in memory whole
+        if image_file is None and image is not None and image.startswith('data:image'):
+            image_file = ContentFile(base64.b64decode(image.split(';base64,')[1]))
+        await run_sync(images.save_profile, profile, image_file)
 
         # Get the full URL for the image
         image_url = None
@@ -375,47 +446,40 @@ class Mutation:
             last_name=profile.last_name,
             email=profile.email,
             phone_number=profile.phone_number,
-            image=image_url
+            image=image_url,
+            thumbnails=thumbnail_types(profile),
         )
     
 
     @strawberry.mutation
-    def notify_order(self, info: Info, order_id: int) -> str:
+    async def notify_order(self, info: Info, order_id: int) -> str:
         try:
-            order = Order.objects.get(id=order_id)
-            user_profile = order.user  # Profile model
-            email = user_profile.email
-            name = user_profile.first_name
-            address = user_profile.address
-
-            subject = f"Order #{order.id} Confirmation"
-            message = (
-                f"Hello {name},\n\n"
-                f"Thank you for your order! We’re excited to let you know that your {order} has been successfully received and is now being processed.\n\n"
-                f"Here are your Order Details\n\n"
-                f"----------------------------------------------------\n\n"
-                f"Order ID: {order.id}\n"
-                f"Total: ₹{order.total_price}\n"
-                f"Status: {order.status}\n"
-                f"Placed on: {order.created_at.strftime('%Y-%m-%d %H:%M')}\n\n"
-                f"Shipping Address\n"
-                f"{address}\n\n"
-                f"----------------------------------------------------\n\n"
-                f"We'll notify you when it's shipped!\n\n"
-                f"Thank you for choosing ShopifyFR!\n\n"
-                f"Warm regards, \nShopifyFR\n\n"
-            )
-
-            send_notification_email(subject, message, email)
-            return "Email sent successfully"
+            order = await run_sync(Order.objects.select_related("user__user").get, id=order_id)
+            # Delivered by `manage.py run_email_worker`; place_order already queues
+            # the same confirmation, so this never sends it twice.
+            await run_sync(queue_order_confirmation, order, order.user)
+            return "Email queued successfully"
         except Order.DoesNotExist:
             return "Order not found"
         except Exception as e:
             return f"Error: {str(e)}"
 
+def thumbnail_types(profile):
+    return [ThumbnailType(size=size, webp=urls["webp"], jpeg=urls["jpeg"]) for size, urls in images.thumbnail_urls(profile)]
+
 MergedQuery = merge_types("MergedQuery", (AuthQuery, Query))
 MergedMutation = merge_types("MergedMutation", (AuthMutation, Mutation))
 
-schema = strawberry.Schema(query=MergedQuery, mutation=MergedMutation)
+schema = strawberry.Schema(
+    query=MergedQuery,
+    mutation=MergedMutation,
+    extensions=[
+        # First, so the other extensions see results rather than coroutines
+        InlineResolversExtension,
+        QueryStatsExtension,
+        DocumentCacheExtension(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        QueryCostExtension(max_depth=settings.GRAPHQL_MAX_DEPTH, max_cost=settings.GRAPHQL_MAX_COST),
+    ],
+)
 
 
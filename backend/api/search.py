@@ -0,0 +1,193 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import BooleanField, DecimalField, TextField
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+from .pagination import decode_cursor, encode_cursor, keyset_page, page_size
+
+# Relative weights of the indexed fields. These mirror the A/B/C weights given
+# to name, category name and description by the PostgreSQL trigger, and the
+# default {1.0, 0.4, 0.2} ts_rank weights for those labels.
+FIELD_WEIGHTS = {
+    "name": 1.0,
+    "category": 0.4,
+    "description": 0.2,
+}
+
+HIGHLIGHT_WORDS = 25
+# ts_rank_cd returns a float4, which the cursor can't carry exactly; results
+# are ordered and paginated by the rank rounded to a numeric instead
+RANK_DECIMAL_PLACES = 6
+TOKEN_RE = re.compile(r"\w+")
+
+
+def search_products(query, first=None, after=None):
+    """
+    Run a ranked full-text search over product name, description and category name.
+
+    Returns a `(products, cursors, has_next_page)` tuple like `keyset_page`,
+    where every product carries `rank` and `highlight` attributes.
+    """
+    if not query.strip():
+        return [], [], False
+    if connection.vendor == "postgresql":
+        return _search_postgres(query, first, after)
+    return search_index.search(query, first, after)
+
+
+def _search_postgres(query, first, after):
+    table = Product._meta.db_table
+    tsquery = "websearch_to_tsquery('english', %s)"
+    queryset = (
+        Product.objects
+        .filter(RawSQL(f"{table}.search_vector @@ {tsquery}", [query], output_field=BooleanField()))
+        .annotate(
+            rank=RawSQL(
+                f"round(ts_rank_cd({table}.search_vector, {tsquery})::numeric, {RANK_DECIMAL_PLACES})",
+                [query],
+                output_field=DecimalField(max_digits=RANK_DECIMAL_PLACES + 10, decimal_places=RANK_DECIMAL_PLACES),
+            ),
+            highlight=RawSQL(
+                f"ts_headline('english', {table}.name || ' - ' || {table}.description, {tsquery}, "
+                f"'MaxWords={HIGHLIGHT_WORDS}, MinWords=10')",
+                [query],
+                output_field=TextField(),
+            ),
+        )
+    )
+    return keyset_page(queryset, "-rank", first, after)
+
+
+def tokenize(text):
+    return [_stem(token) for token in TOKEN_RE.findall((text or "").lower())]
+
+
+def _stem(token):
+    # Crude plural folding so "shirts" matches "shirt"; good enough for a fallback.
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+class InvertedIndex:
+    """
+    In-process inverted index used when the database has no full-text search.
+
+    The index is built from the database on the first search and then kept up
+    to date one product at a time by the signal handlers in `api.signals`.
+    It lives in the memory of a single process, so it is meant for SQLite
+    development and test runs rather than multi-worker deployments.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            self._built = False
+
+    def _build(self):
+        for product in Product.objects.select_related("category"):
+            self._add(product)
+        self._built = True
+
+    def _add(self, product):
+        weights = defaultdict(float)
+        fields = {
+            "name": product.name,
+            "category": product.category.name,
+            "description": product.description,
+        }
+        for field, text in fields.items():
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self._postings[term][product.pk] = weight
+        self._documents[product.pk] = set(weights)
+
+    def _remove(self, product_id):
+        for term in self._documents.pop(product_id, ()):
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def update(self, product):
+        with self._lock:
+            if self._built:
+                self._remove(product.pk)
+                self._add(product)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._built:
+                self._remove(product_id)
+
+    def update_category(self, category):
+        with self._lock:
+            if not self._built:
+                return
+            for product in category.products.select_related("category"):
+                self._remove(product.pk)
+                self._add(product)
+
+    def rank(self, query):
+        """Return `(score, product_id)` pairs for products matching every query term."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._built:
+                self._build()
+            if not terms or any(term not in self._postings for term in terms):
+                return []
+            total = len(self._documents)
+            postings = [self._postings[term] for term in terms]
+            matches = set.intersection(*(set(p) for p in postings))
+            scores = defaultdict(float)
+            for p in postings:
+                idf = math.log(1 + total / len(p))
+                for product_id in matches:
+                    scores[product_id] += p[product_id] * idf
+        return sorted(((score, pk) for pk, score in scores.items()), reverse=True)
+
+    def search(self, query, first=None, after=None):
+        ranked = self.rank(query)
+        if after:
+            value, pk = decode_cursor(after)
+            ranked = [(score, id) for score, id in ranked if (score, id) < (value, pk)]
+        limit = page_size(first)
+        page = ranked[:limit + 1]
+        products = Product.objects.in_bulk([pk for _, pk in page])
+        terms = set(tokenize(query))
+
+        rows, cursors = [], []
+        for score, pk in page:
+            product = products.get(pk)
+            if product is None:
+                continue
+            product.rank = score
+            product.highlight = highlight(f"{product.name} - {product.description}", terms)
+            rows.append(product)
+            cursors.append(encode_cursor(score, pk))
+        has_next_page = len(rows) > limit
+        return rows[:limit], cursors[:limit], has_next_page
+
+
+def highlight(text, terms):
+    """Return a window of `text` around the first matching term, with matches wrapped in <b> tags."""
+    words = text.split()
+    matched = [any(_stem(token) in terms for token in TOKEN_RE.findall(word.lower())) for word in words]
+    start = matched.index(True) if any(matched) else 0
+    start = max(0, min(start - HIGHLIGHT_WORDS // 3, len(words) - HIGHLIGHT_WORDS))
+    window = range(start, min(start + HIGHLIGHT_WORDS, len(words)))
+    return " ".join(f"<b>{words[i]}</b>" if matched[i] else words[i] for i in window)
+
+
+search_index = InvertedIndex()
@@ -55,6 +55,7 @@ AUTHENTICATION_BACKENDS = [
 REFRESH_TOKEN_MODEL = 'authentication.RefreshToken'
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -116,9 +117,13 @@ DATABASES = {
     }
 }
 
+# Under ASGI the ORM runs in sync_to_async threads, which don't close
+# persistent connections reliably, so each request opens its own there
+ASGI = os.getenv('ASGI') == 'True'
+
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.config(
-        conn_max_age=500,
+        conn_max_age=0 if ASGI else 500,
         conn_health_checks=True,
     )
 
@@ -131,6 +136,84 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Threads hashing the passwords of new accounts, per worker
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', '2'))
+
+# Verified access token claims kept in memory per worker, and for how long
+# (never past the token's expiry), in seconds
+JWT_CLAIMS_CACHE_SIZE = 1024
+JWT_CLAIMS_CACHE_TTL = 300
+# How long a worker may keep accepting the tokens of a user who logged out
+# elsewhere, in seconds. Immediate with a shared CATALOG_CACHE_ALIAS.
+JWT_REVOCATION_CHECK_TTL = 30
+
+# A Redis server shared by all workers, e.g. redis://redis:6379/0. Without
+# one, caches live in each worker's memory.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+# Cache alias shared by all workers for the catalog cache (api.catalog),
+# which also versions the response cache and token revocations. Without
+# one, catalog reads are only cached in-process, which is correct with a
+# single worker only: `manage.py check` (run by `migrate`) fails when
+# WEB_CONCURRENCY asks gunicorn for more.
+CATALOG_CACHE_ALIAS = os.getenv('CATALOG_CACHE_ALIAS') or ('default' if os.getenv('REDIS_URL') else None)
+CATALOG_CACHE_TIMEOUT = 300
+
+# max-age of cached public GraphQL responses; with 0, browsers and CDNs
+# revalidate every time and get a 304 while the catalog is unchanged
+GRAPHQL_CACHE_MAX_AGE = int(os.getenv('GRAPHQL_CACHE_MAX_AGE', '0'))
+
+# Parsed and validated GraphQL documents kept in memory, per worker
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+
+# Operations nested deeper or costing more than this are rejected before
+# running (see api.extensions.QueryCostExtension)
+GRAPHQL_MAX_DEPTH = int(os.getenv('GRAPHQL_MAX_DEPTH', '10'))
+GRAPHQL_MAX_COST = int(os.getenv('GRAPHQL_MAX_COST', '5000'))
+
+# JSON file of the frontend's operations (an Apollo persisted query manifest
+# or a {sha256: query} object). When set, no other operation is accepted.
+GRAPHQL_ALLOWLIST = os.getenv('GRAPHQL_ALLOWLIST')
+
+# Largest accepted profile image upload, in bytes. Django streams uploads
+# over FILE_UPLOAD_MAX_MEMORY_SIZE to a temporary file rather than memory.
+PROFILE_IMAGE_MAX_SIZE = int(os.getenv('PROFILE_IMAGE_MAX_SIZE', str(5 * 1024 * 1024)))
+# Square thumbnails made of each profile image, in pixels
+PROFILE_THUMBNAIL_SIZES = (64, 256)
+
+# Widths, in pixels, of the resized copies of product images (api.variants)
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1024)
+
+# Distinct GraphQL operation labels recorded in the metrics, per worker;
+# operations beyond them are recorded as "other"
+GRAPHQL_METRICS_MAX_OPERATIONS = int(os.getenv('GRAPHQL_METRICS_MAX_OPERATIONS', '100'))
+
+# /metrics requires an "Authorization: Bearer <token>" header with this
+# token; when unset it is refused, unless DEBUG is on
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -185,6 +268,7 @@ SECURE_HSTS_SECONDS = 31536000  # 1 year
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 SECURE_SSL_REDIRECT = True
+SECURE_REDIRECT_EXEMPT = [r'^metrics$']  # Scraped over the internal network
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 
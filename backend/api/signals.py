@@ -0,0 +1,105 @@
+from collections import Counter
+
+from django.core.signals import request_finished
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import blobs
+from .carts import recompute_totals
+from .catalog import catalog_cache
+from .extensions import record_query
+from .metrics import DB_CONNECTIONS_OPEN
+from .models import Cart, Category, Product, Profile
+from .search import search_index
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search_index.update(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    if not created:
+        search_index.update_category(instance)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    catalog_cache.invalidate()
+    # Again once the change is visible to other connections, in case one of
+    # them cached the old rows in between
+    transaction.on_commit(catalog_cache.invalidate)
+
+
+@receiver(post_save, sender=Product)
+def reprice_carts(sender, instance, created, **kwargs):
+    # Cart totals are priced at the current product prices
+    if not created:
+        recompute_totals(Cart.objects.filter(items__product=instance))
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts(sender, instance, **kwargs):
+    # The cart items go with the product, so find their carts beforehand
+    instance._cart_ids = list(Cart.objects.filter(items__product=instance).values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def recompute_carts(sender, instance, **kwargs):
+    if getattr(instance, "_cart_ids", None):
+        recompute_totals(Cart.objects.filter(id__in=instance._cart_ids))
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_images(sender, instance, update_fields=None, **kwargs):
+    # Read back, so every way of saving a product (admin, addProduct, ...)
+    # keeps the blob counts; the seed's bulk upserts count their own
+    instance._saved_blobs = None
+    if update_fields is not None and not {"image1", "image2"} & set(update_fields):
+        return
+    saved = Product.objects.filter(pk=instance.pk).values_list("image1", "image2").first() if instance.pk else None
+    instance._saved_blobs = [name for name in map(blobs.blob_name, saved or ()) if name]
+
+
+@receiver(post_save, sender=Product)
+def count_product_images(sender, instance, **kwargs):
+    saved = getattr(instance, "_saved_blobs", None)
+    if saved is None:
+        return
+    before, after = Counter(saved), Counter(blobs.product_blobs(instance))
+    blobs.retain(list((after - before).elements()))
+    blobs.release(list((before - after).elements()))
+
+
+@receiver(post_delete, sender=Product)
+def release_product_images(sender, instance, **kwargs):
+    blobs.release(blobs.product_blobs(instance))
+
+
+@receiver(post_delete, sender=Profile)
+def release_profile_images(sender, instance, **kwargs):
+    blobs.release(blobs.profile_blobs(instance))
+
+
+# Connected after Django's own close_old_connections receiver, so this sees
+# the connections that outlive the request (CONN_MAX_AGE)
+@receiver(request_finished)
+def count_open_connections(sender, **kwargs):
+    for alias in connections:
+        DB_CONNECTIONS_OPEN.set(int(connections[alias].connection is not None), alias=alias)
+
+
+@receiver(connection_created)
+def track_queries(sender, connection, **kwargs):
+    # Once per connection, as reconnecting keeps the same wrapper list
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,38 @@
+import random
+
+from django.test import TestCase
+from . import benchmark
+from .models import Order
+
+
+class BenchmarkTestCase(TestCase):
+    def test_run_reports_every_operation(self):
+        rng = random.Random(1)
+        product_ids, user_ids = benchmark.seed(categories=2, products=10, users=3, rng=rng)
+        workload = benchmark.Workload(product_ids, user_ids, rng)
+        results = benchmark.run(workload, requests=60, warmup=5)
+
+        self.assertEqual(sum(stats["count"] for stats in results["operations"].values()), 60)
+        self.assertLessEqual(set(results["operations"]), set(benchmark.DEFAULT_MIX))
+        for stats in results["operations"].values():
+            self.assertEqual(stats["errors"], 0)
+            self.assertLessEqual(stats["p50"], stats["p95"])
+            self.assertLessEqual(stats["p95"], stats["p99"])
+        self.assertEqual(Order.objects.count() > 0, "placeOrder" in results["operations"])
+
+    def test_compare_flags_regressions(self):
+        baseline = {"operations": {
+            "browse": {"p95": 10.0, "queries": 2, "maxQueries": 2, "errors": 0},
+            "placeOrder": {"p95": 20.0, "queries": 9, "maxQueries": 9, "errors": 0},
+        }}
+        results = {"operations": {
+            "browse": {"p95": 11.0, "queries": 2, "maxQueries": 2, "errors": 0},
+            "placeOrder": {"p95": 30.0, "queries": 10, "maxQueries": 12, "errors": 1},
+        }}
+        self.assertEqual(benchmark.compare(results, baseline), [
+            "placeOrder: p95 20.0ms -> 30.0ms",
+            "placeOrder: 9 -> 10 queries per operation",
+            "placeOrder: at most 9 -> 12 queries",
+            "placeOrder: 1 errors",
+        ])
+        self.assertEqual(benchmark.compare(results, baseline, tolerance=0.5)[0], "placeOrder: 9 -> 10 queries per operation")
@@ -0,0 +1,160 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from . import blobs
+from .models import Blob, Category, Product, Profile
+from .test_seed import FIELDS
+from .views import blob_view
+
+EDIT_PROFILE = "mutation ($userId: Int!, $image: Upload) { editProfile(userId: $userId, imageFile: $image) { id } }"
+
+def image_bytes(color="red"):
+    content = BytesIO()
+    Image.new("RGB", (32, 32), color).save(content, "PNG")
+    return content.getvalue()
+
+class BlobStorageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_profile(self, username):
+        user = get_user_model().objects.create_user(username=username, email=f"{username}@example.com", password="password123")
+        Profile.objects.create(user=user, username=username, email=f"{username}@example.com", address="", first_name="", last_name="", phone_number="")
+        return user
+
+    def upload(self, user, content):
+        operations = {"query": EDIT_PROFILE, "variables": {"userId": user.id, "image": None}}
+        response = self.client.post("/graphql/", data={
+            "operations": json.dumps(operations),
+            "map": json.dumps({"0": ["variables.image"]}),
+            "0": SimpleUploadedFile("avatar.png", content),
+        }, secure=True)
+        self.assertNotIn("errors", json.loads(response.content))
+
+    def test_identical_uploads_are_stored_once(self):
+        first, second = self.create_profile("first"), self.create_profile("second")
+        self.upload(first, image_bytes())
+        self.upload(second, image_bytes())
+        name = Profile.objects.get(user=first).image.name
+        self.assertEqual(Profile.objects.get(user=second).image.name, name)
+        self.assertRegex(name, r"^blobs/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.png$")
+        self.assertEqual(Blob.objects.get().references, 2)
+
+        # Replacing an image releases the old one
+        self.upload(second, image_bytes("blue"))
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+        Profile.objects.get(user=first).delete()
+        self.assertEqual(Blob.objects.get(name=name).references, 0)
+
+    def test_blobs_are_served_as_immutable(self):
+        name = blobs.store(ContentFile(b"blob content"), ".txt")
+        url = blobs.blob_storage.url(name)
+        self.assertTrue(url.startswith("/media/blobs/"))
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(b"".join(response.streaming_content), b"blob content")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"], secure=True)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(f"/media/blobs/00/00/{'0' * 64}.txt", secure=True).status_code, 404)
+
+    def test_only_blob_names_are_served(self):
+        name = blobs.store(ContentFile(b"blob content"), ".txt")
+        with open(os.path.join(self.media_root, "secret.txt"), "w") as f:
+            f.write("not a blob")
+        digest = name.split("/")[-1].split(".")[0]
+        for path in ["../secret.txt", "00/00/../../../secret.txt", f"{name[len('blobs/'):]}/", "missing.txt"]:
+            self.assertEqual(self.client.get(f"/media/blobs/{path}", secure=True).status_code, 404, path)
+        # Shard directories that don't match the digest
+        request = RequestFactory().get("/")
+        for path in [f"00/00/{digest}.txt", "../secret.txt"]:
+            with self.assertRaises(Http404):
+                blob_view(request, path)
+        self.assertEqual(self.client.get(f"/media/{name}", secure=True).status_code, 200)
+
+    def test_collect_deletes_unused_blobs(self):
+        used = blobs.store(ContentFile(b"used"), ".jpg")
+        unused = blobs.store(ContentFile(b"unused"), ".jpg")
+        recent = blobs.store(ContentFile(b"recent"), ".jpg")
+        category = Category.objects.create(name="Shirt")
+        Product.objects.create(name="Shirt", description="", price=1, category=category, gender="Men", image1=blobs.blob_storage.url(used))
+        # Referenced, but its count drifted to zero
+        Blob.objects.filter(name=used).update(references=0)
+        Blob.objects.exclude(name=recent).update(stored_at=timezone.now() - timedelta(days=2))
+        orphan = os.path.join(self.media_root, "blobs", "tmpleftover")
+        open(orphan, "w").close()
+        os.utime(orphan, (0, 0))
+
+        out = StringIO()
+        call_command("collect_blobs", "--dry-run", stdout=out)
+        self.assertIn("2 unused file(s) would be deleted", out.getvalue())
+        call_command("collect_blobs", stdout=out)
+        self.assertIn("2 unused file(s) deleted", out.getvalue())
+        self.assertEqual(set(Blob.objects.values_list("name", "references")), {(used, 1), (recent, 0)})
+        self.assertFalse(blobs.blob_storage.exists(unused))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(blobs.blob_storage.exists(used))
+
+        Blob.objects.update(references=5)
+        call_command("collect_blobs", "--recount", stdout=out)
+        self.assertIn("Fixed the reference counts of 2 file(s)", out.getvalue())
+        self.assertEqual(Blob.objects.get(name=used).references, 1)
+
+    def test_product_writes_count_references(self):
+        first, second = (blobs.store(ContentFile(content), ".jpg") for content in (b"first", b"second"))
+        references = lambda: dict(Blob.objects.values_list("name", "references"))
+        category = Category.objects.create(name="Shirt")
+        query = f'mutation {{ addProduct(name: "SHIRT", description: "", price: 1, categoryId: {category.id}, image1: "{blobs.blob_storage.url(first)}", image2: "{blobs.blob_storage.url(first)}", gender: "Men") {{ id }} }}'
+        response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True)
+        self.assertNotIn("errors", json.loads(response.content))
+        self.assertEqual(references(), {first: 2, second: 0})
+
+        product = Product.objects.get()
+        product.image2 = blobs.blob_storage.url(second)
+        product.save()
+        self.assertEqual(references(), {first: 1, second: 1})
+        product.price = 2
+        product.save(update_fields=["price"])
+        self.assertEqual(references(), {first: 1, second: 1})
+        product.delete()
+        self.assertEqual(references(), {first: 0, second: 0})
+
+    def test_seed_stores_local_images(self):
+        images_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, images_dir)
+        for filename in ("a.jpg", "copy-of-a.jpg"):
+            with open(os.path.join(images_dir, filename), "wb") as f:
+                f.write(b"same image")
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerow([1, "SHIRT", "", "[{'a.jpg': 'Image 0'}, {'https://example.com/1.jpg': 'Image 1'}]", "₹1.00", "", "Shirt", "Men"])
+            writer.writerow([2, "SHOE", "", "[{'copy-of-a.jpg': 'Image 0'}, {'missing.jpg': 'Image 1'}]", "₹1.00", "", "Shoes", "Men"])
+
+        call_command("seed", "--file", path, "--images-dir", images_dir, stdout=StringIO())
+        shirt, shoe = Product.objects.get(name="SHIRT"), Product.objects.get(name="SHOE")
+        self.assertTrue(shirt.image1.startswith("/media/blobs/"))
+        self.assertEqual((shoe.image1, shoe.image2), (shirt.image1, "missing.jpg"))
+        self.assertEqual(shirt.image2, "https://example.com/1.jpg")
+        self.assertEqual(Blob.objects.get().references, 2)
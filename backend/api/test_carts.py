@@ -0,0 +1,160 @@
+import json
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from .models import Category, Product, ProductStock, Profile, Cart, CartItem
+from .testing import assert_max_queries
+
+TOTALS = "query ($userId: Int!) { cart(userId: $userId) { itemCount totalQuantity totalPrice } }"
+
+class CartTotalsTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Electronics")
+        self.products = [
+            Product.objects.create(name=f"Product {i}", description="", price=Decimal("2.50") * (i + 1), category=category, gender="Male")
+            for i in range(3)
+        ]
+        self.user = get_user_model().objects.create_user(username="shopper", email="shopper@example.com", password="password123")
+        Profile.objects.create(user=self.user, username="shopper", email="shopper@example.com", address="", first_name="", last_name="", phone_number="")
+
+    def execute(self, query, **variables):
+        response = self.client.post("/graphql/", data={"query": query, "variables": {"userId": self.user.id, **variables}}, content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return result["data"]
+
+    def mutate(self, mutation, product, arguments=""):
+        query = "mutation ($userId: Int!, $productId: Int!) { %s(userId: $userId, productId: $productId %s) { itemCount totalQuantity totalPrice } }" % (mutation, arguments)
+        return self.execute(query, productId=product.id)[mutation]
+
+    def assert_totals(self, totals, item_count, total_quantity, total_price):
+        self.assertEqual(totals, {"itemCount": item_count, "totalQuantity": total_quantity, "totalPrice": total_price})
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual((cart.item_count, cart.total_quantity, cart.total_price), (item_count, total_quantity, Decimal(str(total_price))))
+
+    def test_mutations_maintain_totals(self):
+        first, second, _ = self.products
+        self.assert_totals(self.mutate("addProductToCart", first, "quantity: 2"), 1, 2, 5.0)
+        self.assert_totals(self.mutate("addProductToCart", first, "quantity: 1"), 1, 3, 7.5)
+        self.assert_totals(self.mutate("addProductToCart", second, "quantity: 4"), 2, 7, 27.5)
+        self.assert_totals(self.mutate("updateCartProduct", second, "quantity: 1"), 2, 4, 12.5)
+        self.assert_totals(self.mutate("updateCartProduct", first, "quantity: 0"), 1, 1, 5.0)
+        self.assert_totals(self.mutate("deleteProductFromCart", second), 0, 0, 0.0)
+
+    def test_totals_are_a_single_row_read(self):
+        self.mutate("addProductToCart", self.products[2], "quantity: 2")
+        with assert_max_queries(1):
+            totals = self.execute(TOTALS)["cart"]
+        self.assertEqual(totals, {"itemCount": 1, "totalQuantity": 2, "totalPrice": 15.0})
+
+    def test_checkout_empties_totals(self):
+        self.mutate("addProductToCart", self.products[0], "quantity: 2")
+        self.execute("mutation ($userId: Int!) { placeOrder(userId: $userId) { id } }")
+        self.assertEqual(self.execute(TOTALS)["cart"], {"itemCount": 0, "totalQuantity": 0, "totalPrice": 0.0})
+
+    def test_product_changes_reprice_carts(self):
+        first, second, _ = self.products
+        self.mutate("addProductToCart", first, "quantity: 2")
+        self.mutate("addProductToCart", second, "quantity: 1")
+        first.price = Decimal("10.00")
+        first.save()
+        self.assertEqual(self.execute(TOTALS)["cart"], {"itemCount": 2, "totalQuantity": 3, "totalPrice": 25.0})
+        second.delete()
+        self.assertEqual(self.execute(TOTALS)["cart"], {"itemCount": 1, "totalQuantity": 2, "totalPrice": 20.0})
+
+    def test_repair_command(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=3)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=1)
+        Cart.objects.create(user=get_user_model().objects.create_user(username="empty", password=None))
+
+        out = StringIO()
+        call_command("repair_cart_totals", "--dry-run", stdout=out)
+        self.assertIn("1 cart(s) with wrong totals", out.getvalue())
+
+        call_command("repair_cart_totals", "--batch-size", "1", stdout=out)
+        self.assertIn("Recomputed the totals of 2 cart(s), 1 of which were wrong", out.getvalue())
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.total_quantity, cart.total_price), (2, 4, Decimal("12.50")))
+
+    def test_add_to_cart_is_one_upsert(self):
+        product = self.products[0]
+        self.mutate("addProductToCart", product, "quantity: 1")
+        with assert_max_queries(6) as queries:
+            totals = self.mutate("addProductToCart", product, "quantity: 2")
+        self.assertEqual(totals, {"itemCount": 1, "totalQuantity": 3, "totalPrice": 7.5})
+        self.assertEqual(CartItem.objects.get(cart__user=self.user, product=product).quantity, 3)
+        writes = [query["sql"] for query in queries.captured_queries if query["sql"].lstrip().startswith("INSERT")]
+        self.assertEqual(len(writes), 1)
+        self.assertIn("ON CONFLICT", writes[0])
+
+    def test_add_to_cart_errors(self):
+        query = "mutation ($userId: Int!, $productId: Int!) { addProductToCart(userId: $userId, productId: $productId, quantity: 1) { id } }"
+        for user_id, product_id, message in (
+            (self.user.id, 0, "Product does not exist."),
+            (0, self.products[0].id, "CustomUser matching query does not exist."),
+        ):
+            response = self.client.post("/graphql/", data={"query": query, "variables": {"userId": user_id, "productId": product_id}}, content_type="application/json", secure=True)
+            self.assertEqual(json.loads(response.content)["errors"][0]["message"], message)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_sync_cart(self):
+        first, second, third = self.products
+        self.mutate("addProductToCart", first, "quantity: 1")
+        query = """
+        mutation ($userId: Int!, $lines: [CartLineInput!]!, $replace: Boolean!) {
+          syncCart(userId: $userId, lines: $lines, replace: $replace) { itemCount totalQuantity totalPrice items { quantity product { name } } }
+        }
+        """
+        lines = [{"productId": second.id, "quantity": 2}, {"productId": third.id, "quantity": 1}, {"productId": first.id, "quantity": 4}]
+        with assert_max_queries(9):
+            cart = self.execute(query, lines=lines, replace=False)["syncCart"]
+        self.assertEqual((cart["itemCount"], cart["totalQuantity"], cart["totalPrice"]), (3, 7, 27.5))
+        self.assertEqual([item["quantity"] for item in cart["items"]], [4, 2, 1])
+
+        lines = [{"productId": second.id, "quantity": 0}, {"productId": third.id, "quantity": 3}]
+        cart = self.execute(query, lines=lines, replace=False)["syncCart"]
+        self.assertEqual((cart["itemCount"], cart["totalQuantity"], cart["totalPrice"]), (2, 7, 32.5))
+
+        cart = self.execute(query, lines=[{"productId": second.id, "quantity": 5}], replace=True)["syncCart"]
+        self.assertEqual(cart["items"], [{"quantity": 5, "product": {"name": "Product 1"}}])
+        self.assertEqual((cart["itemCount"], cart["totalQuantity"], cart["totalPrice"]), (1, 5, 25.0))
+
+    def test_sync_cart_is_all_or_nothing(self):
+        ProductStock.objects.create(product=self.products[1], quantity=1)
+        query = "mutation ($userId: Int!, $lines: [CartLineInput!]!) { syncCart(userId: $userId, lines: $lines) { id } }"
+        for lines, message in (
+            ([{"productId": self.products[0].id, "quantity": 1}, {"productId": 0, "quantity": 1}], "Product does not exist."),
+            ([{"productId": self.products[0].id, "quantity": 1}, {"productId": self.products[1].id, "quantity": 2}], "Not enough stock for this product."),
+            ([{"productId": self.products[0].id, "quantity": -1}], "Quantity cannot be negative."),
+        ):
+            response = self.client.post("/graphql/", data={"query": query, "variables": {"userId": self.user.id, "lines": lines}}, content_type="application/json", secure=True)
+            self.assertEqual(json.loads(response.content)["errors"][0]["message"], message)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_admin_edits_keep_totals(self):
+        admin = get_user_model().objects.create_superuser(username="admin", email="admin@example.com", password="password123")
+        self.client.force_login(admin)
+        cart = Cart.objects.create(user=self.user)
+        other = Cart.objects.create(user=admin)
+        url = "/admin/api/cartitem/"
+        data = {"cart": cart.id, "product": self.products[0].id, "quantity": 2}
+        self.assertEqual(self.client.post(f"{url}add/", data, secure=True).status_code, 302)
+        item = CartItem.objects.get()
+        self.assert_totals(self.execute(TOTALS)["cart"], 1, 2, 5.0)
+
+        # Moving the item updates both carts
+        self.client.post(f"{url}{item.id}/change/", {**data, "cart": other.id, "quantity": 3}, secure=True)
+        self.assertEqual(Cart.objects.get(id=cart.id).total_quantity, 0)
+        self.assertEqual((Cart.objects.get(id=other.id).total_quantity, Cart.objects.get(id=other.id).total_price), (3, Decimal("7.50")))
+
+        self.client.post(f"{url}{item.id}/delete/", {"post": "yes"}, secure=True)
+        self.assertEqual(Cart.objects.get(id=other.id).item_count, 0)
+
+        item = CartItem.objects.create(cart=cart, product=self.products[1], quantity=1)
+        self.client.post(url, {"action": "delete_selected", "_selected_action": [item.id], "post": "yes"}, secure=True)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(Cart.objects.get(id=cart.id).total_price, 0)
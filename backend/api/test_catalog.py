@@ -0,0 +1,84 @@
+import json
+import os
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from .catalog import catalog_cache
+from .checks import check_catalog_cache
+from .metrics import CATALOG_CACHE_REQUESTS
+from .models import Category, Product
+from .testing import assert_max_queries
+
+QUERY = "{ categories { name } products { name category { name } } }"
+# Same data through a different query, so the whole-response cache doesn't answer it
+WARM_QUERY = "{ products { name category { name } } categories { name } }"
+
+SHARED_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"},
+    "catalog": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "catalog"},
+}
+
+class CatalogCacheTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Electronics")
+        for i in range(3):
+            Product.objects.create(name=f"Product {i}", description="", price=10, category=self.category, gender="Male")
+
+    def execute(self, query=QUERY):
+        response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True)
+        return json.loads(response.content)["data"]
+
+    def hits(self, tier):
+        return CATALOG_CACHE_REQUESTS.collect().get((tier, "hit"), 0)
+
+    def test_warm_reads_skip_the_database(self):
+        with assert_max_queries(2):
+            cold = self.execute()
+        hits = self.hits("local")
+        with assert_max_queries(0):
+            warm = self.execute(WARM_QUERY)
+        self.assertEqual(warm, cold)
+        self.assertEqual(len(warm["products"]), 3)
+        self.assertEqual(warm["products"][0]["category"]["name"], "Electronics")
+        self.assertEqual(self.hits("local"), hits + 3)
+
+    def test_writes_invalidate(self):
+        self.execute()
+        Product.objects.create(name="Product 3", description="", price=10, category=self.category, gender="Male")
+        self.assertEqual(len(self.execute()["products"]), 4)
+
+        self.category.name = "Phones"
+        self.category.save()
+        self.assertEqual(self.execute()["categories"], [{"name": "Phones"}])
+
+        Product.objects.filter(name="Product 3").delete()
+        self.assertEqual(len(self.execute()["products"]), 3)
+
+    @override_settings(CACHES=SHARED_CACHE, CATALOG_CACHE_ALIAS="catalog")
+    def test_shared_tier(self):
+        catalog_cache.invalidate()
+        catalog_cache.products()
+        hits = self.hits("shared")
+        # Another worker's empty local tier falls back to the shared tier
+        catalog_cache._entries.clear()
+        with assert_max_queries(0):
+            self.assertEqual(len(catalog_cache.products()), 3)
+        self.assertEqual(self.hits("shared"), hits + 1)
+
+        # A version bump made through the shared cache, e.g. by another worker,
+        # invalidates this worker's local tier too
+        Product.objects.filter(name="Product 0").update(price=20)
+        caches["catalog"].incr("catalog:version")
+        self.assertEqual(catalog_cache.products()[0].price, 20)
+
+    @override_settings(CATALOG_CACHE_ALIAS=None)
+    def test_several_workers_need_a_shared_cache(self):
+        self.assertEqual(check_catalog_cache(None), [])
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "4"}):
+            self.assertEqual([error.id for error in check_catalog_cache(None)], ["api.E001"])
+            with override_settings(CACHES=SHARED_CACHE, CATALOG_CACHE_ALIAS="catalog"):
+                self.assertEqual([error.id for error in check_catalog_cache(None)], ["api.E001"])
+            shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://redis:6379/0"}}
+            with override_settings(CACHES=shared, CATALOG_CACHE_ALIAS="default"):
+                self.assertEqual(check_catalog_cache(None), [])
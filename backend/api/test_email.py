@@ -0,0 +1,80 @@
+import json
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from .models import Category, Product, Profile, Cart, CartItem, EmailOutbox
+from .utils.email import CLAIM_TIMEOUT, MAX_ATTEMPTS, deliver_outbox, queue_email
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP server unavailable")
+
+class WorkerDied(BaseException):
+    pass
+
+class DyingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        # The claim was recorded before sending
+        assert EmailOutbox.objects.get().attempts == 1
+        raise WorkerDied
+
+class EmailOutboxTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        Profile.objects.create(user=self.user, username="testuser", email="testuser@example.com", address="123 Test Street",
+                               first_name="Test", last_name="User", phone_number="1234567890")
+        category = Category.objects.create(name="Electronics")
+        product = Product.objects.create(name="Smartphone", description="", price=10, category=category, gender="Male")
+        CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=product, quantity=1)
+
+    def execute(self, query):
+        response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True)
+        return json.loads(response.content)["data"]
+
+    def test_checkout_queues_one_confirmation(self):
+        order_id = self.execute("mutation { placeOrder(userId: %d) { id } }" % self.user.id)["placeOrder"]["id"]
+        self.assertEqual(self.execute("mutation { notifyOrder(orderId: %d) }" % order_id)["notifyOrder"], "Email queued successfully")
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.key, f"order-confirmation:{order_id}")
+        self.assertEqual(email.recipient, "testuser@example.com")
+
+        self.assertEqual(deliver_outbox(), (1, 0))
+        self.assertEqual(mail.outbox[0].subject, f"Order #{order_id} Confirmation")
+        self.assertEqual(EmailOutbox.objects.get().status, "Sent")
+        self.assertEqual(deliver_outbox(), (0, 0))
+
+    def test_batches_are_drained(self):
+        for i in range(5):
+            queue_email("Subject", "Body", f"user{i}@example.com")
+        self.assertEqual(deliver_outbox(batch_size=3), (3, 0))
+        self.assertEqual(deliver_outbox(batch_size=3), (2, 0))
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_BACKEND="api.test_email.FailingBackend")
+    def test_failures_are_retried_then_dead_lettered(self):
+        queue_email("Subject", "Body", "user@example.com")
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.assertEqual(deliver_outbox(), (0, 1))
+            email = EmailOutbox.objects.get()
+            self.assertEqual(email.attempts, attempt)
+            self.assertEqual(deliver_outbox(), (0, 0))
+            EmailOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.status, "Failed")
+        self.assertIn("SMTP server unavailable", email.last_error)
+
+    def test_claimed_emails_are_resent_once_the_claim_expires(self):
+        queue_email("Subject", "Body", "user@example.com")
+        with override_settings(EMAIL_BACKEND="api.test_email.DyingBackend"), self.assertRaises(WorkerDied):
+            deliver_outbox()
+        self.assertEqual(deliver_outbox(), (0, 0))
+        EmailOutbox.objects.update(next_attempt_at=timezone.now() - CLAIM_TIMEOUT)
+        self.assertEqual(deliver_outbox(), (1, 0))
+        self.assertEqual(EmailOutbox.objects.get().attempts, 2)
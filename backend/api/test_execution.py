@@ -0,0 +1,46 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, TestCase
+from .execution import complete
+from .models import Category, Product
+from .schema import schema
+from .views import AsyncGraphQLView
+
+QUERY = "{ products { name category { name } } }"
+
+class ExecutionTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Shoes")
+        for i in range(3):
+            Product.objects.create(name=f"Product {i}", description="", price=10, category=category, gender="Male")
+
+    def test_wsgi_view_runs_the_resolvers_in_place(self):
+        with mock.patch("api.execution.sync_to_async", wraps=sync_to_async) as execution_hop, \
+                mock.patch("api.views.sync_to_async", wraps=sync_to_async) as view_hop:
+            response = self.client.post("/graphql/", data={"query": QUERY}, content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        self.assertEqual(len(result["data"]["products"]), 3)
+        execution_hop.assert_not_called()
+        view_hop.assert_not_called()
+
+    async def test_asgi_view_runs_the_same_resolvers(self):
+        request = AsyncRequestFactory().post("/graphql/", data={"query": QUERY}, content_type="application/json", secure=True)
+        response = await AsyncGraphQLView.as_view(schema=schema)(request)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        self.assertEqual(
+            sorted(product["name"] for product in result["data"]["products"]),
+            ["Product 0", "Product 1", "Product 2"],
+        )
+        self.assertEqual(result["data"]["products"][0]["category"], {"name": "Shoes"})
+
+    def test_resolvers_may_not_suspend_outside_an_event_loop(self):
+        async def resolver():
+            await asyncio.sleep(0)
+
+        with self.assertRaises(RuntimeError):
+            complete(resolver())
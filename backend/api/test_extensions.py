@@ -0,0 +1,108 @@
+import json
+from unittest import mock
+
+import strawberry
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from .extensions import DEBUG_HEADER, CostAnalysis, QueryCostExtension
+from .models import Category, Product
+from .schema import MergedQuery
+from .testing import assert_max_queries
+
+QUERY = "query Catalog { productsConnection { edges { node { name category { name } } } } }"
+
+class QueryStatsExtensionTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Electronics")
+        for i in range(3):
+            Product.objects.create(name=f"Product {i}", description="", price=10, category=category, gender="Male")
+
+    def execute(self, **headers):
+        response = self.client.post("/graphql/", data={"query": QUERY}, content_type="application/json", secure=True, headers=headers)
+        return json.loads(response.content)
+
+    @override_settings(DEBUG=True)
+    def test_stats_are_reported_with_debug_header(self):
+        with self.assertLogs("api.graphql", level="INFO") as logs:
+            result = self.execute(**{DEBUG_HEADER: "1"})
+        stats = result["extensions"]["queryStats"]
+        self.assertEqual(stats["operationName"], "Catalog")
+        self.assertEqual(stats["queries"], 2)
+        self.assertEqual(stats["resolvers"]["MergedQuery.productsConnection"]["queries"], 1)
+        self.assertEqual(stats["resolvers"]["ProductType.category"]["calls"], 3)
+        self.assertEqual(stats["resolvers"]["ProductType.category"]["queries"], 1)
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["operationName"], "Catalog")
+        self.assertEqual(line["queries"], 2)
+
+    def test_stats_are_hidden_without_debug_header(self):
+        self.assertNotIn("queryStats", self.execute()["extensions"])
+
+    def test_debug_header_needs_debug_or_staff(self):
+        self.execute()
+        # Ignored, and answered from the response cache
+        with assert_max_queries(0):
+            self.assertNotIn("queryStats", self.execute(**{DEBUG_HEADER: "1"})["extensions"])
+
+        self.client.force_login(get_user_model().objects.create_user(username="admin", password="x", is_staff=True))
+        self.assertIn("queryStats", self.execute(**{DEBUG_HEADER: "1"})["extensions"])
+
+    @override_settings(DEBUG=True)
+    def test_assert_max_queries(self):
+        # Debug requests bypass the response cache, so both run the query
+        with assert_max_queries(2):
+            self.execute(**{DEBUG_HEADER: "1"})
+        with self.assertRaisesMessage(AssertionError, "2 queries executed, at most 1 expected"):
+            with assert_max_queries(1):
+                self.execute(**{DEBUG_HEADER: "1"})
+
+class QueryCostExtensionTestCase(TestCase):
+    def execute(self, query, variables=None):
+        response = self.client.post("/graphql/", data={"query": query, "variables": variables}, content_type="application/json", secure=True)
+        return json.loads(response.content)
+
+    def test_cost_is_reported(self):
+        result = self.execute(QUERY)
+        # productsConnection + 20 edges * (edge + node + category)
+        self.assertEqual(result["extensions"]["cost"], {"requested": 61, "maximum": 5000, "depth": 5})
+
+        query = "query ($first: Int) { productsConnection(first: $first) { edges { node { name } } } }"
+        self.assertEqual(self.execute(query, {"first": 5})["extensions"]["cost"]["requested"], 11)
+        self.assertEqual(self.execute(query, {"first": 1000})["extensions"]["cost"]["requested"], 201)
+
+    def test_nested_lists_multiply(self):
+        result = self.execute("{ orders(userId: 1) { orderItems { product { category { name } } } } }")
+        # orders + 50 * (orderItems + 10 * (product + category))
+        self.assertEqual(result["extensions"]["cost"]["requested"], 1 + 50 * (1 + 10 * 2))
+
+    def test_expensive_operations_are_rejected_before_running(self):
+        orders = "{ %s }" % " ".join(f"o{i}: orders(userId: {i}) {{ orderItems {{ product {{ category {{ name }} }} }} }}" for i in range(5))
+        with assert_max_queries(0):
+            result = self.execute(orders)
+        self.assertIsNone(result["data"])
+        self.assertEqual(result["errors"][0]["extensions"]["code"], "QUERY_TOO_EXPENSIVE")
+        self.assertEqual(result["errors"][0]["message"], "Query cost 5255 exceeds the maximum of 5000.")
+
+    def test_deep_operations_are_rejected(self):
+        shallow = strawberry.Schema(query=MergedQuery, extensions=[QueryCostExtension(max_depth=3)])
+        query = "{ ...Cart } fragment Cart on MergedQuery { cart(userId: 1) { items { product { name } } } }"
+        result = shallow.execute_sync(query)
+        self.assertEqual(result.errors[0].message, "Query depth 4 exceeds the maximum of 3.")
+
+    def test_fragment_cycles_are_rejected(self):
+        for query in (
+            "{ categories { ...A } } fragment A on CategoryType { id ...A }",
+            "{ categories { ...A } } fragment A on CategoryType { id ...B } fragment B on CategoryType { ...A }",
+        ):
+            result = self.execute(query)
+            self.assertIsNone(result["data"])
+            self.assertIn("within itself", result["errors"][0]["message"])
+
+    def test_fragments_are_analysed_once(self):
+        fragments = " ".join(f"fragment F{i} on CategoryType {{ ...F{i + 1} ...F{i + 1} }}" for i in range(30))
+        query = "{ categories { ...F0 } } %s fragment F30 on CategoryType { id }" % fragments
+        with mock.patch.object(CostAnalysis, "field_cost", autospec=True, side_effect=CostAnalysis.field_cost) as field_cost:
+            self.execute(query)
+        # categories and F30's id
+        self.assertEqual(field_cost.call_count, 2)
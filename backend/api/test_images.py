@@ -0,0 +1,126 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from .models import Profile, ThumbnailJob
+from .utils.images import CLAIM_TIMEOUT, generate_thumbnails
+
+class WorkerDied(BaseException):
+    pass
+
+EDIT_PROFILE = "mutation ($userId: Int!, $image: Upload) { editProfile(userId: $userId, imageFile: $image) { image thumbnails { size } } }"
+PROFILE = "query ($userId: Int!) { profile(userId: $userId) { image thumbnails { size webp jpeg } } }"
+
+def image_bytes(size=(600, 400), image_format="PNG"):
+    content = BytesIO()
+    Image.new("RGB", size, "red").save(content, image_format)
+    return content.getvalue()
+
+class ProfileImageTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(username="avatar", email="avatar@example.com", password="password123")
+        Profile.objects.create(user=self.user, username="avatar", email="avatar@example.com", address="", first_name="", last_name="", phone_number="")
+
+    def upload(self, content, name="avatar.png"):
+        operations = {"query": EDIT_PROFILE, "variables": {"userId": self.user.id, "image": None}}
+        response = self.client.post("/graphql/", data={
+            "operations": json.dumps(operations),
+            "map": json.dumps({"0": ["variables.image"]}),
+            "0": SimpleUploadedFile(name, content),
+        }, secure=True)
+        return json.loads(response.content)
+
+    def test_upload_then_thumbnails(self):
+        result = self.upload(image_bytes())
+        self.assertNotIn("errors", result)
+        self.assertEqual(result["data"]["editProfile"]["thumbnails"], [])
+        name = Profile.objects.get().image.name
+        self.assertTrue(name.startswith("blobs/") and name.endswith(".png"))
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(ThumbnailJob.objects.get().image, name)
+
+        self.assertEqual(generate_thumbnails(), (1, 0))
+        self.assertEqual(ThumbnailJob.objects.get().status, "Done")
+        response = self.client.post("/graphql/", data={"query": PROFILE, "variables": {"userId": self.user.id}}, content_type="application/json", secure=True)
+        thumbnails = json.loads(response.content)["data"]["profile"]["thumbnails"]
+        self.assertEqual([thumbnail["size"] for thumbnail in thumbnails], [64, 256])
+        for thumbnail in thumbnails:
+            for url in (thumbnail["webp"], thumbnail["jpeg"]):
+                with default_storage.open(url.removeprefix("/media/")) as f, Image.open(f) as image:
+                    self.assertEqual(image.size, (thumbnail["size"], thumbnail["size"]))
+
+    def test_invalid_uploads_are_rejected(self):
+        self.assertEqual(self.upload(b"not an image")["errors"][0]["message"], "Not a valid image.")
+        self.assertIn("Unsupported image format", self.upload(image_bytes(image_format="BMP"), "avatar.bmp")["errors"][0]["message"])
+        with override_settings(PROFILE_IMAGE_MAX_SIZE=100):
+            self.assertIn("Image is larger than 100", self.upload(image_bytes())["errors"][0]["message"])
+        self.assertFalse(Profile.objects.get().image)
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_data_url_is_still_accepted(self):
+        image = "data:image/jpeg;base64," + base64.b64encode(image_bytes(image_format="JPEG")).decode()
+        query = "mutation ($userId: Int!, $image: String) { editProfile(userId: $userId, image: $image) { image } }"
+        response = self.client.post("/graphql/", data={"query": query, "variables": {"userId": self.user.id, "image": image}}, content_type="application/json", secure=True)
+        self.assertTrue(json.loads(response.content)["data"]["editProfile"]["image"].endswith(".jpg"))
+
+        out = StringIO()
+        call_command("run_thumbnail_worker", "--once", stdout=out)
+        self.assertIn("Generated the thumbnails of 1 images (0 failures)", out.getvalue())
+        self.assertEqual(sorted(Profile.objects.get().thumbnails), ["256", "64"])
+
+    def test_failed_thumbnails_are_retried(self):
+        self.upload(image_bytes())
+        default_storage.delete(Profile.objects.get().image.name)
+        self.assertEqual(generate_thumbnails(), (0, 1))
+        job = ThumbnailJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ("Pending", 1))
+        self.assertEqual(Profile.objects.get().thumbnails, {})
+
+    def test_images_are_made_outside_the_claiming_transaction(self):
+        self.upload(image_bytes())
+        transactions = len(connection.atomic_blocks)
+
+        def dying(name):
+            # The claim was recorded, and nothing is left open while the image is decoded
+            self.assertEqual(ThumbnailJob.objects.get().attempts, 1)
+            self.assertEqual(len(connection.atomic_blocks), transactions)
+            raise WorkerDied
+
+        with mock.patch("api.utils.images.make_thumbnails", side_effect=dying), self.assertRaises(WorkerDied):
+            generate_thumbnails()
+        self.assertEqual(generate_thumbnails(), (0, 0))
+        ThumbnailJob.objects.update(next_attempt_at=timezone.now() - CLAIM_TIMEOUT)
+        self.assertEqual(generate_thumbnails(), (1, 0))
+        self.assertEqual(ThumbnailJob.objects.get().attempts, 2)
+
+    def test_a_failing_job_keeps_the_others(self):
+        self.upload(image_bytes())
+        other = get_user_model().objects.create_user(username="other", email="other@example.com", password="password123")
+        Profile.objects.create(user=other, username="other", email="other@example.com", address="", first_name="", last_name="", phone_number="")
+        self.user, first = other, ThumbnailJob.objects.get()
+        self.upload(image_bytes(size=(300, 300)))
+
+        with mock.patch("api.utils.images.blobs.retain", side_effect=[DatabaseError("deadlock"), None]):
+            self.assertEqual(generate_thumbnails(), (1, 1))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.last_error), ("Pending", 1, "deadlock"))
+        self.assertEqual(Profile.objects.get(image=first.image).thumbnails, {})
+        self.assertEqual(ThumbnailJob.objects.exclude(id=first.id).get().status, "Done")
+        self.assertNotEqual(Profile.objects.get(user=other).thumbnails, {})
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from .loaders import Loaders
+from .models import Category, Product, Profile, Cart, CartItem, Order, OrderItem
+
+class LoadersTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="testuser", email="testuser@example.com", password="password123")
+        self.profile = Profile.objects.create(
+            user=self.user,
+            username="testuser",
+            email="testuser@example.com",
+            address="123 Test Street",
+            first_name="Test",
+            last_name="User",
+            phone_number="1234567890"
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        self.order = Order.objects.create(user=self.profile, total_price=0, status="Pending")
+
+    def add_products(self, count):
+        for i in range(count):
+            index = Category.objects.count()
+            category = Category.objects.create(name=f"Category {index}")
+            product = Product.objects.create(name=f"Product {index}", description="", price=10, category=category, gender="Male")
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+            OrderItem.objects.create(order=self.order, product=product, quantity=1, price=10)
+
+    def execute(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return result["data"], len(queries)
+
+    def assert_constant_queries(self, query):
+        self.add_products(2)
+        data, small = self.execute(query)
+        self.add_products(20)
+        data, large = self.execute(query)
+        self.assertEqual(small, large)
+        return data, large
+
+    def test_products_category_is_batched(self):
+        data, count = self.assert_constant_queries("{ products { name category { name } } }")
+        self.assertEqual(len(data["products"]), 22)
+        self.assertEqual(count, 2)
+
+    def test_cart_products_are_batched(self):
+        query = "{ cart(userId: %d) { user items { subtotal product { name category { name } } } } }" % self.user.id
+        data, count = self.assert_constant_queries(query)
+        self.assertEqual(len(data["cart"]["items"]), 22)
+        self.assertEqual(data["cart"]["user"], "testuser")
+        self.assertEqual(count, 4)
+
+    def test_order_items_are_batched(self):
+        query = "{ orders(userId: %d) { user orderItems { price product { name category { name } } } } }" % self.user.id
+        data, count = self.assert_constant_queries(query)
+        self.assertEqual(len(data["orders"][0]["orderItems"]), 22)
+        self.assertEqual(count, 4)
+
+    def test_concurrent_loads_share_one_query(self):
+        self.add_products(5)
+        ids = list(Product.objects.values_list("id", flat=True))
+        loaders = Loaders()
+
+        async def load_all():
+            # Sibling resolvers run concurrently and load the same rows twice over
+            loaders.products.enqueue(ids)
+            return await asyncio.gather(*(loaders.products.load(key) for key in ids + ids))
+
+        with CaptureQueriesContext(connection) as queries:
+            products = async_to_sync(load_all)()
+        self.assertEqual([product.id for product in products], ids + ids)
+        self.assertEqual(len(queries), 1)
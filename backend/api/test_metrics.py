@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import threading
+
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from .extensions import OperationLabels
+from .metrics import Counter, Histogram, Registry
+from .models import Category, Product
+
+class RegistryTestCase(TestCase):
+    def test_thread_shards_are_merged(self):
+        registry = Registry()
+        counter = Counter("jobs_total", "Jobs.", ["kind"], registry=registry)
+        histogram = Histogram("job_seconds", "Job time.", buckets=(0.1, 1), registry=registry)
+
+        def work():
+            for _ in range(100):
+                counter.inc(kind="a")
+                histogram.observe(0.5)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(kind='b"\\')
+
+        text = registry.render(directory=None)
+        self.assertIn('jobs_total{kind="a"} 400', text)
+        self.assertIn('jobs_total{kind="b\\"\\\\"} 1', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('job_seconds_bucket{le="1"} 400', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 400', text)
+        self.assertIn("job_seconds_count 400", text)
+        self.assertIn("# TYPE job_seconds histogram", text)
+
+    def test_worker_snapshots_are_aggregated(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        workers = []
+        for _ in range(2):
+            registry = Registry()
+            Counter("jobs_total", "Jobs.", registry=registry).inc(3)
+            workers.append(registry)
+        # Both registries live in this process, so give the first one another pid's file
+        workers[0].flush(directory.name)
+        os.rename(os.path.join(directory.name, f"metrics_{os.getpid()}.json"),
+                  os.path.join(directory.name, "metrics_999999999.json"))
+
+        self.assertIn("jobs_total 6", workers[1].render(directory.name))
+
+class MetricsEndpointTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Electronics")
+        Product.objects.create(name="Phone", description="", price=10, category=category, gender="Male")
+
+    def graphql(self, query):
+        response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True)
+        return json.loads(response.content)
+
+    def test_operations_are_reported(self):
+        self.graphql("query Catalog { products { name category { name } } }")
+        self.graphql("{ categories { name } }")
+        self.graphql('mutation { placeOrder(userId: 0) { id } }')
+
+        with override_settings(METRICS_TOKEN="secret"):
+            text = self.client.get("/metrics", headers={"Authorization": "Bearer secret"}).content.decode()
+        self.assertIn('graphql_operations_total{operation="Catalog",type="query",status="ok"}', text)
+        self.assertIn('graphql_operations_total{operation="categories",type="query",status="ok"}', text)
+        self.assertIn('graphql_operation_db_queries_count{operation="Catalog",type="query"}', text)
+        self.assertIn('graphql_resolver_errors_total{field="MergedMutation.placeOrder"}', text)
+        self.assertIn('http_request_duration_seconds_count{method="POST",route="graphql/",status="200"}', text)
+
+    def test_clients_cannot_grow_the_operation_labels(self):
+        with mock.patch("api.extensions.operation_label_values", OperationLabels(2)):
+            self.graphql("query Invalid { nope }")
+            self.graphql("query First { categories { name } }")
+            self.graphql("query Second { categories { name } }")
+            self.graphql("query Third { categories { name } }")
+            self.graphql("query First { categories { id } }")
+
+        with override_settings(METRICS_TOKEN="secret"):
+            text = self.client.get("/metrics", headers={"Authorization": "Bearer secret"}).content.decode()
+        self.assertNotIn('operation="Invalid"', text)
+        self.assertIn('graphql_operations_total{operation="invalid",type="unknown",status="error"}', text)
+        self.assertIn('graphql_operations_total{operation="First",type="query",status="ok"} 2', text)
+        self.assertIn('graphql_operations_total{operation="Second",type="query",status="ok"}', text)
+        self.assertNotIn('operation="Third"', text)
+        self.assertIn('graphql_operations_total{operation="other",type="query",status="ok"}', text)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_are_refused_without_a_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
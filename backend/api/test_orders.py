@@ -0,0 +1,194 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from .inventory import reserve_stock
+from .models import Category, Product, ProductStock, Profile, Cart, CartItem, Order, OrderItem
+
+PLACE_ORDER = """
+mutation ($userId: Int!) {
+  placeOrder(userId: $userId) {
+    id user totalPrice status
+    orderItems { quantity price product { name category { name } } }
+  }
+}
+"""
+
+class PlaceOrderTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Electronics")
+        self.products = [
+            Product.objects.create(name=f"Product {i}", description="", price=Decimal("10.10") + i, category=self.category, gender="Male")
+            for i in range(200)
+        ]
+
+    def create_customer(self, username):
+        user = get_user_model().objects.create_user(username=username, email=f"{username}@example.com", password="password123")
+        Profile.objects.create(user=user, username=username, email=f"{username}@example.com", address="123 Test Street",
+                               first_name="Test", last_name="User", phone_number="1234567890")
+        return user
+
+    def fill_cart(self, user, lines):
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in self.products[:lines]])
+        return cart
+
+    def place_order(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/graphql/", data={"query": PLACE_ORDER, "variables": {"userId": user.id}}, content_type="application/json", secure=True)
+        return json.loads(response.content), len(queries)
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        counts = {}
+        for lines in (1, 10, 200):
+            user = self.create_customer(f"customer{lines}")
+            cart = self.fill_cart(user, lines)
+            result, counts[lines] = self.place_order(user)
+            self.assertNotIn("errors", result)
+
+            order = result["data"]["placeOrder"]
+            expected_total = sum(product.price * 2 for product in self.products[:lines])
+            self.assertEqual(Decimal(str(order["totalPrice"])), expected_total)
+            self.assertEqual(len(order["orderItems"]), lines)
+            self.assertEqual(order["orderItems"][0]["product"]["category"]["name"], "Electronics")
+            self.assertEqual(OrderItem.objects.filter(order_id=order["id"]).count(), lines)
+            self.assertFalse(cart.items.exists())
+        self.assertEqual(counts[1], counts[10])
+        self.assertEqual(counts[10], counts[200])
+
+    def test_empty_cart_creates_nothing(self):
+        user = self.create_customer("empty")
+        Cart.objects.create(user=user)
+        result, _ = self.place_order(user)
+        self.assertEqual(result["errors"][0]["message"], "Cart is empty. Add products before placing an order.")
+        self.assertFalse(Order.objects.exists())
+
+    def test_stock_is_reserved(self):
+        hot, cold = self.products[:2]
+        ProductStock.objects.create(product=hot, quantity=3)
+        user = self.create_customer("stock")
+        self.fill_cart(user, 2)
+
+        result, _ = self.place_order(user)
+        self.assertNotIn("errors", result)
+        self.assertEqual(ProductStock.objects.get(product=hot).quantity, 1)
+        self.assertFalse(ProductStock.objects.filter(product=cold).exists())
+
+    def test_stock_rows_are_locked_in_product_order(self):
+        for product in self.products[:3]:
+            ProductStock.objects.create(product=product, quantity=5)
+        ids = [product.id for product in self.products[:3]]
+        with CaptureQueriesContext(connection) as queries:
+            reserve_stock({ids[2]: 1, ids[0]: 1, ids[1]: 1})
+        # Checkouts sharing products take their locks in the same order
+        self.assertIn('ORDER BY "api_productstock"."product_id" ASC', queries.captured_queries[0]["sql"])
+        self.assertEqual(set(ProductStock.objects.values_list("quantity", flat=True)), {4})
+
+    def test_insufficient_stock_rolls_back(self):
+        hot = self.products[1]
+        ProductStock.objects.create(product=hot, quantity=1)
+        user = self.create_customer("short")
+        cart = self.fill_cart(user, 2)
+
+        result, _ = self.place_order(user)
+        self.assertEqual(result["errors"][0]["message"], "Not enough stock to place this order.")
+        self.assertEqual(ProductStock.objects.get(product=hot).quantity, 1)
+        self.assertEqual(cart.items.count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+    def test_add_to_cart_checks_stock(self):
+        hot = self.products[0]
+        ProductStock.objects.create(product=hot, quantity=3)
+        user = self.create_customer("adder")
+        query = "mutation ($userId: Int!, $productId: Int!) { addProductToCart(userId: $userId, productId: $productId, quantity: 2) { id } }"
+        variables = {"userId": user.id, "productId": hot.id}
+
+        response = self.client.post("/graphql/", data={"query": query, "variables": variables}, content_type="application/json", secure=True)
+        self.assertNotIn("errors", json.loads(response.content))
+        response = self.client.post("/graphql/", data={"query": query, "variables": variables}, content_type="application/json", secure=True)
+        self.assertEqual(json.loads(response.content)["errors"][0]["message"], "Not enough stock for this product.")
+        self.assertEqual(CartItem.objects.get(cart__user=user, product=hot).quantity, 2)
+
+    def test_cart_mutations_return_the_cart(self):
+        user = self.create_customer("shopper")
+        product = self.products[0]
+        variables = {"userId": user.id, "productId": product.id}
+        for mutation, arguments in (
+            ("addProductToCart", "quantity: 2"),
+            ("updateCartProduct", "quantity: 5"),
+            ("deleteProductFromCart", ""),
+        ):
+            query = "mutation ($userId: Int!, $productId: Int!) { %s(userId: $userId, productId: $productId %s) { user items { quantity } } }" % (mutation, arguments)
+            response = self.client.post("/graphql/", data={"query": query, "variables": variables}, content_type="application/json", secure=True)
+            result = json.loads(response.content)
+            self.assertNotIn("errors", result)
+            self.assertEqual(result["data"][mutation]["user"], "shopper")
+        self.assertEqual(result["data"]["deleteProductFromCart"]["items"], [])
+
+
+ORDERS_CONNECTION = """
+query ($userId: Int!, $first: Int, $after: String, $status: OrderStatus, $createdAfter: DateTime) {
+  ordersConnection(userId: $userId, first: $first, after: $after, status: $status, createdAfter: $createdAfter) {
+    edges { cursor node { id user status orderItems { quantity product { name category { name } } } } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+class OrderHistoryTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Electronics")
+        products = [Product.objects.create(name=f"Product {i}", description="", price=Decimal("5.00"), category=category, gender="Male") for i in range(5)]
+        self.user = get_user_model().objects.create_user(username="buyer", email="buyer@example.com", password="password123")
+        profile = Profile.objects.create(user=self.user, username="buyer", email="buyer@example.com", address="", first_name="", last_name="", phone_number="")
+        # Several orders share a timestamp, so paging has to fall back on the id
+        created_at = Order._meta.get_field("created_at")
+        created_at.auto_now_add = False
+        try:
+            self.orders = []
+            for i in range(12):
+                order = Order.objects.create(user=profile, total_price=Decimal("5.00"), status="Shipped" if i % 3 == 0 else "Pending",
+                                             created_at=datetime(2025, 1, 1 + i // 2, 12, 0, 0, 123456, tzinfo=timezone.utc))
+                OrderItem.objects.bulk_create(OrderItem(order=order, product=product, quantity=1, price=product.price) for product in products[:i % 5 + 1])
+                self.orders.append(order)
+        finally:
+            created_at.auto_now_add = True
+
+    def execute(self, **variables):
+        response = self.client.post("/graphql/", data={"query": ORDERS_CONNECTION, "variables": {"userId": self.user.id, **variables}},
+                                    content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return result["data"]["ordersConnection"]
+
+    def test_pages_cover_every_order_once_newest_first(self):
+        seen, after = [], None
+        while True:
+            page = self.execute(first=5, after=after)
+            seen += [int(edge["node"]["id"]) for edge in page["edges"]]
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+        expected = sorted(self.orders, key=lambda order: (order.created_at, order.id), reverse=True)
+        self.assertEqual(seen, [order.id for order in expected])
+
+    def test_filters(self):
+        page = self.execute(status="SHIPPED")
+        self.assertEqual({edge["node"]["status"] for edge in page["edges"]}, {"Shipped"})
+        self.assertEqual(len(page["edges"]), 4)
+
+        page = self.execute(createdAfter="2025-01-05T00:00:00+00:00")
+        self.assertEqual(sorted(int(edge["node"]["id"]) for edge in page["edges"]), [order.id for order in self.orders[8:]])
+
+    def test_page_size_does_not_change_query_count(self):
+        for first in (1, 12):
+            with CaptureQueriesContext(connection) as queries:
+                page = self.execute(first=first)
+            self.assertEqual(len(page["edges"]), first)
+            self.assertEqual(page["edges"][0]["node"]["user"], "buyer")
+            self.assertEqual(page["edges"][0]["node"]["orderItems"][0]["product"]["category"]["name"], "Electronics")
+            self.assertEqual(len(queries), 2)
@@ -0,0 +1,76 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from .models import Category, Product
+
+QUERY = """
+query ($first: Int, $after: String, $categoryId: Int, $gender: String, $minPrice: Float, $maxPrice: Float, $orderBy: ProductOrder) {
+  productsConnection(first: $first, after: $after, categoryId: $categoryId, gender: $gender,
+                     minPrice: $minPrice, maxPrice: $maxPrice, orderBy: $orderBy) {
+    edges { cursor node { id name price gender category { id } } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+class ProductsConnectionTestCase(TestCase):
+    def setUp(self):
+        self.shirts = Category.objects.create(name="Shirts")
+        self.shoes = Category.objects.create(name="Shoes")
+        for i in range(25):
+            Product.objects.create(
+                name=f"Product {i:02d}",
+                description="",
+                price=10 + i % 5,
+                category=self.shirts if i % 2 else self.shoes,
+                gender="Male" if i % 3 else "Female",
+            )
+
+    def execute(self, **variables):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/graphql/", data={"query": QUERY, "variables": variables}, content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return result["data"]["productsConnection"], len(queries)
+
+    def collect(self, **variables):
+        nodes, after, counts = [], None, set()
+        while True:
+            page, count = self.execute(after=after, **variables)
+            counts.add(count)
+            nodes += [edge["node"] for edge in page["edges"]]
+            if not page["pageInfo"]["hasNextPage"]:
+                return nodes, counts
+            after = page["pageInfo"]["endCursor"]
+
+    def test_pages_cover_every_product_once(self):
+        nodes, counts = self.collect(first=4)
+        self.assertEqual([node["id"] for node in nodes], sorted(Product.objects.values_list("id", flat=True)))
+        self.assertEqual(counts, {2})
+
+    def test_price_ordering_with_ties(self):
+        nodes, _ = self.collect(first=3, orderBy="PRICE_DESC")
+        expected = list(Product.objects.order_by("-price", "-id").values_list("id", flat=True))
+        self.assertEqual([node["id"] for node in nodes], expected)
+
+        nodes, _ = self.collect(first=3, orderBy="PRICE_ASC")
+        expected = list(Product.objects.order_by("price", "id").values_list("id", flat=True))
+        self.assertEqual([node["id"] for node in nodes], expected)
+
+    def test_seek_is_a_row_comparison(self):
+        page, _ = self.execute(first=3, orderBy="PRICE_DESC")
+        with CaptureQueriesContext(connection) as queries:
+            self.execute(first=3, orderBy="PRICE_DESC", after=page["pageInfo"]["endCursor"])
+        # A lower bound the index scan can start from, rather than an OR
+        self.assertIn('("api_product"."price", "api_product"."id") < (', queries.captured_queries[0]["sql"])
+
+    def test_filters(self):
+        nodes, _ = self.collect(first=5, categoryId=self.shirts.id, gender="Male", minPrice=11, maxPrice=13, orderBy="NAME")
+        expected = Product.objects.filter(category=self.shirts, gender="Male", price__gte=11, price__lte=13).order_by("name", "id")
+        self.assertEqual([node["id"] for node in nodes], list(expected.values_list("id", flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.post("/graphql/", data={"query": QUERY, "variables": {"after": "not-a-cursor"}}, content_type="application/json", secure=True)
+        self.assertEqual(json.loads(response.content)["errors"][0]["message"], "Invalid cursor.")
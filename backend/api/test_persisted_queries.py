@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from .models import Category
+from .persisted_queries import load_allowlist, query_hash
+from .schema import schema
+
+QUERY = "{ categories { name } }"
+
+def persisted(sha256):
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+
+class PersistedQueriesTestCase(TestCase):
+    def setUp(self):
+        Category.objects.create(name="Electronics")
+
+    def post(self, data):
+        response = self.client.post("/graphql/", data=data, content_type="application/json", secure=True)
+        return response.status_code, json.loads(response.content)
+
+    def test_automatic_persisted_queries(self):
+        sha256 = query_hash(QUERY)
+        status, result = self.post({"extensions": persisted(sha256)})
+        self.assertEqual(result["errors"][0]["message"], "PersistedQueryNotFound")
+        self.assertEqual(result["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND")
+
+        status, result = self.post({"query": QUERY, "extensions": persisted(sha256)})
+        self.assertEqual(result["data"], {"categories": [{"name": "Electronics"}]})
+
+        status, result = self.post({"extensions": persisted(sha256)})
+        self.assertEqual(result["data"], {"categories": [{"name": "Electronics"}]})
+
+        response = self.client.get("/graphql/", {"extensions": json.dumps(persisted(sha256))}, secure=True)
+        self.assertEqual(json.loads(response.content)["data"], {"categories": [{"name": "Electronics"}]})
+
+    def test_hash_must_match_query(self):
+        status, result = self.post({"query": QUERY, "extensions": persisted("0" * 64)})
+        self.assertEqual(status, 400)
+        self.assertEqual(result["errors"][0]["extensions"]["code"], "BAD_REQUEST")
+
+    def test_allowlist(self):
+        handle, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(handle, "w") as f:
+            json.dump({"operations": [{"id": query_hash(QUERY), "name": "Categories", "type": "query", "body": QUERY}]}, f)
+        self.addCleanup(os.remove, path)
+        self.addCleanup(load_allowlist.cache_clear)
+
+        with override_settings(GRAPHQL_ALLOWLIST=path):
+            status, result = self.post({"extensions": persisted(query_hash(QUERY))})
+            self.assertEqual(result["data"], {"categories": [{"name": "Electronics"}]})
+            status, result = self.post({"query": QUERY})
+            self.assertEqual(result["data"], {"categories": [{"name": "Electronics"}]})
+
+            other = "{ products { name } }"
+            status, result = self.post({"query": other})
+            self.assertEqual(status, 400)
+            self.assertEqual(result["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_ALLOWED")
+            status, result = self.post({"query": other, "extensions": persisted(query_hash(other))})
+            self.assertEqual(status, 400)
+
+class DocumentCacheTestCase(TestCase):
+    def test_hot_operations_skip_parsing_and_validation(self):
+        query = "query Hot { categories { name } }"
+        self.assertIsNone(async_to_sync(schema.execute)(query).errors)
+        with mock.patch("strawberry.schema.schema.parse") as parse, \
+                mock.patch("strawberry.schema.schema.validate_document") as validate:
+            result = async_to_sync(schema.execute)(query)
+        self.assertIsNone(result.errors)
+        parse.assert_not_called()
+        validate.assert_not_called()
+
+    def test_invalid_documents_are_not_cached(self):
+        query = "{ products { missingField } }"
+        for _ in range(2):
+            self.assertEqual(len(async_to_sync(schema.execute)(query).errors), 1)
@@ -0,0 +1,89 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from graphql import parse
+from . import response_cache
+from .models import Category, Product
+from .testing import assert_max_queries
+
+CATALOG = "query Catalog { products { name price } }"
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Electronics")
+        Product.objects.create(name="Phone", description="", price=10, category=self.category, gender="Male")
+
+    def post(self, query, variables=None, **headers):
+        return self.client.post("/graphql/", data={"query": query, "variables": variables}, content_type="application/json", secure=True, headers=headers)
+
+    def test_public_queries_get_an_etag_and_304(self):
+        first = self.post(CATALOG)
+        etag = first["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("public", first["Cache-Control"])
+
+        # Whitespace and comments don't change the cache key
+        with assert_max_queries(0):
+            second = self.post("# storefront\nquery Catalog {\n  products { name\n price } }")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], etag)
+
+        not_modified = self.post(CATALOG, **{"If-None-Match": etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+
+    def test_get_queries(self):
+        response = self.client.get("/graphql/", {"query": CATALOG}, secure=True, headers={"Accept": "application/json"})
+        self.assertEqual(json.loads(response.content)["data"]["products"], [{"name": "Phone", "price": 10.0}])
+        revalidated = self.client.get("/graphql/", {"query": CATALOG}, secure=True, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_catalog_edits_change_the_etag(self):
+        etag = self.post(CATALOG)["ETag"]
+        Product.objects.create(name="Tablet", description="", price=20, category=self.category, gender="Male")
+        response = self.post(CATALOG, **{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)["data"]["products"]), 2)
+
+    def test_private_fields_are_never_cached(self):
+        for query in [
+            "{ products { name } cart(userId: 1) { id } }",
+            "{ orders(userId: 1) { id } }",
+            "query { ...Private } fragment Private on MergedQuery { profile(userId: 1) { id } }",
+            "mutation { createCart(userId: 1) { id } }",
+        ]:
+            response = self.post(query)
+            self.assertFalse(response.has_header("ETag"), query)
+
+        response = self.client.get("/graphql/", {"query": "{ cart(userId: 1) { id } }"}, secure=True, headers={"Accept": "application/json"})
+        self.assertIn("no-store", response["Cache-Control"])
+
+    def test_errors_are_not_cached(self):
+        response = self.post("query ($first: Int) { productsConnection(first: $first, after: \"bad\") { edges { cursor } } }")
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_queries_are_parsed_once(self):
+        query = "query Page ($first: Int) { productsConnection(first: $first) { edges { node { name } } } }"
+        with mock.patch("api.response_cache.parse", wraps=parse) as classify, \
+                mock.patch("strawberry.schema.schema.parse", wraps=parse) as execute:
+            for first in (1, 2, 3):
+                self.assertNotIn("errors", json.loads(self.post(query, {"first": first}).content))
+        # Parsed to tell it is public, and the execution reused that document
+        self.assertEqual(classify.call_count, 1)
+        self.assertEqual(execute.call_count, 0)
+        self.assertTrue(response_cache.classifications.get((query, None)))
+
+    def test_documents_that_cannot_be_classified_are_not_cached(self):
+        cycle = "{ ...A } fragment A on MergedQuery { categories { id } ...B } fragment B on MergedQuery { ...A }"
+        response = self.post(cycle)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("within itself", json.loads(response.content)["errors"][0]["message"])
+        self.assertFalse(response.has_header("ETag"))
+        deep = "{ %s categories { id } %s }" % ("... on MergedQuery { " * 2000, "}" * 2000)
+        self.assertFalse(self.post(deep).has_header("ETag"))
+
+    def test_fragments_are_followed_once(self):
+        fragments = " ".join(f"fragment F{i} on MergedQuery {{ ...F{i + 1} ...F{i + 1} }}" for i in range(40))
+        document = parse("{ ...F0 } %s fragment F40 on MergedQuery { categories { id } }" % fragments)
+        self.assertTrue(response_cache.is_public(document, None))
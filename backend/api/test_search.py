@@ -0,0 +1,66 @@
+import json
+
+from django.test import TestCase
+from .models import Category, Product
+from .search import search_index
+
+QUERY = """
+query ($query: String!, $first: Int, $after: String) {
+  searchProducts(query: $query, first: $first, after: $after) {
+    edges { cursor rank highlight node { id name } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+class SearchProductsTestCase(TestCase):
+    def setUp(self):
+        search_index.reset()
+        self.shirts = Category.objects.create(name="Shirt")
+        self.shoes = Category.objects.create(name="Shoes")
+        self.oxford = Product.objects.create(name="Oxford Shirt", description="Cotton shirt with a button-up front.", price=10, category=self.shirts, gender="Male")
+        self.linen = Product.objects.create(name="Linen Blouse", description="Relaxed fit in cotton and linen.", price=20, category=self.shirts, gender="Female")
+        self.sneaker = Product.objects.create(name="Runner Sneaker", description="Lightweight running shoe.", price=30, category=self.shoes, gender="Male")
+
+    def search(self, query, **variables):
+        response = self.client.post("/graphql/", data={"query": QUERY, "variables": {"query": query, **variables}}, content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return result["data"]["searchProducts"]
+
+    def names(self, query, **variables):
+        return [edge["node"]["name"] for edge in self.search(query, **variables)["edges"]]
+
+    def test_ranks_name_matches_first(self):
+        result = self.search("shirt")
+        self.assertEqual([edge["node"]["name"] for edge in result["edges"]], ["Oxford Shirt", "Linen Blouse"])
+        self.assertGreater(result["edges"][0]["rank"], result["edges"][1]["rank"])
+        self.assertIn("<b>Shirt</b>", result["edges"][0]["highlight"])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.names("cotton linen"), ["Linen Blouse"])
+        self.assertEqual(self.names("cotton sneaker"), [])
+        self.assertEqual(self.names("   "), [])
+
+    def test_pagination(self):
+        first = self.search("cotton", first=1)
+        self.assertTrue(first["pageInfo"]["hasNextPage"])
+        second = self.search("cotton", first=1, after=first["pageInfo"]["endCursor"])
+        self.assertFalse(second["pageInfo"]["hasNextPage"])
+        names = {first["edges"][0]["node"]["name"], second["edges"][0]["node"]["name"]}
+        self.assertEqual(names, {"Oxford Shirt", "Linen Blouse"})
+
+    def test_index_updates_incrementally(self):
+        self.assertEqual(self.names("sneaker"), ["Runner Sneaker"])
+
+        self.sneaker.name = "Trail Runner"
+        self.sneaker.save()
+        self.assertEqual(self.names("sneaker"), [])
+        self.assertEqual(self.names("trail"), ["Trail Runner"])
+
+        self.shoes.name = "Footwear"
+        self.shoes.save()
+        self.assertEqual(self.names("footwear"), ["Trail Runner"])
+
+        self.sneaker.delete()
+        self.assertEqual(self.names("trail"), [])
@@ -0,0 +1,107 @@
+import csv
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from .importer import read_header, read_records, shard_boundaries
+from .models import Category, ImportCheckpoint, Product
+
+FIELDS = ['ID', 'Product Name', 'Link', 'Product Image', 'Price', 'Details', 'Categories', 'Gender']
+
+def csv_row(id, name, price, category="Shirt"):
+    images = f"[{{'https://example.com/{id}_1.jpg': 'Image 0'}}, {{'https://example.com/{id}_2.jpg': 'Image 1'}}]"
+    return [id, name, "", images, price, f"Details of {name}", category, "Men"]
+
+class SeedCommandTestCase(TestCase):
+    def write_csv(self, rows):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def seed(self, path, *args):
+        out = StringIO()
+        call_command("seed", "--file", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_upserts_by_name(self):
+        Category.objects.create(name="Shirt")
+        path = self.write_csv([
+            csv_row(1, "OXFORD SHIRT", "₹2,590.00"),
+            csv_row(2, "LINEN SHIRT", "₹1,990.00"),
+            csv_row(3, "SNEAKER", "₹4,990.00", category="Shoes"),
+            csv_row(4, "OXFORD SHIRT", "₹2,790.00"),
+        ])
+        self.seed(path, "--chunk-size", "2")
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Product.objects.get(name="OXFORD SHIRT").price, Decimal("2790.00"))
+        self.assertEqual(Product.objects.get(name="SNEAKER").category.name, "Shoes")
+        self.assertEqual(Product.objects.get(name="SNEAKER").image2, "https://example.com/3_2.jpg")
+
+        self.seed(self.write_csv([csv_row(1, "SNEAKER", "₹3,990.00")]))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(name="SNEAKER").price, Decimal("3990.00"))
+
+    def test_add_product_refuses_duplicate_names(self):
+        category = Category.objects.create(name="Shirt")
+        Product.objects.create(name="SHIRT", description="", price=1, category=category, gender="Men")
+        query = f'mutation {{ addProduct(name: "SHIRT", description: "", price: 2, categoryId: {category.id}, image1: null, image2: null, gender: "Men") {{ id }} }}'
+        response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True)
+        self.assertEqual(json.loads(response.content)["errors"][0]["message"], "A product with this name already exists.")
+
+    def test_invalid_rows_are_skipped(self):
+        path = self.write_csv([csv_row(1, "OXFORD SHIRT", "free"), csv_row(2, "LINEN SHIRT", "₹1,990.00")])
+        output = self.seed(path)
+        self.assertIn("1 skipped", output)
+        self.assertEqual(list(Product.objects.values_list("name", flat=True)), ["LINEN SHIRT"])
+
+    def test_dry_run_writes_nothing(self):
+        output = self.seed(self.write_csv([csv_row(1, "OXFORD SHIRT", "₹2,590.00")]), "--dry-run")
+        self.assertIn("1 rows validated", output)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Category.objects.exists())
+
+    def test_parallel_import(self):
+        rows = [csv_row(i, f"PRODUCT {i}", f"₹{i},000.00") for i in range(1, 31)]
+        rows[4][5] = 'Multi-line\ndetails with "quotes", commas\nand more'
+        path = self.write_csv(rows)
+        output = self.seed(path, "--workers", "3", "--chunk-size", "4")
+        self.assertIn("Worker 2:", output)
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(Product.objects.get(name="PRODUCT 5").description, rows[4][5])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_blank_lines_and_short_rows(self):
+        path = self.write_csv([csv_row(1, "OXFORD SHIRT", "₹2,590.00"), [], ["2", "SHORT ROW"], csv_row(3, "LINEN SHIRT", "₹1,990.00")])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n\n")
+        for args in ((), ("--workers", "2")):
+            output = self.seed(path, "--dry-run", *args)
+            self.assertIn("3 rows validated, 1 skipped", output)
+
+    def test_parallel_import_resumes_from_checkpoints(self):
+        path = os.path.abspath(self.write_csv([csv_row(i, f"PRODUCT {i}", "₹1,000.00") for i in range(1, 31)]))
+        _, data_start = read_header(path)
+        stat = os.stat(path)
+        shards = shard_boundaries(path, data_start, 2)
+        # The first shard was committed before the previous run crashed
+        ImportCheckpoint.objects.bulk_create([
+            ImportCheckpoint(source=path, fingerprint=f"{stat.st_size}:{stat.st_mtime_ns}", shard=shard,
+                             start=start, end=end, offset=end if shard == 0 else start)
+            for shard, (start, end) in enumerate(shards)
+        ])
+        with open(path, "rb") as f:
+            remaining = sum(1 for _ in read_records(f, *shards[1]))
+        output = self.seed(path, "--workers", "2")
+        self.assertIn("Resuming import", output)
+        self.assertEqual(Product.objects.count(), remaining)
+        self.assertFalse(Product.objects.filter(name="PRODUCT 1").exists())
+        self.assertTrue(Product.objects.filter(name="PRODUCT 30").exists())
@@ -0,0 +1,121 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+from . import blobs, variants
+from .models import Blob, Category, Product, ProductImageVariant, ThumbnailJob
+from .testing import assert_max_queries
+from .utils.images import generate_thumbnails
+
+IMAGES = "{ productsConnection(first: 10) { edges { node { name images { src srcset variants { width height format } } } } } }"
+
+def stored_image(width, height):
+    content = BytesIO()
+    Image.new("RGB", (width, height), "green").save(content, "JPEG")
+    return blobs.blob_storage.url(blobs.store(ContentFile(content.getvalue()), ".jpg"))
+
+class MediaRootMixin:
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WIDTHS=(160, 320, 640, 1024))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+        self.category = Category.objects.create(name="Shirt")
+
+    def create_product(self, name, image1, image2=None):
+        return Product.objects.create(name=name, description="", price=1, category=self.category, gender="Men", image1=image1, image2=image2)
+
+class ImageVariantsTestCase(MediaRootMixin, TestCase):
+    def query(self):
+        response = self.client.post("/graphql/", data={"query": IMAGES}, content_type="application/json", secure=True)
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return {edge["node"]["name"]: edge["node"]["images"] for edge in result["data"]["productsConnection"]["edges"]}
+
+    def test_command_renders_every_width_and_format(self):
+        large = self.create_product("LARGE", stored_image(800, 600), "https://example.com/remote.jpg")
+        small = self.create_product("SMALL", stored_image(100, 50))
+        out = StringIO()
+        call_command("generate_image_variants", "--workers", "2", stdout=out)
+        self.assertIn("Rendered the variants of 2 images (0 failures)", out.getvalue())
+
+        source = blobs.blob_name(large.image1)
+        self.assertEqual(
+            sorted(ProductImageVariant.objects.filter(source=source).values_list("format", "width", "height")),
+            [(f, w, h) for f in ("jpeg", "webp") for w, h in ((160, 120), (320, 240), (640, 480), (800, 600))],
+        )
+        for variant in ProductImageVariant.objects.filter(source=source):
+            with blobs.blob_storage.open(variant.name) as f, Image.open(f) as image:
+                self.assertEqual((image.width, image.format.lower()), (variant.width, variant.format))
+        self.assertEqual(ProductImageVariant.objects.filter(source=blobs.blob_name(small.image1)).count(), 2)
+
+        with assert_max_queries(3):
+            images = self.query()
+        self.assertEqual(images["LARGE"][0]["src"], large.image1)
+        self.assertEqual(images["LARGE"][0]["srcset"].count("w, "), 3)
+        self.assertTrue(images["LARGE"][0]["srcset"].endswith(".webp 800w"))
+        self.assertEqual(images["LARGE"][1], {"src": "https://example.com/remote.jpg", "srcset": "", "variants": []})
+        self.assertEqual(images["SMALL"][0]["variants"], [
+            {"width": 100, "height": 50, "format": "jpeg"}, {"width": 100, "height": 50, "format": "webp"},
+        ])
+
+        call_command("generate_image_variants", stdout=out)
+        self.assertIn("Rendered the variants of 0 images", out.getvalue())
+
+    def test_missing_variants_are_queued_for_the_worker(self):
+        product = self.create_product("SHIRT", stored_image(400, 400))
+        source = blobs.blob_name(product.image1)
+        with mock.patch("api.variants.render_variants") as render:
+            self.assertEqual(self.query()["SHIRT"][0], {"src": product.image1, "srcset": "", "variants": []})
+            self.query()
+        render.assert_not_called()
+        job = ThumbnailJob.objects.get()
+        self.assertEqual((job.image, job.kind, job.status), (source, "variants", "Pending"))
+
+        self.assertEqual(generate_thumbnails(), (1, 0))
+        self.assertEqual(ProductImageVariant.objects.filter(source=source).count(), 6)
+        # Cached responses show them once they expire
+        cache.clear()
+        self.assertEqual(len(self.query()["SHIRT"][0]["srcset"].split(", ")), 3)
+
+    def test_variants_are_rendered_outside_the_claiming_transaction(self):
+        broken = self.create_product("BROKEN", stored_image(400, 400))
+        product = self.create_product("SHIRT", stored_image(200, 100))
+        variants.queue_missing([blobs.blob_name(broken.image1), blobs.blob_name(product.image1)])
+        transactions = len(connection.atomic_blocks)
+        render = variants.render_variants
+
+        def checked_render(path, widths):
+            # Claimed, and rendered with no transaction or row lock held
+            self.assertEqual(len(connection.atomic_blocks), transactions)
+            if path == blobs.blob_storage.path(blobs.blob_name(broken.image1)):
+                raise OSError("truncated image")
+            return render(path, widths)
+
+        with mock.patch("api.variants.render_variants", side_effect=checked_render):
+            self.assertEqual(generate_thumbnails(), (1, 1))
+        self.assertEqual(dict(ThumbnailJob.objects.values_list("image", "attempts")), {
+            blobs.blob_name(broken.image1): 1, blobs.blob_name(product.image1): 1,
+        })
+        self.assertEqual(ThumbnailJob.objects.get(image=blobs.blob_name(broken.image1)).last_error, "truncated image")
+        # 160px and its own 200px, in both formats
+        self.assertEqual(ProductImageVariant.objects.filter(source=blobs.blob_name(product.image1)).count(), 4)
+
+    def test_variants_rendered_again_are_retained_once(self):
+        source = blobs.blob_name(self.create_product("SHIRT", stored_image(400, 400)).image1)
+        rendered = variants.render_variants(blobs.blob_storage.path(source), (160, 320))
+        variants.store_variants(source, rendered)
+        variants.store_variants(source, rendered)
+        names = ProductImageVariant.objects.filter(source=source).values_list("name", flat=True)
+        self.assertEqual(len(names), 4)
+        self.assertEqual(set(Blob.objects.filter(name__in=names).values_list("references", flat=True)), {1})
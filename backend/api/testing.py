@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(max_queries, using="default"):
+    """
+    Fail if the block runs more than `max_queries` SQL queries.
+
+    Use it around GraphQL requests in tests so N+1 regressions fail CI:
+
+        with assert_max_queries(3):
+            self.client.post("/graphql/", ...)
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        queries = "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1))
+        raise AssertionError(f"{executed} queries executed, at most {max_queries} expected:\n{queries}")
@@ -1,9 +1,11 @@
+import re
+
 from django.contrib import admin
-from django.urls import path
-from strawberry.django.views import GraphQLView
+from django.urls import path, re_path
+from .blobs import BLOB_PATH
 from .schema import schema
+from .views import AsyncGraphQLView, GraphQLView, blob_view, metrics_view
 from chowkidar.view import auth_enabled_view
-from strawberry.django.views import GraphQLView
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -13,8 +15,12 @@ admin.site.index_title = "Welcome to ShopifyFR"
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # chowkidar only wraps sync views
     path("auth/", auth_enabled_view(GraphQLView.as_view(schema=schema))),
-    path("graphql/", GraphQLView.as_view(schema=schema)),
+    path("graphql/", (AsyncGraphQLView if settings.ASGI else GraphQLView).as_view(schema=schema, multipart_uploads_enabled=True)),
+    path("metrics", metrics_view),
+    # Served in production too, with immutable cache headers (see api.blobs)
+    re_path(rf"^{re.escape(settings.MEDIA_URL.strip('/'))}/blobs/(?P<name>{BLOB_PATH})$", blob_view),
 ]
 
 if settings.DEBUG:  # Serve media files only in development
@@ -1,4 +1,19 @@
-from django.core.mail import send_mail
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import transaction
+from django.utils import timezone
+
+from api.metrics import EMAIL_SEND_DURATION
+from api.models import EmailOutbox
+
+# Failed deliveries are retried with exponential backoff (30s, 1m, 2m, 4m, ...)
+# and dead-lettered as "Failed" after MAX_ATTEMPTS.
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+# How long a worker has to send the emails it claimed before another may
+CLAIM_TIMEOUT = timedelta(minutes=10)
 
 def send_notification_email(subject, message, recipient_email):
     send_mail(
@@ -8,3 +23,97 @@ def send_notification_email(subject, message, recipient_email):
         [recipient_email],
         fail_silently=False,
     )
+
+def queue_email(subject, message, recipient_email, key=None):
+    """
+    Write an email to the outbox instead of sending it during the request.
+
+    When called inside a transaction the email is only delivered if that
+    transaction commits. Emails queued twice with the same `key` are sent once.
+    """
+    EmailOutbox.objects.bulk_create(
+        [EmailOutbox(key=key, subject=subject, message=message, recipient=recipient_email)],
+        ignore_conflicts=True,
+    )
+
+def queue_order_confirmation(order, profile):
+    if not profile.email:
+        return
+    subject = f"Order #{order.id} Confirmation"
+    message = (
+        f"Hello {profile.first_name},\n\n"
+        f"Thank you for your order! We’re excited to let you know that your {order} has been successfully received and is now being processed.\n\n"
+        f"Here are your Order Details\n\n"
+        f"----------------------------------------------------\n\n"
+        f"Order ID: {order.id}\n"
+        f"Total: ₹{order.total_price}\n"
+        f"Status: {order.status}\n"
+        f"Placed on: {order.created_at.strftime('%Y-%m-%d %H:%M')}\n\n"
+        f"Shipping Address\n"
+        f"{profile.address}\n\n"
+        f"----------------------------------------------------\n\n"
+        f"We'll notify you when it's shipped!\n\n"
+        f"Thank you for choosing ShopifyFR!\n\n"
+        f"Warm regards, \nShopifyFR\n\n"
+    )
+    queue_email(subject, message, profile.email, key=f"order-confirmation:{order.id}")
+
+def deliver_outbox(batch_size=100):
+    """
+    Send one batch of due outbox emails over a single SMTP connection.
+
+    Rows are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` in a short
+    transaction that counts the attempt and pushes `next_attempt_at` past
+    CLAIM_TIMEOUT, so several workers can drain the outbox concurrently
+    without sending an email twice. The emails are then sent with no
+    transaction or lock open; if the worker dies before recording the
+    outcome, they become due again once the claim expires.
+    Returns a `(sent, failed)` tuple.
+    """
+    now = timezone.now()
+    sent = failed = 0
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="Pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        for email in emails:
+            email.attempts += 1
+            email.next_attempt_at = now + CLAIM_TIMEOUT
+        EmailOutbox.objects.bulk_update(emails, ["attempts", "next_attempt_at"])
+    if not emails:
+        return sent, failed
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        connection_error = None
+    except Exception as e:
+        connection_error = e
+
+    for email in emails:
+        started = time.perf_counter()
+        try:
+            if connection_error is not None:
+                raise connection_error
+            EmailMessage(email.subject, email.message, None, [email.recipient], connection=connection).send()
+        except Exception as e:
+            EMAIL_SEND_DURATION.observe(time.perf_counter() - started, status="failed")
+            failed += 1
+            email.last_error = str(e)
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = "Failed"
+            else:
+                email.next_attempt_at = now + RETRY_DELAY * 2 ** (email.attempts - 1)
+        else:
+            EMAIL_SEND_DURATION.observe(time.perf_counter() - started, status="sent")
+            sent += 1
+            email.status = "Sent"
+            email.sent_at = timezone.now()
+
+    if connection_error is None:
+        connection.close()
+    EmailOutbox.objects.bulk_update(emails, ["status", "last_error", "next_attempt_at", "sent_at"])
+    return sent, failed
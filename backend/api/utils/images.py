@@ -0,0 +1,149 @@
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from api import blobs, variants
+from api.models import Profile, ThumbnailJob
+
+# Formats accepted for uploads, with the extension they are stored under
+IMAGE_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+# Larger images are refused before anything decodes them (decompression bombs)
+MAX_PIXELS = 40_000_000
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+# Failed thumbnails are retried with exponential backoff (30s, 1m, ...)
+# and marked "Failed" after MAX_ATTEMPTS.
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(seconds=30)
+# A claimed job whose worker died is picked up again after this long
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+def validate_image(upload):
+    """
+    Check the size and format of an uploaded image and return its extension.
+
+    Pillow only reads the header here: the format and dimensions are known
+    without decoding the pixels.
+    """
+    if upload.size > settings.PROFILE_IMAGE_MAX_SIZE:
+        raise Exception(f"Image is larger than {filesizeformat(settings.PROFILE_IMAGE_MAX_SIZE)}.")
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise Exception("Not a valid image.")
+    finally:
+        upload.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise Exception(f"Unsupported image format, use one of {', '.join(IMAGE_FORMATS)}.")
+    if width * height > MAX_PIXELS:
+        raise Exception("Image dimensions are too large.")
+    return IMAGE_FORMATS[image_format]
+
+def save_profile(profile, upload=None):
+    """
+    Save a profile, replacing its image with `upload` when given.
+
+    The upload is hashed while it is copied to the blob storage in chunks,
+    so an image uploaded before is not stored twice. Its thumbnails are
+    generated afterwards by `manage.py run_thumbnail_worker`.
+    """
+    if upload is None:
+        profile.save()
+        return
+    extension = validate_image(upload)
+    name = blobs.store(upload, f".{extension}")
+    replaced = blobs.profile_blobs(profile)
+    profile.image = name
+    profile.thumbnails = {}
+    with transaction.atomic():
+        profile.save()
+        blobs.retain([name])
+        blobs.release(replaced)
+        # The same image may have been uploaded, and its job done, before
+        ThumbnailJob.objects.update_or_create(image=name, kind="thumbnails", defaults={
+            "status": "Pending", "attempts": 0, "last_error": "", "next_attempt_at": timezone.now(),
+        })
+
+def thumbnail_urls(profile):
+    """`(size, {format: url})` pairs of the profile's thumbnails, smallest first."""
+    return [
+        (int(size), {image_format: default_storage.url(name) for image_format, name in names.items()})
+        for size, names in sorted(profile.thumbnails.items(), key=lambda item: int(item[0]))
+    ]
+
+def make_thumbnails(name):
+    """Store the square thumbnails of a stored image in every size and format, returning their names."""
+    thumbnails = {}
+    with default_storage.open(name) as f, Image.open(f) as image:
+        largest = max(settings.PROFILE_THUMBNAIL_SIZES)
+        # Lets the JPEG decoder downscale while decoding, at a fraction of the cost
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for size in settings.PROFILE_THUMBNAIL_SIZES:
+            thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            thumbnails[str(size)] = {}
+            for extension, image_format in THUMBNAIL_FORMATS.items():
+                content = BytesIO()
+                (thumbnail.convert("RGB") if image_format == "JPEG" else thumbnail).save(content, image_format, quality=85)
+                thumbnails[str(size)][extension] = blobs.store(ContentFile(content.getvalue()), f".{extension}")
+    return thumbnails
+
+def generate_thumbnails(batch_size=10):
+    """
+    Do one batch of due jobs: make the thumbnails of profile images and store
+    them on the profiles still using that image, or render the missing
+    variants of product images (see `api.variants`).
+
+    Jobs are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` in a short
+    transaction that counts the attempt and pushes `next_attempt_at` past
+    CLAIM_TIMEOUT, so several workers can run side by side. Images are then
+    decoded and resized with no transaction or lock open, and each job's
+    outcome is recorded on its own, so one failing job doesn't undo the
+    others; if the worker dies meanwhile, the job becomes due again once
+    the claim expires. Returns a `(done, failed)` tuple.
+    """
+    now = timezone.now()
+    done = failed = 0
+    with transaction.atomic():
+        jobs = list(
+            ThumbnailJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="Pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        for job in jobs:
+            job.attempts += 1
+            job.next_attempt_at = now + CLAIM_TIMEOUT
+        ThumbnailJob.objects.bulk_update(jobs, ["attempts", "next_attempt_at"])
+
+    for job in jobs:
+        try:
+            if job.kind == "variants":
+                variants.render_missing(job.image)
+            else:
+                thumbnails = make_thumbnails(job.image)
+                with transaction.atomic():
+                    # A profile that changed its image since has a job of its own
+                    updated = Profile.objects.filter(image=job.image, thumbnails={}).update(thumbnails=thumbnails)
+                    blobs.retain([name for formats in thumbnails.values() for name in formats.values()] * updated)
+        except Exception as e:
+            failed += 1
+            job.last_error = str(e)
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = "Failed"
+            else:
+                job.next_attempt_at = now + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            done += 1
+            job.status = "Done"
+        job.save(update_fields=["status", "last_error", "next_attempt_at"])
+    return done, failed
@@ -0,0 +1,144 @@
+"""
+Responsive variants of product images.
+
+Each product image kept in the blob storage (see `api.blobs`) is resized to
+the widths of `IMAGE_VARIANT_WIDTHS`, in WebP and JPEG, and the results are
+stored as blobs next to the original and recorded as `ProductImageVariant`
+rows, which `ProductType.images` turns into `srcset` lists. Images are never
+enlarged: widths beyond the original collapse into one at its own width.
+
+`manage.py generate_image_variants` renders them ahead of time in a process
+pool. An image that was missed is shown as the original, without variants,
+and queued for `manage.py run_thumbnail_worker` by the first request that
+shows it (`queue_missing`). Remote images (plain URLs) have no variants.
+"""
+import multiprocessing
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, connections, transaction
+from PIL import Image, ImageOps
+
+from . import blobs
+from .models import ProductImageVariant, ThumbnailJob
+
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+# How long requests showing an image leave it alone once one has queued it
+QUEUE_INTERVAL = 60
+
+
+def render_variants(path, widths):
+    """
+    Resize the image at `path` to each of `widths`, returning `(width, height, format, bytes)` tuples.
+
+    Doesn't touch Django, so it can run in the processes of a pool.
+    """
+    with Image.open(path) as image:
+        largest = max(widths)
+        # Lets the JPEG decoder downscale while decoding, at a fraction of the cost
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        rendered = []
+        for width in sorted({min(width, image.width) for width in widths}):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+            for extension, image_format in FORMATS.items():
+                content = BytesIO()
+                resized.save(content, image_format, quality=82)
+                rendered.append((width, height, extension, content.getvalue()))
+    return rendered
+
+
+def store_variants(source, rendered):
+    """
+    Store the rendered variants of the blob `source` and record them.
+
+    Variants recorded already, by an earlier or concurrent rendering, are
+    left as they are, and only the blobs of the rows inserted here are
+    retained. Cached catalog responses are left alone too: they show the
+    variants once they expire (`CATALOG_CACHE_TIMEOUT`).
+    """
+    # The files are written first, so the transaction only records the rows
+    variants = [
+        ProductImageVariant(source=source, width=width, height=height, format=extension,
+                            name=blobs.store(ContentFile(content), f".{extension}"))
+        for width, height, extension, content in rendered
+    ]
+    inserted = []
+    with transaction.atomic():
+        for variant in variants:
+            try:
+                with transaction.atomic():
+                    variant.save()
+            except IntegrityError:
+                continue
+            inserted.append(variant.name)
+        blobs.retain(inserted)
+
+
+def missing_sources(sources):
+    """The blob names among `sources` (names or URLs) that have no variants yet."""
+    names = {name for name in map(blobs.blob_name, sources) if name}
+    done = set(ProductImageVariant.objects.filter(source__in=names).values_list("source", flat=True).distinct())
+    return sorted(names - done)
+
+
+def queue_missing(sources):
+    """
+    Queue a `ThumbnailJob` rendering the variants of each of `sources` (blob names).
+
+    A key in the catalog's shared cache stops the other requests showing
+    the same image from queueing it again for `QUEUE_INTERVAL` seconds.
+    """
+    cache = caches[settings.CATALOG_CACHE_ALIAS or "default"]
+    sources = [source for source in sources if cache.add(f"image-variants:{source}", True, QUEUE_INTERVAL)]
+    if sources:
+        ThumbnailJob.objects.bulk_create([ThumbnailJob(image=source, kind="variants") for source in sources], ignore_conflicts=True)
+
+
+def render_missing(source):
+    """
+    Render and store the variants of the blob `source` unless it has some already.
+
+    Run by the thumbnail worker for the jobs of `queue_missing`, with no
+    transaction open: only `store_variants` records the result in one.
+    """
+    if not ProductImageVariant.objects.filter(source=source).exists():
+        store_variants(source, render_variants(blobs.blob_storage.path(source), settings.IMAGE_VARIANT_WIDTHS))
+
+
+def _render(task):
+    source, path, widths = task
+    try:
+        return source, render_variants(path, widths), None
+    except Exception as e:
+        return source, None, repr(e)
+
+
+def generate(sources, workers=1):
+    """
+    Render the variants of `sources` (blob names) in a pool of `workers` processes, storing them as they come.
+
+    Yields `(source, error)` for every image, with `error` None on success.
+    """
+    tasks = [(source, blobs.blob_storage.path(source), settings.IMAGE_VARIANT_WIDTHS) for source in sources]
+    if workers <= 1:
+        results = map(_render, tasks)
+        pool = None
+    else:
+        # The pool's processes never touch the database; don't let them inherit our connections
+        if not connection.in_atomic_block:
+            connections.close_all()
+        pool = multiprocessing.get_context().Pool(workers)
+        results = pool.imap_unordered(_render, tasks)
+    try:
+        for source, rendered, error in results:
+            if rendered is not None:
+                store_variants(source, rendered)
+            yield source, error
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
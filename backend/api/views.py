@@ -0,0 +1,197 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from strawberry.django.views import AsyncGraphQLView as BaseAsyncGraphQLView, GraphQLView as SyncGraphQLView
+
+from . import response_cache
+from .blobs import BLOB_PATH_RE, BLOB_PREFIX, blob_storage
+from .persisted_queries import PersistedQueryError, resolve_query
+from .extensions import DEBUG_HEADER, debug_allowed
+from authentication.tokens import authenticate_request
+from .loaders import Loaders
+from .metrics import REGISTRY
+
+
+BLOB_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class GraphQLViewMixin:
+    """
+    What the sync and the async GraphQL views share.
+
+    Every request gets its own set of batching loaders and is authenticated
+    from its `Authorization: Bearer` access token (see `authentication.tokens`).
+
+    Queries that only read public catalog fields are answered from the
+    response cache with a strong `ETag`, and with `304 Not Modified` when it
+    matches the request's `If-None-Match`. They can be sent with GET so that
+    browsers and CDNs can cache them as well.
+
+    Requests may reference their query by hash, as Automatic Persisted
+    Queries (see `api.persisted_queries`).
+
+    With `multipart_uploads_enabled`, files are uploaded with the GraphQL
+    multipart request spec and Django streams large ones to a temporary
+    file. CsrfViewMiddleware guards these form posts like any other POST.
+    """
+
+    def should_render_graphql_ide(self, request):
+        # A GET carrying only a persisted query hash is not a visit to the IDE
+        return "extensions" not in request.query_params and super().should_render_graphql_ide(request)
+
+    def request_extensions(self, request):
+        if request.method == "GET":
+            extensions = request.query_params.get("extensions")
+            return self.parse_json(extensions) if extensions else None
+        return self._body.get("extensions") if isinstance(self._body, dict) else None
+
+    def parse_json(self, data):
+        # Kept so parse_http_body can read the request's `extensions`
+        self._body = super().parse_json(data)
+        return self._body
+
+    def set_context(self, context, user):
+        # userID is what chowkidar's @login_required checks
+        context.loaders = Loaders()
+        context.user = user
+        context.userID = user.id if user else None
+        context.refreshToken = None
+        return context
+
+
+class GraphQLView(GraphQLViewMixin, SyncGraphQLView):
+    """
+    GraphQL view of WSGI workers.
+
+    The schema is executed without an event loop: the async resolvers are
+    completed in the request's thread and call the ORM in place (see
+    `api.execution`), with no handoff to a thread of `sync_to_async`.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        request.debug_queries = bool(request.headers.get(DEBUG_HEADER)) and debug_allowed(request)
+        # Debug responses carry per-request query stats, so they bypass the cache
+        key, cached = (None, None) if request.debug_queries else response_cache.lookup(request)
+        if key is None:
+            response = self.execute(request, *args, **kwargs)
+            if request.method == "GET":
+                patch_cache_control(response, private=True, no_store=True)
+            return response
+
+        if cached is None:
+            response = self.execute(request, *args, **kwargs)
+            cached = response_cache.store(key, response)
+            if cached is None:
+                return response
+        return response_cache.respond(request, *cached)
+
+    def execute(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except PersistedQueryError as e:
+            return JsonResponse(e.as_response_data(), status=e.status)
+
+    def parse_http_body(self, request):
+        request_data = super().parse_http_body(request)
+        request_data.query = resolve_query(request_data.query, self.request_extensions(request))
+        return request_data
+
+    def parse_multipart(self, request):
+        data = super().parse_multipart(request)
+        # parse_json last read the files map, keep the operations instead
+        self._body = data
+        return data
+
+    def get_context(self, request, response):
+        return self.set_context(super().get_context(request, response), authenticate_request(request))
+
+
+class AsyncGraphQLView(GraphQLViewMixin, BaseAsyncGraphQLView):
+    """
+    GraphQL view of ASGI workers.
+
+    The resolvers run in the server's event loop and reach the database
+    through `sync_to_async`, so a worker keeps serving other requests while
+    one waits on it.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.debug_queries = bool(request.headers.get(DEBUG_HEADER)) and await sync_to_async(debug_allowed)(request)
+        # Debug responses carry per-request query stats, so they bypass the cache
+        key, cached = (None, None) if request.debug_queries else await sync_to_async(response_cache.lookup)(request)
+        if key is None:
+            response = await self.execute(request, *args, **kwargs)
+            if request.method == "GET":
+                patch_cache_control(response, private=True, no_store=True)
+            return response
+
+        if cached is None:
+            response = await self.execute(request, *args, **kwargs)
+            cached = await sync_to_async(response_cache.store)(key, response)
+            if cached is None:
+                return response
+        return response_cache.respond(request, *cached)
+
+    async def execute(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except PersistedQueryError as e:
+            return JsonResponse(e.as_response_data(), status=e.status)
+
+    async def parse_http_body(self, request):
+        request_data = await super().parse_http_body(request)
+        request_data.query = await sync_to_async(resolve_query)(request_data.query, self.request_extensions(request))
+        return request_data
+
+    async def parse_multipart(self, request):
+        data = await super().parse_multipart(request)
+        # parse_json last read the files map, keep the operations instead
+        self._body = data
+        return data
+
+    async def get_context(self, request, response):
+        context = await super().get_context(request, response)
+        return self.set_context(context, await sync_to_async(authenticate_request)(request))
+
+
+def blob_view(request, name):
+    """
+    Serve a content-addressed file from the blob storage.
+
+    A blob's URL changes with its content, so browsers and CDNs may keep it
+    forever without revalidating; a request that does revalidate gets a 304
+    without the file being opened. Only names in the blob format are
+    served, never other files of MEDIA_ROOT.
+    """
+    if not BLOB_PATH_RE.fullmatch(name):
+        raise Http404
+    etag = f'"{name.rsplit("/", 1)[-1].split(".")[0]}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            response = FileResponse(blob_storage.open(f"{BLOB_PREFIX}/{name}"))
+        except (FileNotFoundError, SuspiciousFileOperation):
+            raise Http404
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=BLOB_MAX_AGE, immutable=True)
+    return response
+
+
+def metrics_view(request):
+    """
+    Serve the metrics of every worker in the Prometheus text format.
+
+    Requires the METRICS_TOKEN bearer token; without one configured the
+    metrics are only served with DEBUG on.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,45 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from api.execution import in_event_loop
+from api.models import Profile
+
+# Hashing a password takes a core for a while; hashlib releases the GIL
+# meanwhile, so a few threads hash in parallel without starving the other
+# requests of the worker
+_hashers = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING_WORKERS, thread_name_prefix="password-hashing")
+
+
+async def hash_password(password):
+    if not in_event_loop():
+        # Executed synchronously (see api.execution): the worker serves this request alone
+        return make_password(password)
+    return await asyncio.get_running_loop().run_in_executor(_hashers, make_password, password)
+
+
+def create_account(username, email, password_hash):
+    """
+    Create a user and their profile, in one transaction.
+
+    Duplicates are caught by the unique constraints rather than checked
+    beforehand, so concurrent signups with the same username or email
+    cannot both succeed.
+    """
+    User = get_user_model()
+    username = User.normalize_username(username.lower())
+    user = User(username=username, email=User.objects.normalize_email(email), password=password_hash)
+    try:
+        with transaction.atomic():
+            user.save()
+            Profile.objects.create(user=user, username=username, email=email)
+    except IntegrityError:
+        # Only failed signups pay for finding out which one is taken
+        if User.objects.filter(username=username).exists():
+            raise Exception("Username already exists")
+        raise Exception("Email already exists")
+    return user
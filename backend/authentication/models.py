@@ -11,6 +11,8 @@ def default_expiry():
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     refresh_token_value = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    # Carried by the tokens as "ver"; bumped on logout to revoke them all
+    token_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.username
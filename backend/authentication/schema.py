@@ -1,15 +1,8 @@
 import strawberry
-from django.contrib.auth import get_user_model
 from chowkidar.authentication import authenticate
-from chowkidar.extension import JWTAuthExtension
 from chowkidar.decorators import login_required
-from chowkidar.wrappers import issue_tokens_on_login, revoke_tokens_on_logout
-from chowkidar.utils.jwt import generate_token_from_claims # ✅ Import JWT utilities
-from api.models import Profile 
-
-from datetime import timedelta
-
-User = get_user_model()
+from api.execution import InlineResolversExtension, run_sync
+from . import accounts, tokens
 
 @strawberry.type
 class UserType:
@@ -26,24 +19,13 @@ class AuthPayload:
 @strawberry.type
 class AuthMutation:
     @strawberry.mutation
-    def login(self, info, username: str, password: str) -> AuthPayload:
+    async def login(self, info, username: str, password: str) -> AuthPayload:
         """Authenticate user and return access & refresh tokens"""
-        user = authenticate(username=username.lower(), password=password)
+        user = await run_sync(authenticate, username=username.lower(), password=password)
         if user is None:
             raise Exception("Invalid username or password")
 
-        access_token_data = generate_token_from_claims(
-            {"sub": user.id, "username": user.username},
-            expiration_delta=timedelta(minutes=15)
-        )
-        refresh_token_data = generate_token_from_claims(
-            {"sub": user.id, "type": "refresh"},
-            expiration_delta=timedelta(days=7)
-        )
-
-        # Extract only the token string
-        access_token = access_token_data["token"]
-        refresh_token = refresh_token_data["token"]
+        access_token, refresh_token = tokens.issue_tokens(user)
         return AuthPayload(
             user=UserType(id=user.id, username=user.username, email=user.email),
             access_token=access_token,
@@ -51,23 +33,18 @@ class AuthMutation:
         )
 
     @strawberry.mutation
-    @revoke_tokens_on_logout
-    def logout(self, info) -> bool:
-        """Revoke tokens on logout"""
-        info.context.LOGOUT_USER = True
+    async def logout(self, info) -> bool:
+        """Revoke every token of the user"""
+        user_id = getattr(info.context, "userID", None)
+        if user_id:
+            await run_sync(tokens.revoke, user_id)
         return True
 
     @strawberry.mutation
-    def register(self, username: str, email: str, password: str) -> UserType:
+    async def register(self, username: str, email: str, password: str) -> UserType:
         """Register a new user"""
-        if User.objects.filter(username=username).exists():
-            raise Exception("Username already exists")
-        if User.objects.filter(email=email).exists():
-            raise Exception("Email already exists")
-
-        user = User.objects.create_user(username=username.lower(), email=email, password=password)
-        Profile.objects.create(user=user,username=username.lower(),email=email)
-
+        password_hash = await accounts.hash_password(password)
+        user = await run_sync(accounts.create_account, username, email, password_hash)
         return UserType(id=user.id, username=user.username, email=user.email)
 
 @strawberry.type
@@ -75,7 +52,7 @@ class AuthQuery:
     @strawberry.field
     @login_required
     def me(self, info) -> UserType:
-        """Get details of the currently authenticated user"""
+        """Get details of the currently authenticated user, from their token"""
         user = info.context.user
         return UserType(id=user.id, username=user.username, email=user.email)
 
@@ -83,5 +60,5 @@ schema = strawberry.Schema(
     query=AuthQuery,
     mutation=AuthMutation,
     types=[UserType, AuthPayload],
-    extensions=[JWTAuthExtension],
+    extensions=[InlineResolversExtension],
 )
\ No newline at end of file
@@ -1,3 +1,82 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from api.testing import assert_max_queries
+from . import tokens
+
+LOGIN = "mutation { login(username: \"alice\", password: \"password123\") { accessToken refreshToken } }"
+ME = "{ me { id username email } }"
+
+class TokenAuthTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="alice", email="alice@example.com", password="password123")
+        tokens.claims_cache.clear()
+        self.addCleanup(tokens.claims_cache.clear)
+        self.addCleanup(cache.clear)
+
+    def post(self, query, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        response = self.client.post("/graphql/", data={"query": query}, content_type="application/json", secure=True, **headers)
+        return json.loads(response.content)
+
+    def login(self):
+        return self.post(LOGIN)["data"]["login"]
+
+    def test_me_is_answered_from_the_token(self):
+        access_token = self.login()["accessToken"]
+        self.assertEqual(self.post(ME, access_token)["data"]["me"], {"id": str(self.user.id), "username": "alice", "email": "alice@example.com"})
+        # Verified claims and the token version are cached
+        with assert_max_queries(0), mock.patch("authentication.tokens.decode_payload_from_token") as decode:
+            self.assertEqual(self.post(ME, access_token)["data"]["me"]["username"], "alice")
+        decode.assert_not_called()
+
+    def test_invalid_tokens_are_refused(self):
+        refresh_token = self.login()["refreshToken"]
+        for token in (None, "not-a-token", refresh_token):
+            self.assertIsNone(self.post(ME, token)["data"])
+
+    def test_logout_revokes_tokens(self):
+        access_token = self.login()["accessToken"]
+        self.assertTrue(self.post("mutation { logout }", access_token)["data"]["logout"])
+        self.assertIsNone(self.post(ME, access_token)["data"])
+        self.assertIsNotNone(self.post(ME, self.login()["accessToken"])["data"]["me"])
+
+    def test_claims_expire_from_the_cache(self):
+        claims_cache = tokens.ClaimsCache(max_entries=2)
+        with mock.patch("authentication.tokens.time.time", return_value=100):
+            claims_cache.set("a", {"sub": "1"}, 110)
+            claims_cache.set("b", {"sub": "2"}, 200)
+            self.assertEqual(claims_cache.get("a"), {"sub": "1"})
+            claims_cache.set("c", {"sub": "3"}, 200)
+            # The least recently used entry makes room
+            self.assertIsNone(claims_cache.get("b"))
+        with mock.patch("authentication.tokens.time.time", return_value=150):
+            self.assertIsNone(claims_cache.get("a"))
+            self.assertEqual(claims_cache.get("c"), {"sub": "3"})
+
+REGISTER = "mutation ($username: String!, $email: String!) { register(username: $username, email: $email, password: \"password123\") { username email } }"
+
+class RegisterTestCase(TestCase):
+    def register(self, username, email):
+        response = self.client.post("/graphql/", data={"query": REGISTER, "variables": {"username": username, "email": email}},
+                                    content_type="application/json", secure=True)
+        return json.loads(response.content)
+
+    def test_register_creates_user_and_profile(self):
+        # The user and profile inserts, in a savepoint
+        with assert_max_queries(4):
+            result = self.register("Alice", "alice@example.com")
+        self.assertEqual(result["data"]["register"], {"username": "alice", "email": "alice@example.com"})
+        user = get_user_model().objects.get(username="alice")
+        self.assertTrue(user.check_password("password123"))
+        self.assertEqual((user.profile.username, user.profile.email), ("alice", "alice@example.com"))
 
-# Create your tests here.
+    def test_duplicates_are_refused(self):
+        self.register("alice", "alice@example.com")
+        self.assertEqual(self.register("ALICE", "other@example.com")["errors"][0]["message"], "Username already exists")
+        self.assertEqual(self.register("bob", "alice@example.com")["errors"][0]["message"], "Email already exists")
+        self.assertEqual(get_user_model().objects.count(), 1)
+        self.assertFalse(get_user_model().objects.filter(username="bob").exists())
@@ -0,0 +1,141 @@
+"""
+Verification of the access tokens issued by `login`.
+
+Verified claims are kept in a small in-process cache keyed by the sha256 of
+the token, for at most `JWT_CLAIMS_CACHE_TTL` seconds and never past the
+token's expiry, so a client sending the same token again is not verified
+again.
+
+Requests are authenticated from the claims alone: `info.context.user` is a
+`TokenUser` with the id, username and email carried by the token, and
+nothing reads the user row.
+
+Logging out bumps the user's `token_version`, which every token carries as
+"ver", and tokens of an older version are refused. Current versions are read
+through the catalog's shared cache (`CATALOG_CACHE_ALIAS`) and kept there for
+`JWT_REVOCATION_CHECK_TTL` seconds; without a shared cache, other workers
+honour a logout within that delay.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from chowkidar.utils.exceptions import AuthError
+from chowkidar.utils.jwt import decode_payload_from_token, generate_token_from_claims
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import F
+
+
+class ClaimsCache:
+    """Bounded LRU of verified token claims, each kept until its own deadline."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, key, claims, expires_at):
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache(settings.JWT_CLAIMS_CACHE_SIZE)
+
+
+class TokenUser:
+    """The user of a request, built from its token claims without reading the user row."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.id = self.pk = int(claims["sub"])
+        self.username = claims.get("username", "")
+        self.email = claims.get("email", "")
+
+
+def issue_tokens(user):
+    """Return an `(access token, refresh token)` pair for the user."""
+    claims = {"sub": str(user.id), "ver": user.token_version}
+    access_token = generate_token_from_claims(
+        {**claims, "username": user.username, "email": user.email},
+        expiration_delta=timedelta(minutes=15),
+    )
+    refresh_token = generate_token_from_claims({**claims, "type": "refresh"}, expiration_delta=timedelta(days=7))
+    return access_token["token"], refresh_token["token"]
+
+
+def verify(token):
+    """Return the claims of a token, verifying it unless it was verified recently. Raises AuthError."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = claims_cache.get(key)
+    if claims is None:
+        claims = decode_payload_from_token(token)
+        claims_cache.set(key, claims, min(claims["exp"], time.time() + settings.JWT_CLAIMS_CACHE_TTL))
+    return claims
+
+
+def _versions():
+    return caches[settings.CATALOG_CACHE_ALIAS or "default"]
+
+
+def current_version(user_id):
+    """The token version of a user, or -1 once the user is gone."""
+    key = f"token-version:{user_id}"
+    version = _versions().get(key)
+    if version is None:
+        version = get_user_model().objects.filter(id=user_id).values_list("token_version", flat=True).first()
+        version = -1 if version is None else version
+        _versions().set(key, version, settings.JWT_REVOCATION_CHECK_TTL)
+    return version
+
+
+def revoke(user_id):
+    """Invalidate every token issued to the user so far."""
+    get_user_model().objects.filter(id=user_id).update(token_version=F("token_version") + 1)
+    _versions().delete(f"token-version:{user_id}")
+
+
+def authenticate_token(token):
+    """Return the `TokenUser` of a valid, unrevoked access token, or None."""
+    try:
+        claims = verify(token)
+        user_id = int(claims["sub"])
+    except (AuthError, KeyError, ValueError):
+        return None
+    if claims.get("type") == "refresh" or claims.get("ver") != current_version(user_id):
+        return None
+    return TokenUser(claims)
+
+
+def authenticate_request(request):
+    """
+    Return the `TokenUser` of a request's `Authorization: Bearer <access token>` header, or None.
+
+    The GraphQL views call it when they build the context (see `api.views`).
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return authenticate_token(token) if scheme.lower() == "bearer" and token else None